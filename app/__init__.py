@@ -0,0 +1,2 @@
+# sets up multi-worker metrics before any module imports prometheus_client
+from app.core import serving  # noqa: F401
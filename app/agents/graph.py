@@ -40,5 +40,6 @@ def initialize_state(session_id: str) -> AgentState:
         needs_user_input=True,
         next_message="",
         shown_properties_context=None,
-        last_intent=None
+        last_intent=None,
+        session_id=session_id
     )
\ No newline at end of file
@@ -5,6 +5,10 @@ from app.services.brain.matching import ExchangeMatchingService
 from app.services.llm_brain.llm_service import RealEstateLLMService
 from app.services.brain.memory_service import ConversationMemory
 from app.services.advertisements.app_property.property_manager import property_manager
+from app.core.tracing import span
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
 
 # creeat instance
 llm_service = RealEstateLLMService()
@@ -32,29 +36,27 @@ def chat_node(state: AgentState) -> AgentState:
     if "shown_ids" not in state or state["shown_ids"] is None:
         state["shown_ids"] = []
 
-    print(f"\n{'=' * 60}")
-    print(f"user message received")
-    print(f"Current memory keys: {list(memory.facts.keys())}")
+    logger.debug("user message received, memory keys: %s", memory.facts.keys())
 
     # llm undrestanding
     if llm_service.enabled:
         try:
-            understanding = llm_service.understand_and_extract(
-                last_message,
-                memory,
-                state["messages"][:-1]
-            )
+            with span("extraction"):
+                understanding = llm_service.understand_and_extract(
+                    last_message,
+                    memory,
+                    state["messages"][:-1]
+                )
 
             extracted = understanding.get('extracted_info', {})
             user_intent = understanding.get('user_intent', 'chat')
 
-            print(f"Intent: {user_intent}")
-            print(f"Extracted: {extracted}")
+            logger.debug("intent: %s, extracted: %s", user_intent, extracted)
 
             state["last_intent"] = user_intent
             _update_memory_and_requirements(extracted, memory, requirements, state)
 
-            print(f"memory updated {list(memory.facts.keys())}")
+            logger.debug("memory updated: %s", memory.facts.keys())
             
             if user_intent == 'reset':
                 state["requirements"] = UserRequirements()
@@ -67,19 +69,20 @@ def chat_node(state: AgentState) -> AgentState:
 
             # Skip search/exchange logic for simple greetings
             if user_intent == "greeting":
-                print("Greeting received, skipping search.")
+                logger.debug("greeting received, skipping search")
                 state = _generate_chat_response(state, memory, last_message)
                 return state
 
             if user_intent == 'search':
                 state["shown_ids"] = []
-                print("   ℹ User intent is search, clearing shown_ids for fresh results.")
+                logger.debug("intent is search, clearing shown_ids for fresh results")
 
             # DEBUG: Requirements status (internal only)
             # print(f"Requirements updated for city: {requirements.city is not None}")
 
             # CRITICAL: currect decision
-            should_search = _should_search(memory)
+            with span("should_search"):
+                should_search = _should_search(memory)
             
             if extracted.get('wants_exchange') or state.get("wants_exchange"):
                  if not (memory.get_fact('exchange_item') or extracted.get('exchange_item')) or \
@@ -88,32 +91,30 @@ def chat_node(state: AgentState) -> AgentState:
 
             if should_search and (user_intent == 'search' or len(extracted) > 0):
                 # If it's an exchange search, go here
-                print("searching.....")
+                logger.debug("route: search")
                 state = _perform_search(state, memory, requirements)
             elif (user_intent == 'exchange' or state.get("wants_exchange")) and \
                  (memory.get_fact('exchange_item') or extracted.get('exchange_item')):
                 # Only go to deal handling if we have something to exchange
-                print("exchange processing....")
+                logger.debug("route: exchange")
                 state = _handle_exchange(state, memory)
             elif user_intent == 'exchange' or state.get("wants_exchange"):
                  # Force search for exchanges if no deal info provided
-                 print("proactive exchange search....")
+                 logger.debug("route: proactive exchange search")
                  state = _perform_search(state, memory, requirements)
             else:
-                print("continue conversation and give infornation")
+                logger.debug("route: conversation")
                 state = _generate_chat_response(state, memory, last_message)
 
         except Exception as e:
-            print(f"Error in LLM processing: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("error in LLM processing: %s", e)
             
             # Ensure we fallback to rule-based extraction and response
             _simple_extraction(last_message, memory, requirements)
             state = _generate_chat_response_fallback(state, memory, last_message)
             
     else:
-        print("llm disable use fallback")
+        logger.debug("llm disabled, using fallback")
         _simple_extraction(last_message, memory, requirements)
         state = _generate_chat_response_fallback(state, memory, last_message)
 
@@ -121,8 +122,7 @@ def chat_node(state: AgentState) -> AgentState:
     state["memory"] = memory
     state["needs_user_input"] = True
 
-    print(f"answer sent")
-    print(f"{'=' * 60}\n")
+    logger.debug("answer sent")
 
     return state
 
@@ -173,12 +173,12 @@ def _update_memory_and_requirements(extracted: dict, memory: ConversationMemory,
         requirements.district = None
         memory.add_fact('district', None)
         state["shown_ids"] = [] # Major change -> allow previously seen properties from new city
-        print(f"   ℹ City changed, clearing district and shown_ids.")
+        logger.debug("city changed, clearing district and shown_ids")
 
     # Transaction type change also clears shown_ids
     if 'transaction_type' in extracted and extracted['transaction_type'] != memory.get_fact('transaction_type'):
         state["shown_ids"] = []
-        print(f"   ℹ Transaction type changed, clearing shown_ids.")
+        logger.debug("transaction type changed, clearing shown_ids")
 
     for key, value in extracted.items():
         if value is not None and value != "":
@@ -197,7 +197,7 @@ def _update_memory_and_requirements(extracted: dict, memory: ConversationMemory,
                     mapped_value = type_map.get(value)
                     if mapped_value:
                         setattr(requirements, key, mapped_value)
-                        print(f"   ✓ property_type = {mapped_value}")
+                        logger.debug("requirement property_type = %s", mapped_value)
 
                 elif key == 'transaction_type' and isinstance(value, str):
                     trans_map = {
@@ -208,7 +208,7 @@ def _update_memory_and_requirements(extracted: dict, memory: ConversationMemory,
                     mapped_value = trans_map.get(value)
                     if mapped_value:
                         setattr(requirements, key, mapped_value)
-                        print(f"   ✓ transaction_type = {mapped_value}")
+                        logger.debug("requirement transaction_type = %s", mapped_value)
 
                 elif key == 'document_type' and isinstance(value, str):
                     doc_map = {
@@ -220,20 +220,25 @@ def _update_memory_and_requirements(extracted: dict, memory: ConversationMemory,
                     mapped_value = doc_map.get(value)
                     if mapped_value:
                         setattr(requirements, key, mapped_value)
-                        print(f"   ✓ document_type = {mapped_value}")
+                        logger.debug("requirement document_type = %s", mapped_value)
+
+                elif key == 'keywords':
+                    # features add up over the conversation (a new list; searches keep the old one)
+                    requirements.keywords = list(dict.fromkeys(requirements.keywords + list(value)))
+                    logger.debug("requirement keywords = %s", requirements.keywords)
                 else:
                     setattr(requirements, key, value)
-                    print(f"   ✓ {key} = {value}")
+                    logger.debug("requirement %s = %s", key, value)
             
             # Special case for wants_exchange boolean
             if key == 'wants_exchange' and isinstance(value, bool):
                 requirements.wants_exchange = value
-                print(f"   ✓ wants_exchange = {value}")
+                logger.debug("requirement wants_exchange = %s", value)
             
             # Handle district specifically
             if key == 'district':
                 requirements.district = value
-                print(f"   ✓ district = {value}")
+                logger.debug("requirement district = %s", value)
 
     # check transaction type for exchange logic
     if extracted.get('wants_exchange'):
@@ -264,12 +269,12 @@ def _update_memory_and_requirements(extracted: dict, memory: ConversationMemory,
         if cash_budget_max and exchange_val:
             total_budget = int(cash_budget_max) + int(exchange_val)
             requirements.budget_max = total_budget
-            print(f"total calculate budget updated: {total_budget}")
+            logger.debug("total budget with exchange value: %s", total_budget)
 
     # Ensure budget_min is synced if present
     if 'budget_min' in extracted:
         requirements.budget_min = extracted['budget_min']
-        print(f"   ✓ budget_min = {extracted['budget_min']}")
+        logger.debug("requirement budget_min = %s", extracted['budget_min'])
 
 
 def _should_search(memory: ConversationMemory) -> bool:
@@ -312,7 +317,7 @@ def _should_search(memory: ConversationMemory) -> bool:
     important_fields = [has_budget, has_city, has_type, has_transaction, has_area]
     count = sum(important_fields)
 
-    print(f"number of fields filled : {count}/5")
+    logger.debug("number of fields filled: %d/5", count)
 
     # if we dont have the city but we have the order 3 things
     if count >= 3 and not has_city:
@@ -325,27 +330,33 @@ def _perform_search(state: AgentState, memory: ConversationMemory,
                     requirements: UserRequirements) -> AgentState:
     """start search and show result"""
 
-    all_properties = property_manager.get_all_properties()
+    # compact catalog records; Property objects are built only for the listings shown
+    with span("catalog"):
+        catalog = property_manager.get_catalog()
 
-    print(f"all properties :  {len(all_properties)}")
+    logger.debug("catalog size: %d", len(catalog))
 
     # Clear old context
     state["shown_properties_context"] = None
     
-    # search with decision engin
-    decision_result = decision_engine.make_decision(all_properties, requirements)
-    
-    # Filter results by shown_ids (Deduplication)
-    all_scored = decision_result.get("properties", [])
-    shown_ids = state.get("shown_ids", [])
-    filtered_scored = [s for s in all_scored if s.property_id not in shown_ids]
+    # search with decision engin (cached per requirements and catalog version, and re-ranked
+    # from the session's last search when only some requirements changed);
+    # listings already shown in this session are left out (Deduplication)
+    with span("decision"):
+        decision_result = decision_engine.make_decision(
+            catalog.records, requirements,
+            catalog_version=catalog.version, exclude_ids=state.get("shown_ids", []),
+            session_id=state.get("session_id")
+        )
+
+    filtered_scored = decision_result.get("properties", [])
 
     state["search_results"] = filtered_scored
     state["decision_summary"] = decision_result.get("decision_summary", {})
     state["recommendations"] = decision_result.get("recommendations", [])
 
-    print(f"result: {len(state['search_results'])} properties (after deduplication)")
-    print(f"status: {decision_result['status']}")
+    logger.debug("search status %s: %d properties after deduplication",
+                 decision_result['status'], len(state['search_results']))
 
     if decision_result["status"] == "need_more_info":
         # if infornation not enough, ask
@@ -379,42 +390,45 @@ def _perform_search(state: AgentState, memory: ConversationMemory,
         results = filtered_scored[:3]
         properties_data = []
 
-        for score in results:
-            prop = property_manager.get_property_by_id(score.property_id)
-
-            if prop:
-                properties_data.append({
-                    "title": prop.title,
-                    "price": prop.price,
-                    "price_formatted": f"{prop.price:,} تومان",
-                    "area": prop.area,
-                    "vpm": prop.vpm,
-                    "vpm_formatted": f"{prop.vpm:,} تومان/متر" if prop.vpm else None,
-                    "units": prop.units,
-                    "location": f"{prop.city}، {prop.district}",
-                    "match_percentage": score.match_percentage,
-                    "bedrooms": prop.bedrooms,
-                    "year_built": prop.year_built,
-                    "document_type": prop.document_type.value if prop.document_type else None,
-                    "has_parking": prop.has_parking,
-                    "has_elevator": prop.has_elevator,
-                    "has_storage": prop.has_storage,
-                    "phone": prop.owner_phone,
-                    "source_link": prop.source_link,
-                    "image_url": prop.image_url,
-                    "description": prop.description,
-                })
-                # Mark as shown
-                if "shown_ids" not in state:
-                    state["shown_ids"] = []
-                state["shown_ids"].append(prop.id)
+        # build the Property of each listing shown
+        with span("hydrate"):
+            for score in results:
+                prop = property_manager.get_property_by_id(score.property_id)
+
+                if prop:
+                    properties_data.append({
+                        "title": prop.title,
+                        "price": prop.price,
+                        "price_formatted": f"{prop.price:,} تومان",
+                        "area": prop.area,
+                        "vpm": prop.vpm,
+                        "vpm_formatted": f"{prop.vpm:,} تومان/متر" if prop.vpm else None,
+                        "units": prop.units,
+                        "location": f"{prop.city}، {prop.district}",
+                        "match_percentage": score.match_percentage,
+                        "bedrooms": prop.bedrooms,
+                        "year_built": prop.year_built,
+                        "document_type": prop.document_type.value if prop.document_type else None,
+                        "has_parking": prop.has_parking,
+                        "has_elevator": prop.has_elevator,
+                        "has_storage": prop.has_storage,
+                        "phone": prop.owner_phone,
+                        "source_link": prop.source_link,
+                        "image_url": prop.image_url,
+                        "description": prop.description,
+                    })
+                    # Mark as shown
+                    if "shown_ids" not in state:
+                        state["shown_ids"] = []
+                    state["shown_ids"].append(prop.id)
 
         # Context for AI to analyze what user is seeing
         state["shown_properties_context"] = properties_data
 
         # Always use rule-based formatting for advertisements per user request.
         # This ensures consistent listing/cards in the Flutter UI.
-        message = _format_simple(properties_data)
+        with span("render"):
+            message = _format_simple(properties_data)
 
         # If city mismatch occurred, prepend a nice message
         if decision_result.get('city_mismatch'):
@@ -439,8 +453,7 @@ def _handle_exchange(state: AgentState, memory: ConversationMemory) -> AgentStat
     if state.get("exchange_value"):
          exchange_value = state["exchange_value"]
 
-    print(f"item for excheange: {exchange_item}")
-    print(f"value: {exchange_value}")
+    logger.debug("exchange item: %s, value: %s", exchange_item, exchange_value)
 
     # when the information not enough , we ask with llm
     if not exchange_item or not exchange_value:
@@ -459,16 +472,18 @@ def _handle_exchange(state: AgentState, memory: ConversationMemory) -> AgentStat
         return state
 
     # search exchange properties
-    exchange_properties = property_manager.get_exchange_properties()
-
-    matches = matching_service.find_exchange_matches(
-        exchange_item,
-        exchange_value,
-        exchange_properties
-    )
+    with span("catalog"):
+        exchange_properties = [p for p in property_manager.get_catalog() if p.open_to_exchange]
+
+    with span("exchange_match"):
+        matches = matching_service.find_exchange_matches(
+            exchange_item,
+            exchange_value,
+            exchange_properties
+        )
 
     state["exchange_matches"] = matches
-    print(f"find matches : {len(matches)}")
+    logger.debug("exchange matches: %d", len(matches))
 
     # generate answere with llm
     if matches:
@@ -491,7 +506,8 @@ def _handle_exchange(state: AgentState, memory: ConversationMemory) -> AgentStat
         }
 
         # Always use rule-based formatting for exchange advertisements.
-        state["next_message"] = _format_exchange_simple(matches_data)
+        with span("render"):
+            state["next_message"] = _format_exchange_simple(matches_data)
     else:
         context = {
             'stage': 'no_exchange_match',
@@ -564,6 +580,9 @@ def _generate_chat_response(state: AgentState, memory: ConversationMemory,
     }
 
     if llm_service.enabled:
+        # a free-form wish the extractors found nothing in: give the model related listings
+        if state.get("last_intent") == "chat":
+            context['related_properties'] = _related_listings(state, user_message)
         state["next_message"] = llm_service.generate_natural_response(
             context=context,
             user_message=user_message,
@@ -585,6 +604,27 @@ def _generate_chat_response(state: AgentState, memory: ConversationMemory,
     state["current_stage"] = "chatting"
     return state
 
+def _related_listings(state: AgentState, user_message: str) -> list:
+    """listings whose texts match the message, merged with the current requirements' ranking"""
+    with span("catalog"):
+        catalog = property_manager.get_catalog()
+    with span("hybrid_search"):
+        hits = decision_engine.hybrid_search(catalog, state["requirements"], user_message, k=3)
+
+    related = []
+    for property_id, _ in hits:
+        prop = property_manager.get_property_by_id(property_id)
+        if prop:
+            related.append({
+                "title": prop.title,
+                "price_formatted": f"{prop.price:,} تومان",
+                "area": prop.area,
+                "location": f"{prop.city}، {prop.district}",
+                "description": prop.description,
+            })
+    return related
+
+
 def _simple_chat_fallback(state: AgentState, user_message: str) -> AgentState:
     state["next_message"] = "سلام! چطور می‌تونم کمکت کنم؟ دنبال چه نوع ملکی می‌گردی؟"
     state["current_stage"] = "chatting"
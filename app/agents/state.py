@@ -58,6 +58,9 @@ class AgentState(TypedDict):
     # IDs of properties already shown to user in this session (to avoid repetition)
     shown_ids: List[str]
 
+    # session the state belongs to
+    session_id: Optional[str]
+
 
 # Required fields that must be asked from the user
 REQUIRED_FIELDS = {
@@ -0,0 +1,133 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import zlib
+from typing import Optional
+from app.core.tracing import current_trace_id
+
+# LOG_LEVEL: DEBUG shows the per-turn chat events, INFO (default) only what operators need
+# LOG_FORMAT: json (default) or text
+# LOG_DEBUG_SAMPLE_RATE: fraction of chat turns whose DEBUG events are kept
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+
+# attributes every LogRecord has; anything else was passed with extra= and is logged as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "trace_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[logging.Handler] = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
+
+
+class TraceFilter(logging.Filter):
+    """
+    Adds the trace id of the current request and drops DEBUG records of unsampled turns.
+    Sampling is decided per trace id, so a turn is logged completely or not at all.
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace_id = current_trace_id()
+        record.trace_id = trace_id
+        if record.levelno > logging.DEBUG or self.sample_rate >= 1.0:
+            return True
+        if trace_id:
+            return zlib.crc32(trace_id.encode()) % 10_000 < self.sample_rate * 10_000
+        return random.random() < self.sample_rate
+
+
+class JsonFormatter(logging.Formatter):
+    """one JSON object per line with the extra= fields of the call"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace_id"] = record.trace_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread without formatting them.
+    Only the message is rendered here, since its arguments may change after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # never block a request on logging; drop the record instead
+            pass
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, sample_rate: float = DEBUG_SAMPLE_RATE,
+                      max_queue: int = 10_000):
+    """
+    Route the app loggers through a queue to a background thread writing to stderr,
+    so a request only pays for building the record. Safe to call more than once.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(trace_id)s] %(message)s"))
+
+    _handler = _QueueHandler(queue.Queue(maxsize=max_queue))
+    _handler.addFilter(TraceFilter(sample_rate))
+
+    logger = logging.getLogger("app")
+    logger.setLevel(level)
+    logger.addHandler(_handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """write out what is still queued and stop the listener thread"""
+    global _listener, _handler
+    if _listener is not None:
+        logger = logging.getLogger("app")
+        logger.removeHandler(_handler)
+        logger.propagate = True
+        _listener.stop()
+        _listener = None
+        _handler = None
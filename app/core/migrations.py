@@ -0,0 +1,237 @@
+import time
+from typing import List, NamedTuple
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+# any fixed number; every worker takes this lock before migrating, so only one applies them
+MIGRATION_LOCK_ID = 7_241_001
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    sql: str
+
+
+# Applied in order, each once, in its own transaction. Never edit a released migration;
+# add a new one. The statements tolerate tables created before migrations existed.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "users_and_otp_codes", """
+        CREATE TABLE IF NOT EXISTS users (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            phone_number VARCHAR(20) NOT NULL UNIQUE,
+            is_verified BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS otp_codes (
+            id SERIAL PRIMARY KEY,
+            phone_number VARCHAR(20) NOT NULL,
+            code VARCHAR(10) NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            used BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    Migration(2, "properties", """
+        CREATE TABLE IF NOT EXISTS properties (
+            id UUID PRIMARY KEY,
+            user_id TEXT,
+            owner_phone TEXT,
+            title TEXT,
+            description TEXT,
+            property_type TEXT,
+            transaction_type TEXT,
+            status TEXT,
+            price BIGINT,
+            area INTEGER,
+            city TEXT,
+            district TEXT,
+            bedrooms INTEGER,
+            year_built INTEGER,
+            floor INTEGER,
+            total_floors INTEGER,
+            document_type TEXT,
+            has_parking BOOLEAN DEFAULT FALSE,
+            has_elevator BOOLEAN DEFAULT FALSE,
+            has_storage BOOLEAN DEFAULT FALSE,
+            is_renovated BOOLEAN DEFAULT FALSE,
+            open_to_exchange BOOLEAN DEFAULT FALSE,
+            exchange_preferences JSONB,
+            admin_note TEXT,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP
+        );
+        -- derived columns written by submit_property (see backfill_derived for old rows)
+        ALTER TABLE properties
+            ADD COLUMN IF NOT EXISTS age INTEGER,
+            ADD COLUMN IF NOT EXISTS vpm BIGINT,
+            ADD COLUMN IF NOT EXISTS city_key TEXT,
+            ADD COLUMN IF NOT EXISTS district_key TEXT;
+    """),
+    Migration(3, "divar_data", """
+        CREATE TABLE IF NOT EXISTS divar_data (
+            id SERIAL PRIMARY KEY,
+            status TEXT,
+            title TEXT,
+            description TEXT,
+            property_type TEXT,
+            transaction_type TEXT,
+            price NUMERIC,
+            area INTEGER,
+            vpm NUMERIC,
+            city TEXT,
+            district TEXT,
+            bedrooms INTEGER,
+            year_built INTEGER,
+            floor INTEGER,
+            total_floors INTEGER,
+            units INTEGER,
+            document_type TEXT,
+            has_parking BOOLEAN,
+            has_elevator BOOLEAN,
+            has_storage BOOLEAN,
+            is_renovated BOOLEAN,
+            open_to_exchange BOOLEAN,
+            exchange_preferences TEXT,
+            exchange_preference TEXT,
+            source_link TEXT,
+            image_url TEXT
+        );
+        -- derived columns written by divar_ingest
+        ALTER TABLE divar_data
+            ADD COLUMN IF NOT EXISTS exchange_intent BOOLEAN,
+            ADD COLUMN IF NOT EXISTS exchange_tags TEXT[],
+            ADD COLUMN IF NOT EXISTS city_key TEXT,
+            ADD COLUMN IF NOT EXISTS district_key TEXT,
+            ADD COLUMN IF NOT EXISTS age INTEGER;
+        -- upsert key of the ingest pipeline; a table filled before it existed can hold a
+        -- listing more than once, and only its newest row is kept (as an upsert would)
+        DELETE FROM divar_data AS older
+            USING divar_data AS newer
+            WHERE older.source_link = newer.source_link AND older.id < newer.id;
+        CREATE UNIQUE INDEX IF NOT EXISTS divar_data_source_link_key ON divar_data (source_link);
+    """),
+    Migration(4, "chat_history_and_sessions", """
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id SERIAL PRIMARY KEY,
+            user_id UUID NOT NULL,
+            session_id VARCHAR(255) NOT NULL,
+            role VARCHAR(50) NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS chat_history_session_idx ON chat_history (session_id, id);
+
+        -- one row per conversation, kept up to date by the history writer
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            user_id UUID NOT NULL,
+            session_id VARCHAR(255) NOT NULL,
+            last_message TEXT NOT NULL,
+            last_updated TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, session_id)
+        );
+        CREATE INDEX IF NOT EXISTS chat_sessions_user_updated_idx ON chat_sessions (user_id, last_updated DESC);
+        -- memory/requirements of the conversation, used to resume it on any worker
+        ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS state_snapshot JSONB;
+
+        -- fill the summaries from history written before chat_sessions existed
+        INSERT INTO chat_sessions (user_id, session_id, last_message, last_updated, message_count)
+        SELECT DISTINCT ON (user_id, session_id)
+            user_id, session_id, content, created_at,
+            COUNT(*) OVER (PARTITION BY user_id, session_id)
+        FROM chat_history
+        WHERE NOT EXISTS (SELECT 1 FROM chat_sessions)
+        ORDER BY user_id, session_id, created_at DESC, id DESC
+        ON CONFLICT DO NOTHING;
+    """),
+    Migration(5, "query_indexes", """
+        -- admin listing and the catalog load: WHERE status = ? ORDER BY created_at DESC
+        CREATE INDEX IF NOT EXISTS properties_status_created_idx ON properties (status, created_at DESC);
+        -- a user's own ads
+        CREATE INDEX IF NOT EXISTS properties_user_created_idx ON properties (user_id, created_at DESC);
+        -- search_properties: approved ads by city and type within a price range
+        CREATE INDEX IF NOT EXISTS properties_approved_search_idx
+            ON properties (city, property_type, price) WHERE status = 'تایید_شده';
+
+        -- users are looked up by phone on every login
+        CREATE UNIQUE INDEX IF NOT EXISTS users_phone_number_key ON users (phone_number);
+        -- send_otp rate limit: codes of a phone in the last minute
+        CREATE INDEX IF NOT EXISTS otp_codes_phone_created_idx ON otp_codes (phone_number, created_at DESC);
+        -- verify_otp only ever looks at unused codes
+        CREATE INDEX IF NOT EXISTS otp_codes_unused_idx ON otp_codes (phone_number, code) WHERE used = FALSE;
+    """),
+    Migration(6, "agent_sessions", """
+        -- chat sessions of the "postgres" session store, shared by all workers
+        CREATE TABLE IF NOT EXISTS agent_sessions (
+            session_id VARCHAR(255) PRIMARY KEY,
+            state JSONB NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    Migration(7, "listing_coordinates", """
+        -- map position of a listing when the source has one (radius search, see spatial.py)
+        ALTER TABLE properties
+            ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION,
+            ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+        ALTER TABLE divar_data
+            ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION,
+            ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+    """),
+    Migration(8, "approved_search_order", """
+        -- search_properties: approved ads by city and type, newest first (price is filtered
+        -- on the rows read). properties_approved_search_idx could not give that order, so
+        -- the planner never used it.
+        CREATE INDEX IF NOT EXISTS properties_approved_recent_idx
+            ON properties (city, property_type, created_at DESC) WHERE status = 'تایید_شده';
+        DROP INDEX IF EXISTS properties_approved_search_idx;
+    """),
+]
+
+
+def migrate(db, migrations: List[Migration] = MIGRATIONS) -> List[int]:
+    """
+    Apply the migrations not yet recorded in schema_migrations; returns their versions.
+    Safe to run from several workers at once: they wait on an advisory lock and
+    the later ones find nothing left to apply.
+    """
+    applied_now = []
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+            try:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cursor.execute("SELECT version FROM schema_migrations")
+                applied = {r["version"] for r in cursor.fetchall()}
+                conn.commit()
+
+                for migration in sorted(migrations, key=lambda m: m.version):
+                    if migration.version in applied:
+                        continue
+                    started = time.perf_counter()
+                    try:
+                        cursor.execute(migration.sql)
+                        cursor.execute(
+                            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                            (migration.version, migration.name),
+                        )
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        logger.exception("migration %d_%s failed", migration.version, migration.name)
+                        raise
+                    applied_now.append(migration.version)
+                    logger.info("applied migration %d_%s in %.1f ms", migration.version, migration.name,
+                                (time.perf_counter() - started) * 1000)
+            finally:
+                conn.rollback()
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+                conn.commit()
+    return applied_now
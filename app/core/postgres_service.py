@@ -1,9 +1,14 @@
 import os
+import csv
+import io
 from dotenv import load_dotenv
 from typing import List, Dict, Any
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from contextlib import contextmanager
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
 
 load_dotenv()
 
@@ -26,21 +31,18 @@ class PostgresService:
             "user": os.environ.get("DB_USER", "property_user"),
             "password": os.environ.get("DB_PASSWORD", ""),
         }
-        self.initialize_db()
+        self._schema_ready = False
+
+    def ensure_schema(self):
+        """create/upgrade the tables once per process (run at app startup, not on import)"""
+        if not self._schema_ready:
+            self.initialize_db()
+            self._schema_ready = True
 
     def initialize_db(self):
-        """Initialize database tables"""
-        query = """
-        CREATE TABLE IF NOT EXISTS chat_history (
-            id SERIAL PRIMARY KEY,
-            user_id UUID NOT NULL,
-            session_id VARCHAR(255) NOT NULL,
-            role VARCHAR(50) NOT NULL,
-            content TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """
-        self.execute_raw(query)
+        """Create or upgrade the tables (see app.core.migrations)"""
+        from app.core.migrations import migrate
+        migrate(self)
 
     @contextmanager
     def get_connection(self):
@@ -50,12 +52,24 @@ class PostgresService:
             conn = psycopg2.connect(**self.db_config, cursor_factory=RealDictCursor)
             yield conn
         except Exception as e:
-            print(f"Connection error: {e}")
+            logger.error("connection error: %s", e)
             raise
         finally:
             if conn:
                 conn.close()
 
+    @contextmanager
+    def transaction(self):
+        """Cursor whose statements are committed together (rolled back on error)"""
+        with self.get_connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    yield cursor
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
     def insert(self, table: str, data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Insert new record"""
         with self.get_connection() as conn:
@@ -72,6 +86,19 @@ class PostgresService:
                 conn.commit()
                 return result
 
+    def insert_many(self, table: str, columns: List[str], rows: List[tuple]) -> int:
+        """Insert many records with one multi-row INSERT"""
+        if not rows:
+            return 0
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s"
+                execute_values(cursor, query, rows, page_size=len(rows))
+                count = cursor.rowcount
+                conn.commit()
+                return count
+
     def select(self, table: str, columns: str = "*", filters: Dict[str, Any] = None,
                limit: int = None, offset: int = None, order_by: str = None) -> List[Dict[str, Any]]:
         """read new records"""
@@ -95,6 +122,85 @@ class PostgresService:
                 cursor.execute(query, params)
                 return cursor.fetchall()
 
+    def select_keyset(self, table: str, columns: str = "*", key: str = "id", after: Any = None,
+                      limit: int = 100) -> List[Dict[str, Any]]:
+        """read one page ordered by key, starting after the last seen key (no OFFSET scan)"""
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                query = f"SELECT {columns} FROM {table}"
+                params = []
+                if after is not None:
+                    query += f" WHERE {key} > %s"
+                    params.append(after)
+                query += f" ORDER BY {key} ASC LIMIT %s"
+                params.append(limit)
+
+                cursor.execute(query, params)
+                return cursor.fetchall()
+
+    def copy_upsert(self, table: str, columns: List[str], rows: List[tuple],
+                    conflict_columns: List[str]) -> int:
+        """Bulk load rows with COPY into a staging table, then upsert them into the table"""
+        if not rows:
+            return 0
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_copy_value(v) for v in row])
+        buffer.seek(0)
+
+        column_list = ', '.join(columns)
+        staging = f"staging_{table}"
+        updates = ', '.join(f"{c} = EXCLUDED.{c}" for c in columns if c not in conflict_columns)
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                cursor.copy_expert(
+                    f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                    buffer
+                )
+                cursor.execute(f"""
+                    INSERT INTO {table} ({column_list})
+                    SELECT {column_list} FROM {staging}
+                    ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET {updates}
+                """)
+                count = cursor.rowcount
+                conn.commit()
+                return count
+
+    def update_many(self, table: str, key: str, columns: List[str], rows: List[tuple]) -> int:
+        """Update many rows in one statement; each row is (key, *values in columns order)"""
+        if not rows:
+            return 0
+
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                # VALUES has no column types of its own, so each value is cast to the column type
+                cursor.execute("""
+                    SELECT attname, format_type(atttypid, atttypmod) AS type
+                    FROM pg_attribute
+                    WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+                """, (table,))
+                types = {r["attname"]: r["type"] for r in cursor.fetchall()}
+
+                names = [key] + columns
+                template = "(" + ', '.join(f"%s::{types[c]}" for c in names) + ")"
+                set_clause = ', '.join(f"{c} = v.{c}" for c in columns)
+                query = f"""
+                    UPDATE {table} AS t
+                    SET {set_clause}
+                    FROM (VALUES %s) AS v ({', '.join(names)})
+                    WHERE t.{key} = v.{key}
+                """
+                execute_values(cursor, query, rows, template=template, page_size=len(rows))
+                count = cursor.rowcount
+                conn.commit()
+                return count
+
     def update(self, table: str, property_id: str, data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Update record"""
         with self.get_connection() as conn:
@@ -140,5 +246,17 @@ class PostgresService:
                 return result["ok"] == 1
 
 
+def _copy_value(value: Any) -> Any:
+    """format a python value for COPY ... (FORMAT csv, NULL '\\N')"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, (list, tuple)):
+        items = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in value)
+        return "{" + ",".join(f'"{item}"' for item in items) + "}"
+    return value
+
+
 # create instance from postgres service
 postgres_service = PostgresService()
@@ -0,0 +1,23 @@
+import os
+
+# Number of worker processes serving the app. uvicorn --workers reads the same variable,
+# so `WEB_CONCURRENCY=4 uvicorn app.main:app` starts four workers that:
+#   - keep chat sessions in Postgres (persistence.SESSION_STORE) instead of process memory
+#   - map one catalog snapshot file (property_manager.CATALOG_SNAPSHOT_PATH), refreshed
+#     by whichever worker finds it stale first while the others wait and map it
+#   - write their Prometheus metrics to files that /metrics merges (METRICS_DIR)
+WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+# files shared by the workers of one host
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+# With several workers each one writes its Prometheus metrics to files in this directory
+# and /metrics merges them (prometheus_client multiprocess mode). It must be set before
+# prometheus_client is imported, so app/__init__ imports this module first. By default it
+# is a new directory per run of the server (the workers' parent process); one set in the
+# environment is used as is and should be emptied before the server starts.
+if WORKERS > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = os.path.join(DATA_DIR, f"metrics-{os.getppid()}")
+METRICS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+if METRICS_DIR:
+    os.makedirs(METRICS_DIR, exist_ok=True)
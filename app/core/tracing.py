@@ -0,0 +1,76 @@
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+from prometheus_client import CollectorRegistry, Histogram, generate_latest, multiprocess
+from app.core.serving import METRICS_DIR
+
+# seconds; chat stages range from microseconds (filters) to seconds (LLM calls)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_SECONDS = Histogram(
+    "chat_stage_seconds", "Time spent in one stage of a chat turn", ["stage"], buckets=BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "Time to answer an HTTP request", ["method", "route", "status"], buckets=BUCKETS
+)
+
+_trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+_spans: ContextVar[Optional[List[Dict]]] = ContextVar("spans", default=None)
+
+# called with (stage, seconds) after every span, e.g. by the benchmark harness
+_listeners: List[Callable[[str, float], None]] = []
+
+
+def start_trace(trace_id: Optional[str] = None) -> str:
+    """start collecting spans for the current request"""
+    trace_id = trace_id or uuid.uuid4().hex
+    _trace_id.set(trace_id)
+    _spans.set([])
+    return trace_id
+
+
+def latest_metrics() -> bytes:
+    """the /metrics text: of every worker in multi-worker mode, of this process otherwise"""
+    if not METRICS_DIR:
+        return generate_latest()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=METRICS_DIR)
+    return generate_latest(registry)
+
+
+def worker_exited():
+    """drop this worker's live gauges from the merged metrics (on shutdown)"""
+    if METRICS_DIR:
+        multiprocess.mark_process_dead(os.getpid(), METRICS_DIR)
+
+
+def current_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+
+def current_spans() -> List[Dict]:
+    """spans finished so far in this request, in the order they ended"""
+    return _spans.get() or []
+
+
+def add_listener(callback: Callable[[str, float], None]):
+    _listeners.append(callback)
+
+
+@contextmanager
+def span(stage: str):
+    """time a block as one stage of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(seconds)
+        spans = _spans.get()
+        if spans is not None:
+            spans.append({"stage": stage, "ms": round(seconds * 1000, 3)})
+        for callback in _listeners:
+            callback(stage, seconds)
@@ -1,22 +1,97 @@
 
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST
 from app.agents.state import AgentState
 from typing import Dict
 from app.services.advertisements.divar_property.divar_api import divar_router
 from app.routers import send_otp, session, chat, properties, verify_otp
-from app.services.llm_brain.persistence import load_sessions
+from app.services.llm_brain.persistence import get_agent_graph, session_store
 from app.routers import profile, history
+from app.services.history.history_writer import history_writer
+from app.core.postgres_service import postgres_service
+from app.services.advertisements.app_property.property_manager import property_manager
+from app.agents.nodes import decision_engine
+from app.core.tracing import REQUEST_SECONDS, current_spans, latest_metrics, start_trace, worker_exited
+from app.core.log import configure_logging, get_logger, shutdown_logging
+
+configure_logging()
+logger = get_logger("app.requests")
+
+# milliseconds spent in each startup phase of this worker
+startup_phases: Dict[str, float] = {}
+
+
+@contextmanager
+def startup_phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_phases[name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """build the shared services once per worker; flush queued writes on shutdown"""
+    started = time.perf_counter()
+    with startup_phase("schema"):
+        postgres_service.ensure_schema()
+    with startup_phase("sessions"):
+        session_store.load()
+    with startup_phase("catalog"):
+        property_manager.load_snapshot()
+    with startup_phase("graph"):
+        get_agent_graph()
+    with startup_phase("history_writer"):
+        history_writer.start()
+    startup_phases["total"] = round((time.perf_counter() - started) * 1000, 2)
+    get_logger("app.startup").info("startup complete", extra={"phases_ms": startup_phases})
+
+    yield
+
+    # write the queued chat history and log records before the process exits
+    history_writer.stop()
+    worker_exited()
+    shutdown_logging()
+
 
 app = FastAPI(
     title="real state agent with memory",
     description="Real estate consulting system with integrated LLM and full memory",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.include_router(divar_router)
 
 
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    """give each request a trace id (X-Trace-Id) and time it"""
+    trace_id = start_trace(request.headers.get("x-trace-id"))
+    started = time.perf_counter()
+
+    response = await call_next(request)
+
+    seconds = time.perf_counter() - started
+    route = request.scope.get("route")
+    REQUEST_SECONDS.labels(request.method, route.path if route else "unmatched", response.status_code).observe(seconds)
+    response.headers["X-Trace-Id"] = trace_id
+
+    spans = current_spans()
+    if spans:
+        logger.info("request", extra={
+            "path": request.url.path,
+            "status": response.status_code,
+            "ms": round(seconds * 1000, 3),
+            "spans": spans,
+        })
+    return response
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -25,12 +100,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from app.services.llm_brain.persistence import load_sessions, sessions
-
-# Shared sessions are already loaded in chat router,
-# but we can ensure they are available here too.
-# sessions: Dict[str, AgentState] = load_sessions()
-
 
 @app.get("/")
 def read_root():
@@ -50,15 +119,23 @@ def read_root():
 @app.get("/health")
 def health_check():
     """Health check"""
-    from app.services.advertisements.app_property.property_manager import property_manager
     return {
         "status": "healthy",
-        "sessions_count": len(sessions),
+        "sessions_count": session_store.count(),
         "llm_enabled": True,  # check llm exist
-        "properties_stats": property_manager.get_statistics()
+        "properties_stats": property_manager.get_statistics(),
+        "history_writer": history_writer.metrics(),
+        "search_cache": decision_engine.result_cache.stats(),
+        "startup_ms": startup_phases,
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics (stage and request latency histograms), merged over the workers"""
+    return Response(latest_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
 app.include_router(chat.router, tags=["chat"])
 app.include_router(session.router, tags=["session"])
 app.include_router(properties.router, tags=["properties"])
@@ -12,6 +12,8 @@ class DivarProperty(BaseModel):
     vpm: Optional[float] = None
     city: Optional[str] = None
     district: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     bedrooms: Optional[int] = None
     year_built: Optional[int] = None
     floor: Optional[int] = None
@@ -14,6 +14,7 @@ class HistorySessionResponse(BaseModel):
     session_id: str
     last_message: str
     last_updated: datetime
+    message_count: int = 0
 
 class HistoryResponse(BaseModel):
     messages: List[HistoryMessage]
@@ -1,6 +1,18 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List, Literal
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Dict, Optional, List, Literal, Type, TypeVar
 from enum import Enum
+from app.services.advertisements.derived_fields import fill_derived_fields
+
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+def construct_trusted(model: Type[ModelT], values: Dict[str, Any]) -> ModelT:
+    """
+    Build a model from values that are already valid, without validation.
+    Missing fields get their defaults (default_factory included); only the
+    passed ones count as set, as with validation.
+    """
+    return model.model_construct(_fields_set=set(values), **values)
 
 
 class PropertyType(str, Enum):
@@ -35,6 +47,10 @@ class Property(BaseModel):
     area: int = Field(..., description="متراژ به متر مربع")
     city: str
     district: str
+    # position on the map; listings without one are placed at their district's centroid
+    # (see geography.DISTRICT_CENTERS)
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
     # Important variables (average weight)
     bedrooms: Optional[int] = None
@@ -68,14 +84,24 @@ class Property(BaseModel):
     source_link: Optional[str] = Field(None, description="لینک آگهی اصلی")
     image_url: Optional[str] = Field(None, description="لینک تصویر آگهی")
 
-    @property
-    def age(self) -> Optional[int]:
-        """calculate age of buildeing"""
-        if self.year_built:
-            from datetime import datetime
-            current_year = 1403  # convert to shamsi
-            return current_year - self.year_built
-        return None
+    # Derived at write time and stored with the row
+    age: Optional[int] = Field(None, description="سن بنا")
+    city_key: Optional[str] = Field(None, exclude=True)
+    district_key: Optional[str] = Field(None, exclude=True)
+
+    @classmethod
+    def from_trusted(cls, **values) -> "Property":
+        """
+        Build a Property from values that were validated when they were stored
+        (rows of our own tables) without running pydantic validation again.
+        Enum fields must already be enum members; API input goes through Property(...).
+        """
+        return construct_trusted(cls, values)._fill_derived_fields()
+
+    @model_validator(mode="after")
+    def _fill_derived_fields(self) -> "Property":
+        """derive the stored fields when they were not passed in"""
+        return fill_derived_fields(self)
 
 
 class UserRequirements(BaseModel):
@@ -91,6 +117,10 @@ class UserRequirements(BaseModel):
     city: Optional[str] = None
     district: Optional[str] = None
     bedrooms_min: Optional[int] = None
+    # listings within this distance of the district (or city) instead of in it
+    radius_km: Optional[float] = None
+    # features asked for that only listing texts mention ("نورگیر", "بالکن")
+    keywords: List[str] = []
 
     # year of build
     year_built_min: Optional[int] = None  
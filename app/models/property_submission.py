@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field, validator
 from typing import Optional, List
 from enum import Enum
-from app.models.property import PropertyType, TransactionType, DocumentType
+from app.models.property import PropertyType, TransactionType, DocumentType, construct_trusted
 
 
 class PropertySubmission(BaseModel):
@@ -13,6 +13,8 @@ class PropertySubmission(BaseModel):
     area: Optional[int] = None
     city: Optional[str] = None
     district: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     description: Optional[str] = None
     owner_phone: Optional[str] = None
 
@@ -49,4 +51,15 @@ class PropertySubmissionWithStatus(PropertySubmission):
     id: str
     status: str = PropertyStatus.PENDING
     created_at: str
-    updated_at: str
\ No newline at end of file
+    updated_at: str
+
+    # derived when the ad is saved
+    age: Optional[int] = None
+    vpm: Optional[int] = None
+    city_key: Optional[str] = Field(None, exclude=True)
+    district_key: Optional[str] = Field(None, exclude=True)
+
+    @classmethod
+    def from_trusted(cls, **values) -> "PropertySubmissionWithStatus":
+        """build from a properties row (validated on submit) without validating again"""
+        return construct_trusted(cls, values)
@@ -1,15 +1,20 @@
 import uuid
 from typing import Optional
 from fastapi import APIRouter, Depends, Header
+from starlette.concurrency import run_in_threadpool
 from gotrue import Dict
 import app
 from app.agents.graph import initialize_state
 from app.agents.state import AgentState
 from app.models.user import ChatRequest, ChatResponse
 from app.services.advertisements.app_property.property_manager import property_manager
-from app.services.llm_brain.persistence import load_sessions, save_sessions, sessions, agent_graph
+from app.services.llm_brain.persistence import (
+    session_store, get_agent_graph, hydrate_session, snapshot_state
+)
 from app.services.auth.access_token import get_current_user
 from app.services.history.history_service import history_service
+from app.services.history.history_writer import history_writer
+from app.core.tracing import span
 
 # Helper to make authentication optional for chat
 async def get_current_user_optional(current_user: Optional[dict] = Depends(get_current_user)):
@@ -20,10 +25,6 @@ async def get_current_user_optional(current_user: Optional[dict] = Depends(get_c
 # For now, let's keep it simple: if the user passes a token, we use it. 
 # If they don't, they need to pass a session_id.
 
-# Initial load of sessions at startup
-shared_sessions_loaded = load_sessions()
-sessions.update(shared_sessions_loaded)
-
 router = APIRouter()
 
 
@@ -35,6 +36,7 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
     from app.services.auth.access_token import decode_access_token, get_user_by_id
 
     user_session_id = None
+    user_id = None
     
     # 1. Try to get session from Auth Header
     if authorization and authorization.startswith("Bearer "):
@@ -44,49 +46,48 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
             user = get_user_by_id(payload["sub"])
             if user:
                 # Fixed session ID for this user
-                user_session_id = f"user_{user['id']}"
+                user_id = str(user['id'])
+                user_session_id = f"user_{user_id}"
     
     # 2. Determine which session_id to use
     session_id = user_session_id or request.session_id
 
     # 3. Create or receive session
+    current_state = None
     if not session_id:
         session_id = str(uuid.uuid4())
-        sessions[session_id] = initialize_state(session_id)
-        save_sessions(sessions)
-    elif session_id not in sessions:
-        # Try to reload from file
-        reloaded = load_sessions()
-        sessions.update(reloaded)
-        
-        if session_id not in sessions:
-            # Still not found, create new
-            sessions[session_id] = initialize_state(session_id)
-            save_sessions(sessions)
-    
-    # Use the session_id we finalized
-
-    current_state = sessions[session_id]
+    else:
+        with span("session_load"):
+            current_state = session_store.get(session_id)
+            if current_state is None and user_id:
+                # Resume a user's conversation from Postgres history (works on any worker);
+                # it waits for the history writer, so it runs off the event loop
+                current_state = await run_in_threadpool(hydrate_session, user_id, session_id)
+
+    if current_state is None:
+        # Still not found, create new
+        current_state = initialize_state(session_id)
 
     # add user message
     current_state["messages"].append({"role": "user", "content": request.message})
 
     # run graph(always use chat_node)
-    result = agent_graph.invoke(current_state)
-
-    # update state
-    sessions[session_id] = result
-    save_sessions(sessions)
-    
-    # Save to Postgres History
-    if authorization and authorization.startswith("Bearer "):
-        user_id = user_session_id.replace("user_", "")
-        history_service.save_message(user_id, session_id, "user", request.message)
-        history_service.save_message(user_id, session_id, "assistant", result["next_message"])
+    with span("graph"):
+        result = get_agent_graph().invoke(current_state)
 
     # add response to history
     result["messages"].append({"role": "assistant", "content": result["next_message"]})
 
+    # update state
+    with span("persist"):
+        session_store.save(session_id, result)
+
+        # Save to Postgres History (written in batches by the history writer)
+        if user_id:
+            history_service.queue_message(user_id, session_id, "user", request.message)
+            history_service.queue_message(user_id, session_id, "assistant", result["next_message"])
+            history_writer.enqueue_snapshot(user_id, session_id, snapshot_state(result))
+
     # creat answere
     response = ChatResponse(
         response=result["next_message"],
@@ -100,36 +101,37 @@ async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)
     if result.get("search_results"):
 
         recommended = []
-        for item in result["search_results"][:5]:
-            # Handle both object and dict access (since persistence might return dicts)
-            if hasattr(item, "property_id"):
-                prop_id = item.property_id
-                match_pct = item.match_percentage
-                total_score = item.total_score
-            else:
-                prop_id = item.get("property_id")
-                match_pct = item.get("match_percentage")
-                total_score = item.get("total_score")
+        with span("hydrate"):
+            for item in result["search_results"][:5]:
+                # Handle both object and dict access (since persistence might return dicts)
+                if hasattr(item, "property_id"):
+                    prop_id = item.property_id
+                    match_pct = item.match_percentage
+                    total_score = item.total_score
+                else:
+                    prop_id = item.get("property_id")
+                    match_pct = item.get("match_percentage")
+                    total_score = item.get("total_score")
                 
-            prop = property_manager.get_property_by_id(prop_id)
-
-            if prop:
-                recommended.append(
-                    {
-                        "id": prop.id,
-                        "title": prop.title,
-                        "price": prop.price,
-                        "area": prop.area,
-                        "vpm": prop.vpm,
-                        "units": prop.units,
-                        "location": f"{prop.city}، {prop.district}",
-                        "image_url": prop.image_url,
-                        "source_link": prop.source_link,
-                        "description": prop.description,
-                        "match_percentage": match_pct,
-                        "score": total_score,
-                    }
-                )
+                prop = property_manager.get_property_by_id(prop_id)
+
+                if prop:
+                    recommended.append(
+                        {
+                            "id": prop.id,
+                            "title": prop.title,
+                            "price": prop.price,
+                            "area": prop.area,
+                            "vpm": prop.vpm,
+                            "units": prop.units,
+                            "location": f"{prop.city}، {prop.district}",
+                            "image_url": prop.image_url,
+                            "source_link": prop.source_link,
+                            "description": prop.description,
+                            "match_percentage": match_pct,
+                            "score": total_score,
+                        }
+                    )
 
         response.recommended_properties = recommended
 
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
 from app.services.auth.access_token import get_current_user
 from app.services.history.history_service import history_service
 from app.models.history import HistoryMessage, HistorySessionResponse
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 500
+
 @router.get("/history", response_model=List[HistorySessionResponse])
 async def get_user_history_sessions(current_user: dict = Depends(get_current_user)):
     """Get all chat sessions for the current user"""
@@ -14,18 +17,30 @@ async def get_user_history_sessions(current_user: dict = Depends(get_current_use
         HistorySessionResponse(
             session_id=item["session_id"],
             last_message=item["last_message"],
-            last_updated=item["last_updated"]
+            last_updated=item["last_updated"],
+            message_count=item["message_count"]
         ) for item in history
     ]
 
 @router.get("/history/{session_id}", response_model=List[HistoryMessage])
-async def get_session_history(session_id: str, current_user: dict = Depends(get_current_user)):
-    """Get all messages for a specific session"""
-    messages = history_service.get_session_messages(session_id)
-    
-    # Optional: Verify if the session belongs to the user
-    # Since we filter by session_id, we should ensure the user owns this session history
-    if messages and str(messages[0]["user_id"]) != str(current_user["id"]):
+async def get_session_history(
+    session_id: str,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    since: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Messages of one of the current user's sessions, oldest first.
+    By default the newest `limit` messages; pass the first message id as ?before=
+    for older pages, or the last id seen as ?after= (or a time as ?since=) to sync new ones.
+    """
+    user_id = str(current_user["id"])
+    owner = history_service.get_session_owner(session_id)
+    if owner is not None and owner != user_id:
         raise HTTPException(status_code=403, detail="Access to this session history is denied")
-        
-    return messages
+
+    return history_service.get_session_messages(
+        session_id, user_id, before=before, after=after, since=since, limit=limit
+    )
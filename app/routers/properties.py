@@ -3,17 +3,8 @@ from fastapi import APIRouter, HTTPException
 from gotrue import Dict
 
 import app
-from app.agents.graph import create_agent_graph
-from app.agents.state import AgentState
 from app.models.property_submission import PropertySubmission
 from app.services.advertisements.app_property.property_manager import property_manager
-from app.services.llm_brain.persistence import load_sessions
-
-
-sessions: Dict[str, AgentState] = load_sessions()
-
-# graph
-agent_graph = create_agent_graph()
 
 manager = property_manager
 
@@ -4,7 +4,7 @@ from gotrue import Dict
 import app
 from app.agents.graph import initialize_state
 from app.agents.state import AgentState
-from app.services.llm_brain.persistence import load_sessions, sessions, agent_graph
+from app.services.llm_brain.persistence import session_store
 
 router = APIRouter()
 
@@ -13,7 +13,7 @@ router = APIRouter()
 def create_new_session():
     """create new session"""
     session_id = str(uuid.uuid4())
-    sessions[session_id] = initialize_state(session_id)
+    session_store.save(session_id, initialize_state(session_id))
 
     return {"session_id": session_id, "message": "create session with new history"}
 
@@ -21,10 +21,10 @@ def create_new_session():
 @router.get("/session/{session_id}")
 def get_session(session_id: str):
     """get session information"""
-    if session_id not in sessions:
+    state = session_store.get(session_id)
+    if state is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    state = sessions[session_id]
     memory = state["memory"]
 
     return {
@@ -41,10 +41,11 @@ def get_session(session_id: str):
 @router.get("/session/{session_id}/memory")
 def get_session_memory(session_id: str):
     """get full memory"""
-    if session_id not in sessions:
+    state = session_store.get(session_id)
+    if state is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    memory = sessions[session_id]["memory"]
+    memory = state["memory"]
 
     return {
         "session_id": session_id,
@@ -56,8 +57,7 @@ def get_session_memory(session_id: str):
 @router.delete("/session/{session_id}")
 def delete_session(session_id: str):
     """delete session"""
-    if session_id in sessions:
-        del sessions[session_id]
+    if session_store.delete(session_id):
         return {"message": "Session deleted"}
     else:
         raise HTTPException(status_code=404, detail="Session not found")
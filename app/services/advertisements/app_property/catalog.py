@@ -0,0 +1,131 @@
+import itertools
+import sys
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterator, List, Optional
+from app.models.property import Property
+from app.services.advertisements.derived_fields import fill_derived_fields
+from app.services.brain.semantic import IVFIndex
+
+# every Property field; the catalog keeps them all except the description text
+PROPERTY_FIELDS = list(Property.model_fields)
+RECORD_FIELDS = [name for name in PROPERTY_FIELDS if name != "description"]
+
+# short values repeated across many listings, stored once per process
+INTERNED_FIELDS = ["city", "district", "city_key", "district_key", "owner_phone"]
+
+_NO_PREFERENCES = ()
+
+# each catalog built or mapped by this process gets the next number (cache keys use it)
+_versions = itertools.count(1)
+
+
+def next_catalog_version() -> int:
+    return next(_versions)
+
+
+class TextStore:
+    """
+    Long texts (descriptions) of the whole catalog in one string.
+    A listing keeps only its index; the text is sliced out when it is read.
+    """
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._offsets = array("Q", [0])
+        self._blob = ""
+
+    def add(self, text: Optional[str]) -> int:
+        text = text or ""
+        self._parts.append(text)
+        self._offsets.append(self._offsets[-1] + len(text))
+        return len(self._offsets) - 2
+
+    def freeze(self):
+        """join the collected texts, called once the catalog is loaded"""
+        self._blob += "".join(self._parts)
+        self._parts = []
+
+    def get(self, index: int) -> str:
+        return self._blob[self._offsets[index]:self._offsets[index + 1]]
+
+
+class CatalogRecord:
+    """
+    One listing of the in-memory catalog.
+    Has the attributes of Property, so the decision engine and scoring accept either;
+    to_property() builds the Property when the listing is returned to the client.
+    """
+
+    __slots__ = tuple(RECORD_FIELDS) + ("_texts", "_text_index")
+
+    @property
+    def description(self) -> str:
+        return self._texts.get(self._text_index)
+
+    def to_property(self) -> Property:
+        values = {name: getattr(self, name) for name in RECORD_FIELDS}
+        values["exchange_preferences"] = list(self.exchange_preferences)
+        values["description"] = self.description
+        return Property.from_trusted(**values)
+
+
+class PropertyCatalog:
+    """listings held in memory between searches"""
+
+    def __init__(self):
+        self.records: List[CatalogRecord] = []
+        self._by_id: Dict[str, CatalogRecord] = {}
+        self._texts = TextStore()
+        self._defaults = {name: f.default for name, f in Property.model_fields.items() if not f.is_required()}
+        self.loaded_at = time.time()
+        self.version = next_catalog_version()
+        self._semantic_index: Optional[IVFIndex] = None
+        self._semantic_lock = threading.Lock()
+
+    def add(self, values: Dict[str, Any]) -> CatalogRecord:
+        """add a listing from Property field values (the same values Property.from_trusted takes)"""
+        record = CatalogRecord()
+        for name in RECORD_FIELDS:
+            value = values.get(name, self._defaults.get(name))
+            if name in INTERNED_FIELDS and value:
+                value = sys.intern(value)
+            setattr(record, name, value)
+
+        fill_derived_fields(record)
+        # keys derived just now were not interned with the stored values
+        for name in ("city_key", "district_key"):
+            value = getattr(record, name)
+            if value:
+                setattr(record, name, sys.intern(value))
+
+        preferences = values.get("exchange_preferences")
+        record.exchange_preferences = tuple(sys.intern(p) for p in preferences) if preferences else _NO_PREFERENCES
+
+        record._texts = self._texts
+        record._text_index = self._texts.add(values.get("description"))
+
+        self.records.append(record)
+        self._by_id[record.id] = record
+        return record
+
+    def freeze(self) -> "PropertyCatalog":
+        self._texts.freeze()
+        return self
+
+    def get(self, property_id: str) -> Optional[CatalogRecord]:
+        return self._by_id.get(property_id)
+
+    def semantic_index(self) -> IVFIndex:
+        """embedding index of the listing texts, built on first use (a snapshot stores it)"""
+        with self._semantic_lock:
+            if self._semantic_index is None:
+                self._semantic_index = IVFIndex.from_properties(self.records)
+            return self._semantic_index
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[CatalogRecord]:
+        return iter(self.records)
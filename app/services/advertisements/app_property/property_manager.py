@@ -1,16 +1,38 @@
 import json
+import os
+import threading
+import time
 from typing import List, Dict, Optional, Any
 from datetime import datetime
 from app.models.property_submission import PropertySubmission, PropertySubmissionWithStatus, PropertyStatus
 from app.models.property import Property, PropertyType, TransactionType, DocumentType
 from app.core.postgres_service import postgres_service as database_service
+from app.services.advertisements.app_property.catalog import PropertyCatalog
+from app.services.advertisements.app_property.snapshot import CatalogSnapshot
+from app.core.serving import DATA_DIR
+from app.services.advertisements.derived_fields import (
+    compute_age, compute_vpm, detect_exchange_intent, normalize_location_key
+)
+from app.core.log import get_logger
 import uuid
 
+logger = get_logger(__name__)
+
+# the in-memory catalog is reloaded after this many seconds (other processes write too)
+CATALOG_TTL_SECONDS = 60
+# newest Divar listings kept in the catalog
+DIVAR_CATALOG_LIMIT = 500
+# catalog file written after each refresh and mapped by every worker of the host
+# (see snapshot.py); set CATALOG_SNAPSHOT_PATH empty to keep the catalog on the heap
+CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH", os.path.join(DATA_DIR, "catalog.snapshot"))
+
 class PropertyManager:
     """ manage ads with PostgreSQL"""
 
     def __init__(self):
-        pass
+        self._catalog: Optional[PropertyCatalog] = None
+        self._catalog_lock = threading.Lock()
+        self._snapshot = CatalogSnapshot(CATALOG_SNAPSHOT_PATH) if CATALOG_SNAPSHOT_PATH else None
 
     def _map_status_to_db(self, status: str) -> str:
         if status == PropertyStatus.PENDING:
@@ -40,12 +62,13 @@ class PropertyManager:
         property_id = str(uuid.uuid4())
         now = datetime.now().isoformat()
         
-        # calculate age of building
-        age = None
-        if submission.year_built:
-
-            current_year = 1403  
-            age = current_year - submission.year_built
+        # derived fields are computed once here and stored with the row
+        derived = {
+            "age": compute_age(submission.year_built),
+            "vpm": compute_vpm(submission.price, submission.area),
+            "city_key": normalize_location_key(submission.city),
+            "district_key": normalize_location_key(submission.district),
+        }
 
         # ready data for save
         db_data = {
@@ -61,8 +84,9 @@ class PropertyManager:
             "area": submission.area or 0,
             "city": submission.city or "",
             "district": submission.district or "",
+            "latitude": submission.latitude,
+            "longitude": submission.longitude,
             "bedrooms": submission.bedrooms,
-            "age": age,
             "year_built": submission.year_built,
             "floor": submission.floor or 0,
             "total_floors": submission.total_floors or 0,
@@ -74,7 +98,8 @@ class PropertyManager:
             "open_to_exchange": submission.open_to_exchange,
             "exchange_preferences": json.dumps(submission.exchange_preferences) if submission.exchange_preferences else json.dumps([]),
             "created_at": now,
-            "updated_at": now
+            "updated_at": now,
+            **derived
         }
 
         # delete None fields
@@ -86,8 +111,9 @@ class PropertyManager:
             if not result:
                 raise Exception("error in create ads")
         except Exception as e:
-            print(f"error in create ads :  {e}")
+            logger.error("error in create ads: %s", e)
             raise
+        self.invalidate_catalog()
 
         # create return object
         return PropertySubmissionWithStatus(
@@ -95,6 +121,7 @@ class PropertyManager:
             status=PropertyStatus.APPROVED,
             created_at=now,
             updated_at=now,
+            **derived,
             **submission.dict()
         )
 
@@ -108,7 +135,7 @@ class PropertyManager:
             data = results[0]
             return self._map_db_to_submission(data)
         except Exception as e:
-            print(f"error to get ads :  {e}")
+            logger.error("error to get ads: %s", e)
             return None
 
     def get_user_submissions(self, user_id: str) -> List[PropertySubmissionWithStatus]:
@@ -117,7 +144,7 @@ class PropertyManager:
             results = database_service.select("properties", filters={"user_id": user_id})
             return [self._map_db_to_submission(item) for item in results]
         except Exception as e:
-            print(f" error to get user ads :  {e}")
+            logger.error("error to get user ads: %s", e)
             return []
 
     def get_all_submissions(
@@ -144,7 +171,7 @@ class PropertyManager:
             submissions.sort(key=lambda x: x.created_at if x.created_at else "", reverse=True)
             return submissions
         except Exception as e:
-            print(f" error to get all ads : {e}")
+            logger.error("error to get all ads: %s", e)
             return []
 
     def update_status(
@@ -156,29 +183,30 @@ class PropertyManager:
         """change ads state"""
         db_status = self._map_status_to_db(new_status)
         try:
-            update_data = {
-                "status": db_status,
-                "updated_at": datetime.now().isoformat()
-            }
+            update_data = {"status": db_status}
             if admin_note:
                 update_data["admin_note"] = admin_note
-                
+
+            # updated_at is set by database_service.update
             result = database_service.update("properties", property_id, update_data)
+            self.invalidate_catalog()
             return bool(result)
         except Exception as e:
-            print(f"error in update ads state {e}")
+            logger.error("error in update ads state: %s", e)
             return False
 
     def delete_submission(self, property_id: str) -> bool:
         """delete ads"""
         try:
-            return database_service.delete("properties", property_id)
+            deleted = database_service.delete("properties", property_id)
+            self.invalidate_catalog()
+            return deleted
         except Exception as e:
-            print(f"error in delete ads :  {e}")
+            logger.error("error in delete ads: %s", e)
             return False
 
     def _map_db_to_submission(self, data: Dict) -> PropertySubmissionWithStatus:
-        """change data in DB to pythom model"""
+        """change data in DB to pythom model (rows were validated on submit, so no re-validation)"""
         created_at = data.get("created_at")
         updated_at = data.get("updated_at")
         
@@ -187,11 +215,7 @@ class PropertyManager:
         if isinstance(updated_at, datetime):
             updated_at = updated_at.isoformat()
 
-        year_built = data.get("year_built")
-        if year_built is None and data.get("age") is not None:
-            year_built = 1403 - data.get("age")
-
-        return PropertySubmissionWithStatus(
+        return PropertySubmissionWithStatus.from_trusted(
             id=data["id"],
             status=self._map_status_from_db(data.get("status", "در_انتظار_تایید")),
             created_at=created_at or "",
@@ -205,17 +229,23 @@ class PropertyManager:
             area=data.get("area"),
             city=data.get("city"),
             district=data.get("district"),
+            latitude=data.get("latitude"),
+            longitude=data.get("longitude"),
             bedrooms=data.get("bedrooms"),
-            year_built=year_built,
+            year_built=data.get("year_built"),
             floor=data.get("floor"),
             total_floors=data.get("total_floors"),
             document_type=data.get("document_type"),
-            has_parking=data.get("has_parking", False),
-            has_elevator=data.get("has_elevator", False),
-            has_storage=data.get("has_storage", False),
-            is_renovated=data.get("is_renovated", False),
-            open_to_exchange=data.get("open_to_exchange", False),
-            exchange_preferences=data.get("exchange_preferences", [])
+            has_parking=data.get("has_parking") or False,
+            has_elevator=data.get("has_elevator") or False,
+            has_storage=data.get("has_storage") or False,
+            is_renovated=data.get("is_renovated") or False,
+            open_to_exchange=data.get("open_to_exchange") or False,
+            exchange_preferences=data.get("exchange_preferences") or [],
+            age=data.get("age"),
+            vpm=data.get("vpm"),
+            city_key=data.get("city_key"),
+            district_key=data.get("district_key"),
         )
 
     def convert_to_property(
@@ -238,15 +268,17 @@ class PropertyManager:
         except:
             document_type = None
 
-        return Property(
+        values = dict(
             id=submission.id,
             title=submission.title or "",
             property_type=property_type,
             transaction_type=transaction_type,
-            price=submission.price or 0,
-            area=submission.area or 0,
+            price=int(submission.price or 0),
+            area=int(submission.area or 0),
             city=submission.city or "",
             district=submission.district or "",
+            latitude=submission.latitude,
+            longitude=submission.longitude,
             bedrooms=submission.bedrooms,
             year_built=submission.year_built,
             floor=submission.floor,
@@ -261,38 +293,89 @@ class PropertyManager:
             owner_phone=submission.owner_phone or "",
             description=submission.description or "",
             # New fields
-            vpm=(submission.price // submission.area) if (submission.price and submission.area) else None,
-            units=getattr(submission, 'units', None),
-            source_link=getattr(submission, 'source_link', None),
-            image_url=getattr(submission, 'image_url', None),
+            vpm=submission.vpm,
+            # units/source_link/image_url only exist on Divar listings
+            age=submission.age,
+            city_key=submission.city_key,
+            district_key=submission.district_key,
         )
+        if property_type is None or transaction_type is None:
+            # rows with an unknown type still fail validation like before
+            return Property(**values)
+        return Property.from_trusted(**values)
+
+    def get_catalog(self) -> PropertyCatalog:
+        """approved ads and the newest Divar listings as compact in-memory records"""
+        catalog = self._catalog
+        if catalog is not None and time.time() - catalog.loaded_at < CATALOG_TTL_SECONDS \
+                and (self._snapshot is None or self._snapshot.is_current(catalog)):
+            return catalog
+
+        with self._catalog_lock:
+            if self._catalog is catalog:
+                self._catalog = self._refresh_catalog()
+            return self._catalog
+
+    def invalidate_catalog(self):
+        """reload the catalog on next use (called after ads change)"""
+        self._catalog = None
+        if self._snapshot is not None:
+            # the other workers reload too
+            self._snapshot.mark_changed()
+
+    def _refresh_catalog(self) -> PropertyCatalog:
+        if self._snapshot is None:
+            return self._load_catalog()
+
+        with self._snapshot.refresh_lock():
+            # written by another worker while this one waited for the lock
+            catalog = self._snapshot.read(CATALOG_TTL_SECONDS)
+            if catalog is None:
+                catalog = self._snapshot.write(self._load_catalog())
+            return catalog
+
+    def load_snapshot(self) -> int:
+        """map a fresh snapshot at startup, so the first search doesn't load from Postgres"""
+        if self._snapshot is not None and self._catalog is None:
+            self._catalog = self._snapshot.read(CATALOG_TTL_SECONDS)
+        return len(self._catalog) if self._catalog is not None else 0
+
+    def _load_catalog(self) -> PropertyCatalog:
+        catalog = PropertyCatalog()
 
-    def get_all_properties(self) -> List[Property]:
-        """get all properties from local DB and Divar DB if approved"""
         # 1. Fetch from internal properties table
-        submissions = self.get_all_submissions(status=PropertyStatus.APPROVED)
-        internal_props = [self.convert_to_property(s) for s in submissions]
-        
+        for submission in self.get_all_submissions(status=PropertyStatus.APPROVED):
+            catalog.add(dict(self.convert_to_property(submission)))
+
         # 2. Fetch from Divar data table
-        divar_props = self.get_divar_properties()
-        
-        # 3. Combine both
-        return internal_props + divar_props
+        for r in self._fetch_divar_records():
+            catalog.add(self._divar_record_values(r))
+
+        logger.info("catalog loaded: %d properties", len(catalog))
+        return catalog.freeze()
+
+    def get_all_properties(self) -> List[Property]:
+        """get all properties from local DB and Divar DB if approved"""
+        return [record.to_property() for record in self.get_catalog()]
 
     def get_divar_properties(self) -> List[Property]:
         """Fetch properties from the divar_data table."""
+        return [self._map_divar_record_to_property(r) for r in self._fetch_divar_records()]
+
+    def _fetch_divar_records(self) -> List[Dict]:
         try:
-            records = database_service.select("divar_data", order_by="id DESC", limit=500) # Increase limit to find more exchanges
-            properties = []
-            for r in records:
-                properties.append(self._map_divar_record_to_property(r))
-            return properties
+            return database_service.select("divar_data", order_by="id DESC", limit=DIVAR_CATALOG_LIMIT) # Increase limit to find more exchanges
         except Exception as e:
-            print(f"Error fetching Divar properties: {e}")
+            logger.error("error fetching divar properties: %s", e)
             return []
 
     def get_property_by_id(self, property_id: str) -> Optional[Property]:
         """get properties with id (supports local UUIDs and divar_ prefixed IDs)"""
+        catalog = self._catalog
+        record = catalog.get(property_id) if catalog is not None else None
+        if record is not None:
+            return record.to_property()
+
         if property_id.startswith("divar_"):
             # Fetch from Divar data
             try:
@@ -305,7 +388,7 @@ class PropertyManager:
                     # Actually, I'll extract a helper method to avoid duplication
                     return self._map_divar_record_to_property(r)
             except Exception as e:
-                print(f"Error fetching Divar property by ID: {e}")
+                logger.error("error fetching divar property by id: %s", e)
             return None
         
         # Original logic for local properties
@@ -316,6 +399,11 @@ class PropertyManager:
 
     def _map_divar_record_to_property(self, r: Dict) -> Property:
         """Helper to map a single Divar DB record to Property model."""
+        # every value is coerced to its field type here, so validation is skipped
+        return Property.from_trusted(**self._divar_record_values(r))
+
+    def _divar_record_values(self, r: Dict) -> Dict[str, Any]:
+        """Property field values of a Divar DB record."""
         try:
             raw_type = r.get("property_type")
             prop_type = PropertyType(raw_type) if raw_type else PropertyType.APARTMENT
@@ -334,7 +422,7 @@ class PropertyManager:
         except:
             doc_type = None
 
-        return Property(
+        return dict(
             id=f"divar_{r.get('id')}",
             title=r.get("title") or "آگهی دیوار",
             property_type=prop_type,
@@ -343,6 +431,8 @@ class PropertyManager:
             area=int(r.get("area") or 0),
             city=r.get("city") or "نامشخص",
             district=r.get("district") or "نامشخص",
+            latitude=r.get("latitude"),
+            longitude=r.get("longitude"),
             bedrooms=r.get("bedrooms"),
             year_built=r.get("year_built"),
             floor=r.get("floor"),
@@ -353,7 +443,7 @@ class PropertyManager:
             has_storage=bool(r.get("has_storage", False)),
             is_renovated=bool(r.get("is_renovated", False)),
             open_to_exchange=self._detect_exchange_intent(r),
-            exchange_preferences=json.loads(r.get("exchange_preferences")) if r.get("exchange_preferences") and r.get("exchange_preferences").startswith("[") else [],
+            exchange_preferences=self._divar_exchange_preferences(r),
             owner_phone="دیوار",
             description=r.get("description") or "",
             # New fields from Divar
@@ -361,43 +451,29 @@ class PropertyManager:
             units=r.get("units"),
             source_link=r.get("source_link"),
             image_url=r.get("image_url"),
+            age=r.get("age"),
+            city_key=r.get("city_key"),
+            district_key=r.get("district_key"),
         )
     def _detect_exchange_intent(self, r: Dict) -> bool:
         """Helper to detect exchange intent from divar record fields."""
-        # 1. Check direct flag (the 'tick')
-        if bool(r.get("open_to_exchange", False)):
-            return True
-        
-        # 2. Check description for keywords
-        description = r.get("description", "") or ""
-        keywords = ['معاوضه', 'طاق', 'تعویض', 'قابل معاوضه', 'معاوضه با']
-        if any(w in description for w in keywords):
-            return True
-            
-        return False
+        # rows loaded by the ingest pipeline carry the precomputed flag
+        if r.get("exchange_intent") is not None:
+            return r["exchange_intent"]
+
+        return detect_exchange_intent(r.get("open_to_exchange", False), r.get("description"))
+
+    def _divar_exchange_preferences(self, r: Dict) -> List[str]:
+        """exchange items of a divar record (TEXT[] column when ingested, legacy JSON text otherwise)"""
+        if r.get("exchange_tags") is not None:
+            return r["exchange_tags"]
+
+        raw = r.get("exchange_preferences")
+        return json.loads(raw) if raw and raw.startswith("[") else []
 
     def get_exchange_properties(self) -> List[Property]:
         """get properties ready for exchange"""
-        try:
-            # use filter for better performance
-            results = database_service.select(
-                "properties", 
-                filters={
-                    "status": "تایید_شده",
-                    "open_to_exchange": True
-                }
-            )
-            submissions = [self._map_db_to_submission(item) for item in results]
-            internal_props = [self.convert_to_property(s) for s in submissions]
-            
-            # 2. Add Divar exchange properties
-            divar_props = self.get_divar_properties()
-            divar_exchange = [p for p in divar_props if p.open_to_exchange]
-            
-            return internal_props + divar_exchange
-        except Exception as e:
-            print(f" error to get reday to exchange amlac :  {e}")
-            return []
+        return [record.to_property() for record in self.get_catalog() if record.open_to_exchange]
 
     def get_statistics(self) -> Dict[str, Any]:
         """amar ads"""
@@ -420,7 +496,7 @@ class PropertyManager:
                 }
             return {"total": 0, "pending": 0, "approved": 0, "rejected": 0}
         except Exception as e:
-            print(f" error to get amlac amar : {e}")
+            logger.error("error to get amlac amar: %s", e)
             return {"total": 0, "pending": 0, "approved": 0, "rejected": 0}
 
     def update_property_details(self, property_id: str, updates: Dict) -> bool:
@@ -429,13 +505,38 @@ class PropertyManager:
             if "exchange_preferences" in updates and isinstance(updates["exchange_preferences"], list):
                 updates["exchange_preferences"] = json.dumps(updates["exchange_preferences"])
 
-            updates['updated_at'] = datetime.now().isoformat()
+            # derived fields of the changed source fields go in the same update
+            updates = {**updates, **self._derived_updates(property_id, updates)}
+
+            # updated_at is set by database_service.update
             result = database_service.update("properties", property_id, updates)
+            self.invalidate_catalog()
             return bool(result)
         except Exception as e:
-            print(f"error in update details of amlac :  {e}")
+            logger.error("error in update details of amlac: %s", e)
             return False
 
+    @staticmethod
+    def _derived_updates(property_id: str, updates: Dict) -> Dict:
+        """derived fields recomputed for the source fields in updates, as submit_property stores them"""
+        derived = {}
+        if "price" in updates or "area" in updates:
+            price, area = updates.get("price"), updates.get("area")
+            if "price" not in updates or "area" not in updates:
+                # the price per meter needs the stored value of the field not being changed
+                rows = database_service.select("properties", filters={"id": property_id})
+                current = rows[0] if rows else {}
+                price = updates["price"] if "price" in updates else current.get("price")
+                area = updates["area"] if "area" in updates else current.get("area")
+            derived["vpm"] = compute_vpm(price, area)
+        if "year_built" in updates:
+            derived["age"] = compute_age(updates["year_built"])
+        if "city" in updates:
+            derived["city_key"] = normalize_location_key(updates["city"])
+        if "district" in updates:
+            derived["district_key"] = normalize_location_key(updates["district"])
+        return derived
+
     def search_properties(
         self,
         city: Optional[str] = None,
@@ -450,42 +551,32 @@ class PropertyManager:
     ) -> List[PropertySubmissionWithStatus]:
         """Advanced Property Search"""
         try:
-            # creat filter
-            filters = {"status": "تایید_شده"}
-            
-            if city:
-                filters["city"] = city
-            if district:
-                filters["district"] = district
-            if property_type:
-                filters["property_type"] = property_type
-            
-            #  get all result and filtered in python
-            # in perfessional way we can create dynamic query
-            results = database_service.select(
-                "properties", 
-                filters=filters,
-                order_by="created_at DESC",
-                limit=limit,
-                offset=offset
-            )
-            
-            # numeric filter
-            filtered_results = []
-            for item in results:
-                if min_price is not None and item.get("price", 0) < min_price:
-                    continue
-                if max_price is not None and item.get("price", 0) > max_price:
-                    continue
-                if min_area is not None and item.get("area", 0) < min_area:
-                    continue
-                if max_area is not None and item.get("area", 0) > max_area:
-                    continue
-                filtered_results.append(item)
-            
-            return [self._map_db_to_submission(item) for item in filtered_results]
+            # every condition runs in SQL (properties_approved_recent_idx), so limit/offset page the real matches
+            conditions = ["status = %s"]
+            params: List[Any] = ["تایید_شده"]
+            for column, op, value in (
+                ("city", "=", city),
+                ("district", "=", district),
+                ("property_type", "=", property_type),
+                ("price", ">=", min_price),
+                ("price", "<=", max_price),
+                ("area", ">=", min_area),
+                ("area", "<=", max_area),
+            ):
+                if value is not None and value != "":
+                    conditions.append(f"{column} {op} %s")
+                    params.append(value)
+
+            query = f"""
+                SELECT * FROM properties
+                WHERE {' AND '.join(conditions)}
+                ORDER BY created_at DESC
+                LIMIT %s OFFSET %s
+            """
+            results = database_service.execute_raw(query, tuple(params + [limit, offset]))
+            return [self._map_db_to_submission(item) for item in results]
         except Exception as e:
-            print(f"error in searching amlack {e}")
+            logger.error("error in searching amlack: %s", e)
             return []
 
 # Instance for all
@@ -0,0 +1,371 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+import numpy as np
+from app.models.property import DocumentType, PropertyType, TransactionType
+from app.services.advertisements.app_property.catalog import CatalogRecord, PropertyCatalog, next_catalog_version
+from app.services.brain.semantic import EMBEDDING_DIM, IVFIndex
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+# A catalog written to one file that processes map instead of building it.
+#
+#   "PCAT" | u32 version | u32 header length | JSON header | regions, each 8-byte aligned
+#
+# The header holds the row count, the offset/dtype of every region and the dictionaries.
+#   - numeric fields: one fixed-width little-endian column each, NULL_INT (NaN for
+#     floats) for None
+#   - categoricals (types, cities, districts...): an i4 code per row into a dictionary
+#     kept in the header, -1 for None
+#   - exchange_preferences: u4 row offsets into an i4 column of dictionary codes
+#   - texts (id, title, description, links): u8 byte offsets (rows + 1) into a UTF-8 blob,
+#     plus a u1 null mask
+#   - the embedding index of the listing texts (semantic.IVFIndex): f4 centroids,
+#     i8 list offsets, i4 row order and i1 vectors, matrices flattened row-major
+# Every region is read in place: NumPy views of the mapped pages for vectorized work and
+# memoryviews of the same pages for reading single values. Nothing is decoded on load, so
+# mapping takes milliseconds and the page cache is shared by every process of the host.
+# Bump SNAPSHOT_VERSION whenever the layout changes; older files are then rebuilt.
+SNAPSHOT_MAGIC = b"PCAT"
+SNAPSHOT_VERSION = 4
+_PREFIX = struct.Struct("<4sII")
+
+# None of an optional integer field
+NULL_INT = np.iinfo(np.int64).min
+
+NUMERIC_COLUMNS: Dict[str, str] = {
+    "price": "<i8",
+    "area": "<i8",
+    "bedrooms": "<i8",
+    "year_built": "<i8",
+    "floor": "<i8",
+    "total_floors": "<i8",
+    "vpm": "<i8",
+    "units": "<i8",
+    "age": "<i8",
+    "latitude": "<f8",
+    "longitude": "<f8",
+    "has_parking": "|u1",
+    "has_elevator": "|u1",
+    "has_storage": "|u1",
+    "is_renovated": "|u1",
+    "open_to_exchange": "|u1",
+}
+BOOL_COLUMNS = {name for name, dtype in NUMERIC_COLUMNS.items() if dtype == "|u1"}
+FLOAT_COLUMNS = {name for name, dtype in NUMERIC_COLUMNS.items() if dtype == "<f8"}
+ENUM_FIELDS = {"property_type": PropertyType, "transaction_type": TransactionType, "document_type": DocumentType}
+CATEGORICAL_FIELDS = list(ENUM_FIELDS) + ["city", "district", "city_key", "district_key", "owner_phone"]
+LIST_FIELDS = ["exchange_preferences"]
+TEXT_FIELDS = ["id", "title", "description", "source_link", "image_url"]
+EMBEDDING_REGIONS = ["centroids", "offsets", "order", "vectors"]
+
+# memoryview formats of the dtypes; indexing one returns a Python int
+_SCALAR_FORMATS = {"<i8": "q", "|u1": "B", "<i4": "i", "<u4": "I", "<u8": "Q", "<f8": "d", "<f4": "f", "|i1": "b"}
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _encode(values: List[Any], dictionary: Dict[Any, int]) -> List[int]:
+    codes = []
+    for value in values:
+        if value is None:
+            codes.append(-1)
+            continue
+        if isinstance(value, (PropertyType, TransactionType, DocumentType)):
+            value = value.value
+        code = dictionary.get(value)
+        if code is None:
+            code = dictionary[value] = len(dictionary)
+        codes.append(code)
+    return codes
+
+
+def write_snapshot(catalog: PropertyCatalog, path: str) -> int:
+    """write the catalog to path (atomically replaced); returns the file size"""
+    records = list(catalog)
+    regions: Dict[str, np.ndarray] = {}
+    dictionaries: Dict[str, List[str]] = {}
+
+    for name, dtype in NUMERIC_COLUMNS.items():
+        values = [getattr(record, name) for record in records]
+        null = np.nan if name in FLOAT_COLUMNS else NULL_INT
+        regions[name] = np.array([null if v is None else v for v in values], dtype=dtype)
+
+    for name in CATEGORICAL_FIELDS:
+        dictionary: Dict[Any, int] = {}
+        regions[name] = np.array(_encode([getattr(record, name) for record in records], dictionary), dtype="<i4")
+        dictionaries[name] = list(dictionary)
+
+    for name in LIST_FIELDS:
+        dictionary = {}
+        lists = [getattr(record, name) or () for record in records]
+        regions[name + ".offsets"] = np.cumsum([0] + [len(items) for items in lists], dtype="<u4")
+        regions[name + ".codes"] = np.array(_encode([v for items in lists for v in items], dictionary), dtype="<i4")
+        dictionaries[name] = list(dictionary)
+
+    for name in TEXT_FIELDS:
+        values = [getattr(record, name) for record in records]
+        encoded = [(v or "").encode("utf-8") for v in values]
+        regions[name + ".offsets"] = np.cumsum([0] + [len(b) for b in encoded], dtype="<u8")
+        regions[name + ".null"] = np.array([v is None for v in values], dtype="|u1")
+        regions[name + ".blob"] = np.frombuffer(b"".join(encoded), dtype="|u1")
+
+    index = catalog.semantic_index()
+    for name in EMBEDDING_REGIONS:
+        regions["embedding." + name] = np.ascontiguousarray(getattr(index, name)).reshape(-1)
+
+    layout = {}
+    offset = 0
+    for name, region in regions.items():
+        layout[name] = [region.dtype.str, offset, len(region)]
+        offset = _align(offset + region.nbytes)
+    header = json.dumps({
+        "count": len(records),
+        "loaded_at": catalog.loaded_at,
+        "regions": layout,
+        "dictionaries": dictionaries,
+        "embedding_dim": EMBEDDING_DIM,
+    }, ensure_ascii=False).encode("utf-8")
+
+    data_start = _align(_PREFIX.size + len(header))
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREFIX.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header)))
+            f.write(header)
+            for name, region in regions.items():
+                f.seek(data_start + layout[name][1])
+                f.write(region.tobytes())
+            f.truncate(data_start + offset)
+            size = data_start + offset
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return size
+
+
+class SnapshotRecord:
+    """
+    One listing of a SnapshotCatalog: a row number whose attributes are read from the
+    mapped columns on access. Has the attributes of Property, like CatalogRecord.
+    Each catalog makes a subclass whose properties are bound to its columns.
+    """
+
+    __slots__ = ("_i",)
+
+    def __init__(self, i: int):
+        self._i = i
+
+    to_property = CatalogRecord.to_property
+
+
+def _record_class(catalog: "SnapshotCatalog") -> type:
+    """SnapshotRecord with a property per field reading `catalog`"""
+    scalars = catalog._scalars
+    fields: Dict[str, property] = {}
+
+    for name in NUMERIC_COLUMNS:
+        column = scalars[name]
+        if name in BOOL_COLUMNS:
+            fields[name] = property(lambda self, column=column: column[self._i] == 1)
+        elif name in FLOAT_COLUMNS:
+            def get(self, column=column):
+                value = column[self._i]
+                return None if value != value else value
+            fields[name] = property(get)
+        elif (catalog.columns[name] == NULL_INT).any():
+            def get(self, column=column):
+                value = column[self._i]
+                return None if value == NULL_INT else value
+            fields[name] = property(get)
+        else:
+            fields[name] = property(lambda self, column=column: column[self._i])
+
+    for name in CATEGORICAL_FIELDS:
+        # the dictionary ends with None, so code -1 reads it
+        fields[name] = property(lambda self, column=scalars[name], values=catalog._dictionaries[name]:
+                                values[column[self._i]])
+
+    for name in LIST_FIELDS:
+        def get(self, offsets=scalars[name + ".offsets"], codes=scalars[name + ".codes"],
+                values=catalog._dictionaries[name]):
+            return tuple(values[code] for code in codes[offsets[self._i]:offsets[self._i + 1]])
+        fields[name] = property(get)
+
+    for name in TEXT_FIELDS:
+        fields[name] = property(lambda self, name=name: catalog.text(name, self._i))
+
+    return type("SnapshotRecord", (SnapshotRecord,), {"__slots__": (), **fields})
+
+
+class SnapshotCatalog:
+    """
+    A catalog mapped from a snapshot file; used wherever a PropertyCatalog is.
+    `columns` are NumPy views of the file's regions (categoricals as their codes,
+    `dictionaries` decode them). Records and the id index are created on first use.
+    """
+
+    def __init__(self, buffer: mmap.mmap, header: Dict[str, Any], data_start: int):
+        self.loaded_at: float = header["loaded_at"]
+        self.version = next_catalog_version()
+        self._count = header["count"]
+        self._buffer = buffer
+        self.columns: Dict[str, np.ndarray] = {}
+        self._scalars: Dict[str, memoryview] = {}
+        self._blob_starts: Dict[str, int] = {}
+        view = memoryview(buffer)
+        for name, (dtype, offset, length) in header["regions"].items():
+            start = data_start + offset
+            column = np.frombuffer(buffer, dtype=dtype, count=length, offset=start)
+            self.columns[name] = column
+            if name.endswith(".blob"):
+                self._blob_starts[name[:-len(".blob")]] = start
+            else:
+                self._scalars[name] = view[start:start + column.nbytes].cast(_SCALAR_FORMATS[dtype])
+
+        self.dictionaries: Dict[str, List[Any]] = {}
+        for name, values in header["dictionaries"].items():
+            enum = ENUM_FIELDS.get(name)
+            values = [enum(v) for v in values] if enum else [sys.intern(v) for v in values]
+            self.dictionaries[name] = values
+        # read by SnapshotRecord with the None sentinel appended
+        self._dictionaries = {name: values + [None] for name, values in self.dictionaries.items()}
+
+        self._record_class = _record_class(self)
+        self._records: Optional[List[SnapshotRecord]] = None
+        self._by_id: Optional[Dict[str, int]] = None
+
+        centroids, offsets, order, vectors = (self.columns["embedding." + name] for name in EMBEDDING_REGIONS)
+        self._semantic_index = IVFIndex(centroids.reshape(-1, EMBEDDING_DIM), offsets, order,
+                                        vectors.reshape(-1, EMBEDDING_DIM))
+
+    def text(self, name: str, i: int) -> Optional[str]:
+        if self._scalars[name + ".null"][i]:
+            return None
+        offsets = self._scalars[name + ".offsets"]
+        start = self._blob_starts[name]
+        return self._buffer[start + offsets[i]:start + offsets[i + 1]].decode("utf-8")
+
+    @property
+    def records(self) -> List[SnapshotRecord]:
+        if self._records is None:
+            self._records = list(map(self._record_class, range(self._count)))
+        return self._records
+
+    def get(self, property_id: str) -> Optional[SnapshotRecord]:
+        if self._by_id is None:
+            offsets = self.columns["id.offsets"].tolist()
+            blob = self.columns["id.blob"].tobytes()
+            self._by_id = {blob[offsets[i]:offsets[i + 1]].decode("utf-8"): i for i in range(self._count)}
+        i = self._by_id.get(property_id)
+        return self.records[i] if i is not None else None
+
+    def semantic_index(self) -> IVFIndex:
+        """the embedding index stored in the snapshot (views of the mapped file)"""
+        return self._semantic_index
+
+    def freeze(self) -> "SnapshotCatalog":
+        return self
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[SnapshotRecord]:
+        return iter(self.records)
+
+
+def read_snapshot(path: str) -> SnapshotCatalog:
+    """map a snapshot file; raises ValueError when it is not a snapshot of this version"""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(buffer) < _PREFIX.size:
+        raise ValueError(f"{path}: truncated snapshot")
+    magic, version, header_size = _PREFIX.unpack_from(buffer)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f"{path}: not a version {SNAPSHOT_VERSION} catalog snapshot")
+    header = json.loads(buffer[_PREFIX.size:_PREFIX.size + header_size].decode("utf-8"))
+    if header.get("embedding_dim") != EMBEDDING_DIM:
+        raise ValueError(f"{path}: embeddings of another size than {EMBEDDING_DIM}")
+    return SnapshotCatalog(buffer, header, _align(_PREFIX.size + header_size))
+
+
+class CatalogSnapshot:
+    """
+    The catalog snapshot file of a host, shared by its workers.
+    A worker that finds the snapshot missing or older than the TTL takes the refresh lock,
+    loads the catalog from Postgres and writes it; workers waiting on the lock then map
+    that file instead of querying Postgres again. Ad changes in any worker touch a marker
+    file, which makes every worker's catalog and the snapshot stale.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.changed_path = path + ".changed"
+
+    @staticmethod
+    def _mtime(path: str) -> float:
+        try:
+            return os.stat(path).st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def is_current(self, catalog) -> bool:
+        """no newer snapshot was written and no ad changed since the catalog was loaded"""
+        return max(self._mtime(self.path), self._mtime(self.changed_path)) <= catalog.loaded_at
+
+    def mark_changed(self):
+        os.makedirs(os.path.dirname(self.changed_path) or ".", exist_ok=True)
+        with open(self.changed_path, "a"):
+            os.utime(self.changed_path)
+
+    @contextmanager
+    def refresh_lock(self):
+        """exclusive between the processes of the host, so one of them queries Postgres"""
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def read(self, ttl: float) -> Optional[SnapshotCatalog]:
+        """the mapped snapshot, or None when it is missing, older than ttl or outdated by a change"""
+        written_at = self._mtime(self.path)
+        if not written_at or time.time() - written_at >= ttl or self._mtime(self.changed_path) > written_at:
+            return None
+        try:
+            catalog = read_snapshot(self.path)
+        except (OSError, ValueError) as e:
+            logger.warning("catalog snapshot %s not used: %s", self.path, e)
+            return None
+        catalog.loaded_at = written_at
+        return catalog
+
+    def write(self, catalog) -> SnapshotCatalog:
+        """write the catalog and return it mapped from the file, so this process shares the pages too"""
+        started = time.perf_counter()
+        size = write_snapshot(catalog, self.path)
+        # the file's mtime is the catalog's load time, which is_current compares against
+        os.utime(self.path, (catalog.loaded_at, catalog.loaded_at))
+        mapped = read_snapshot(self.path)
+        mapped.loaded_at = self._mtime(self.path)
+        logger.info("catalog snapshot written: %d properties, %d bytes in %.1f ms",
+                    len(mapped), size, (time.perf_counter() - started) * 1000)
+        return mapped
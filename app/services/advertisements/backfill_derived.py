@@ -0,0 +1,82 @@
+import sys
+from typing import Callable, Dict, List
+from app.core.postgres_service import postgres_service
+from app.services.advertisements.derived_fields import (
+    compute_age, compute_vpm, compute_year_built, detect_exchange_intent,
+    normalize_location_key, parse_exchange_preferences
+)
+from app.services.advertisements.divar_property.divar_ingest import divar_ingest_service
+
+BATCH_SIZE = 1000
+
+PROPERTY_COLUMNS = ["age", "year_built", "vpm", "city_key", "district_key"]
+DIVAR_COLUMNS = ["age", "vpm", "city_key", "district_key", "exchange_intent", "exchange_tags"]
+
+
+def derive_property_row(r: Dict) -> tuple:
+    """derived columns of a properties row (key first, then PROPERTY_COLUMNS)"""
+    year_built = r.get("year_built")
+    if year_built is None:
+        # old rows stored only the age
+        year_built = compute_year_built(r.get("age"))
+
+    return (
+        r["id"],
+        compute_age(year_built),
+        year_built,
+        compute_vpm(r.get("price"), r.get("area")),
+        normalize_location_key(r.get("city")),
+        normalize_location_key(r.get("district")),
+    )
+
+
+def derive_divar_row(r: Dict) -> tuple:
+    """derived columns of a divar_data row (key first, then DIVAR_COLUMNS)"""
+    return (
+        r["id"],
+        compute_age(r.get("year_built")),
+        r.get("vpm") or compute_vpm(r.get("price"), r.get("area")),
+        normalize_location_key(r.get("city")),
+        normalize_location_key(r.get("district")),
+        detect_exchange_intent(r.get("open_to_exchange"), r.get("description")),
+        parse_exchange_preferences(r.get("exchange_preferences")),
+    )
+
+
+def backfill_table(table: str, derive: Callable[[Dict], tuple], columns: List[str],
+                   batch_size: int = BATCH_SIZE) -> int:
+    """walk the table by id and rewrite the derived columns of every row"""
+    updated = 0
+    after = None
+    while True:
+        records = postgres_service.select_keyset(table, after=after, limit=batch_size)
+        if not records:
+            break
+
+        updated += postgres_service.update_many(table, "id", columns, [derive(r) for r in records])
+        after = records[-1]["id"]
+        print(f"{table}: {updated} rows backfilled")
+
+    return updated
+
+
+def backfill_properties(batch_size: int = BATCH_SIZE) -> int:
+    return backfill_table("properties", derive_property_row, PROPERTY_COLUMNS, batch_size)
+
+
+def backfill_divar(batch_size: int = BATCH_SIZE) -> int:
+    divar_ingest_service.ensure_schema()
+    return backfill_table("divar_data", derive_divar_row, DIVAR_COLUMNS, batch_size)
+
+
+if __name__ == "__main__":
+    # python -m app.services.advertisements.backfill_derived [properties] [divar_data]
+    tables = sys.argv[1:] or ["properties", "divar_data"]
+    postgres_service.ensure_schema()
+    jobs = {"properties": backfill_properties, "divar_data": backfill_divar}
+
+    for table in tables:
+        if table not in jobs:
+            print(f"unknown table: {table}")
+            sys.exit(1)
+        print(f"{table}: done, {jobs[table]()} rows updated")
@@ -0,0 +1,115 @@
+import json
+import re
+from typing import Any, List, Optional
+
+# Arabic code points that show up in scraped/user text instead of the Persian ones
+_ARABIC_TO_PERSIAN = str.maketrans({
+    "ي": "ی",
+    "ى": "ی",
+    "ك": "ک",
+    "ة": "ه",
+})
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+
+# shamsi year used for building age; stored ages are refreshed by the backfill job
+CURRENT_SHAMSI_YEAR = 1403
+
+EXCHANGE_KEYWORDS = ['معاوضه', 'طاق', 'تعویض', 'قابل معاوضه', 'معاوضه با']
+
+
+def clean_text(value: Any) -> Optional[str]:
+    """strip, unify arabic letters and collapse spaces; empty -> None"""
+    if value is None:
+        return None
+    text = " ".join(str(value).translate(_ARABIC_TO_PERSIAN).split())
+    return text or None
+
+
+def normalize_location_key(value: Any) -> Optional[str]:
+    """key used to compare city/district names (case, spacing and arabic letters ignored)"""
+    return location_key(clean_text(value))
+
+
+def location_key(text: Optional[str]) -> Optional[str]:
+    """normalize_location_key for text that already went through clean_text"""
+    if not text:
+        return None
+    # half-space (ZWNJ) is typed inconsistently, e.g. "خرم‌آباد" / "خرم آباد"
+    return " ".join(text.replace("\u200c", " ").split()).lower()
+
+
+def normalize_number(value: Any) -> Any:
+    """turn '۱٬۲۰۰' or '1,200' into '1200' so pydantic can parse it"""
+    if isinstance(value, str):
+        value = value.translate(_DIGITS).replace(",", "").replace("٬", "").strip()
+        return value or None
+    return value
+
+
+def compute_vpm(price: Optional[float], area: Optional[float]) -> Optional[int]:
+    """price per square meter"""
+    if price and area:
+        return int(price // area)
+    return None
+
+
+def compute_age(year_built: Optional[int]) -> Optional[int]:
+    """building age from the shamsi construction year"""
+    if year_built:
+        return CURRENT_SHAMSI_YEAR - year_built
+    return None
+
+
+def compute_year_built(age: Optional[int]) -> Optional[int]:
+    """construction year for rows that only stored the age"""
+    if age is not None:
+        return CURRENT_SHAMSI_YEAR - age
+    return None
+
+
+def fill_derived_fields(listing: Any) -> Any:
+    """
+    set age, city/district keys and map position of a listing (a Property or a catalog record)
+    when they were not stored with it
+    """
+    # geography keys its centres with normalize_location_key, so it imports this module
+    from app.services.brain.geography import locate
+
+    if listing.age is None:
+        listing.age = compute_age(listing.year_built)
+    if listing.city_key is None:
+        listing.city_key = normalize_location_key(listing.city)
+    if listing.district_key is None:
+        listing.district_key = normalize_location_key(listing.district)
+    if listing.latitude is None or listing.longitude is None:
+        center = locate(listing.city_key, listing.district_key)
+        if center is not None:
+            listing.latitude, listing.longitude = center
+    return listing
+
+
+def detect_exchange_intent(open_to_exchange: Any, description: Optional[str]) -> bool:
+    """exchange flag (the 'tick') or an exchange keyword in the description"""
+    if bool(open_to_exchange):
+        return True
+    description = description or ""
+    return any(w in description for w in EXCHANGE_KEYWORDS)
+
+
+def parse_exchange_preferences(raw: Any) -> List[str]:
+    """accept a list, a JSON array string or a comma separated string"""
+    if raw is None or raw == "":
+        return []
+    if isinstance(raw, str):
+        raw = raw.strip()
+        if raw.startswith("["):
+            try:
+                raw = json.loads(raw)
+            except ValueError:
+                raw = raw.strip("[]").split(",")
+        else:
+            raw = re.split(r"[,،]", raw)
+    if not isinstance(raw, (list, tuple)):
+        return []
+    items = (clean_text(item) for item in raw)
+    return [item for item in items if item]
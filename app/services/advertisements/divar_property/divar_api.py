@@ -1,16 +1,112 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+import base64
+import binascii
+import json
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from app.core.postgres_service import postgres_service
 from app.models.divar_propertys import DivarProperty  # the Pydantic model for divar_data
 
 divar_router = APIRouter(prefix="/divar", tags=["Divar Properties"])
 
 TABLE_NAME = "divar_data"
+MAX_PAGE_SIZE = 1000
+# rows serialized per chunk of the streamed body
+STREAM_CHUNK_ROWS = 200
+
+# every listing field with the default DivarProperty would fill in for a missing column
+_FIELD_DEFAULTS = {name: field.default for name, field in DivarProperty.model_fields.items()}
+
+
+def encode_cursor(last_id: int) -> str:
+    """opaque cursor pointing after the given divar_data id"""
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """read the id back from a cursor made by encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        kind, value = base64.urlsafe_b64decode(padded).decode().split(":", 1)
+        if kind != "id":
+            raise ValueError(kind)
+        return int(value)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """validate ?fields=title,price against the listing model (id is always returned)"""
+    if not fields:
+        return None
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f != "id" and f not in _FIELD_DEFAULTS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    return ["id"] + [f for f in dict.fromkeys(requested) if f != "id"]
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def _project(record: Dict, fields: List[str]) -> Dict:
+    return {f: record.get(f, _FIELD_DEFAULTS.get(f)) for f in fields}
+
+
+def _stream_rows(records: List[Dict], fields: List[str]) -> Iterator[str]:
+    """serialize the page as a JSON array, a chunk of rows at a time"""
+    yield "["
+    for start in range(0, len(records), STREAM_CHUNK_ROWS):
+        chunk = records[start:start + STREAM_CHUNK_ROWS]
+        body = ",".join(
+            json.dumps(_project(r, fields), ensure_ascii=False, default=_json_default)
+            for r in chunk
+        )
+        yield ("," if start else "") + body
+    yield "]"
+
 
 @divar_router.get("/", response_model=List[DivarProperty])
-def list_divar_properties(limit: int = 100, offset: int = 0):
-    records = postgres_service.select(TABLE_NAME, limit=limit, offset=offset)
-    return [DivarProperty(**r) for r in records]
+def list_divar_properties(
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+):
+    """
+    Page through divar_data ordered by id.
+    Pass the X-Next-Cursor header of a response as ?cursor= to get the next page;
+    ?fields=title,price limits the returned columns. offset is kept for old clients.
+    """
+    projection = _parse_fields(fields)
+    columns = ", ".join(projection) if projection else "*"
+
+    if cursor:
+        records = postgres_service.select_keyset(
+            TABLE_NAME, columns=columns, after=decode_cursor(cursor), limit=limit
+        )
+    elif offset:
+        records = postgres_service.select(
+            TABLE_NAME, columns=columns, order_by="id ASC", limit=limit, offset=offset
+        )
+    else:
+        records = postgres_service.select_keyset(TABLE_NAME, columns=columns, limit=limit)
+
+    headers = {}
+    if len(records) == limit:
+        headers["X-Next-Cursor"] = encode_cursor(records[-1]["id"])
+
+    return StreamingResponse(
+        _stream_rows(records, projection or ["id"] + list(_FIELD_DEFAULTS)),
+        media_type="application/json",
+        headers=headers,
+    )
 
 @divar_router.get("/{property_id}", response_model=DivarProperty)
 def get_divar_property(property_id: int):
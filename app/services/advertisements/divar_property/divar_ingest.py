@@ -0,0 +1,177 @@
+import csv
+import json
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from app.core.postgres_service import postgres_service
+from app.models.divar_propertys import DivarProperty
+from app.services.advertisements.derived_fields import (
+    clean_text, location_key, normalize_number, compute_age, compute_vpm,
+    detect_exchange_intent, parse_exchange_preferences
+)
+
+TABLE_NAME = "divar_data"
+
+# listing columns + the derived columns the read path uses as-is
+INGEST_COLUMNS = [
+    "status", "title", "description", "property_type", "transaction_type",
+    "price", "area", "vpm", "city", "district", "latitude", "longitude", "bedrooms", "year_built",
+    "floor", "total_floors", "units", "document_type",
+    "has_parking", "has_elevator", "has_storage", "is_renovated",
+    "open_to_exchange", "exchange_preferences", "source_link", "image_url",
+    "exchange_intent", "exchange_tags", "city_key", "district_key", "age",
+]
+CONFLICT_COLUMNS = ["source_link"]
+
+NUMERIC_FIELDS = ["price", "area", "vpm", "latitude", "longitude", "bedrooms", "year_built", "floor",
+                  "total_floors", "units"]
+BOOLEAN_FIELDS = ["has_parking", "has_elevator", "has_storage", "is_renovated", "open_to_exchange"]
+# short values that are compared/grouped on, so arabic letters and spacing are unified
+TEXT_FIELDS = ["status", "title", "property_type", "transaction_type", "document_type", "city", "district"]
+# stored as given apart from surrounding whitespace
+RAW_TEXT_FIELDS = ["description", "source_link", "image_url"]
+
+# keep at most this many rejected rows in a report
+MAX_REPORTED_ERRORS = 50
+
+def read_jsonl(lines: Iterable[str]) -> Iterator[Optional[Dict[str, Any]]]:
+    """one JSON object per line, blank lines skipped (a broken line yields None)"""
+    for line in lines:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """CSV with a header row naming the divar_data columns"""
+    for row in csv.DictReader(lines):
+        yield {k: (v if v != "" else None) for k, v in row.items() if k}
+
+
+def _parse_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "t", "yes", "y", "بله", "دارد")
+    return bool(value)
+
+
+class DivarIngestService:
+    """validate, enrich and bulk load Divar listings into divar_data"""
+
+    def __init__(self, batch_size: int = 5000):
+        self.batch_size = batch_size
+
+    def ensure_schema(self):
+        """the derived columns and the upsert key come from the migrations (run once per process)"""
+        postgres_service.ensure_schema()
+
+    def normalize_row(self, raw: Dict[str, Any]) -> Tuple[Any, ...]:
+        """validate one raw listing and compute its derived columns (raises ValueError)"""
+        if not isinstance(raw, dict):
+            raise ValueError("row is not a JSON object")
+
+        data = {}
+        for k in NUMERIC_FIELDS:
+            if raw.get(k) is not None:
+                data[k] = normalize_number(raw[k])
+        for k in BOOLEAN_FIELDS:
+            if raw.get(k) is not None:
+                data[k] = _parse_bool(raw[k])
+        for k in TEXT_FIELDS:
+            if raw.get(k) is not None:
+                data[k] = clean_text(raw[k])
+        for k in RAW_TEXT_FIELDS:
+            if raw.get(k) is not None:
+                data[k] = str(raw[k]).strip() or None
+
+        try:
+            listing = DivarProperty(**data)
+        except ValidationError as e:
+            raise ValueError(f"invalid fields: {', '.join(str(err['loc'][0]) for err in e.errors())}")
+
+        if not listing.source_link:
+            raise ValueError("source_link is required")
+        if listing.price is not None and listing.price < 0:
+            raise ValueError("price must not be negative")
+        if listing.area is not None and listing.area < 0:
+            raise ValueError("area must not be negative")
+        if listing.latitude is not None and not -90 <= listing.latitude <= 90:
+            raise ValueError("latitude out of range")
+        if listing.longitude is not None and not -180 <= listing.longitude <= 180:
+            raise ValueError("longitude out of range")
+
+        tags = parse_exchange_preferences(
+            raw.get("exchange_preferences", raw.get("exchange_preference"))
+        )
+        row = listing.__dict__.copy()
+        row.update({
+            "vpm": listing.vpm if listing.vpm else compute_vpm(listing.price, listing.area),
+            "exchange_preferences": json.dumps(tags, ensure_ascii=False),
+            "exchange_intent": detect_exchange_intent(listing.open_to_exchange, listing.description),
+            "exchange_tags": tags,
+            "city_key": location_key(listing.city),
+            "district_key": location_key(listing.district),
+            "age": compute_age(listing.year_built),
+        })
+        return tuple([row.get(c) for c in INGEST_COLUMNS])
+
+    def ingest(self, records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """normalize records and upsert them in batches; returns a load report"""
+        self.ensure_schema()
+        started = time.perf_counter()
+        report = {"received": 0, "loaded": 0, "rejected": 0, "errors": []}
+
+        batch: Dict[str, Tuple[Any, ...]] = {}
+        source_index = INGEST_COLUMNS.index("source_link")
+
+        for line_no, raw in enumerate(records, 1):
+            report["received"] += 1
+            try:
+                row = self.normalize_row(raw)
+            except (ValueError, TypeError, AttributeError) as e:
+                report["rejected"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append({"row": line_no, "error": str(e)})
+                continue
+
+            # the last version of a listing in the same batch wins
+            batch[row[source_index]] = row
+            if len(batch) >= self.batch_size:
+                report["loaded"] += self._load(list(batch.values()))
+                batch = {}
+
+        if batch:
+            report["loaded"] += self._load(list(batch.values()))
+
+        elapsed = time.perf_counter() - started
+        report["seconds"] = round(elapsed, 3)
+        report["rows_per_second"] = int(report["loaded"] / elapsed) if elapsed else 0
+        return report
+
+    def _load(self, rows: List[Tuple[Any, ...]]) -> int:
+        return postgres_service.copy_upsert(TABLE_NAME, INGEST_COLUMNS, rows, CONFLICT_COLUMNS)
+
+
+divar_ingest_service = DivarIngestService()
+
+
+if __name__ == "__main__":
+    # python -m app.services.advertisements.divar_property.divar_ingest listings.jsonl [more.csv ...]
+    # offline job only: files are read a line at a time, and there is no HTTP endpoint for it
+    from app.services.advertisements.app_property.property_manager import property_manager
+
+    if len(sys.argv) < 2:
+        print("usage: divar_ingest <file.jsonl|file.csv> [...]")
+        sys.exit(1)
+
+    for path in sys.argv[1:]:
+        with open(path, encoding="utf-8", newline="") as f:
+            reader = read_csv if path.endswith(".csv") else read_jsonl
+            result = divar_ingest_service.ingest(reader(f))
+        print(f"{path}: {json.dumps(result, ensure_ascii=False)}")
+
+    # serving workers sharing the catalog snapshot reload it
+    property_manager.invalidate_catalog()
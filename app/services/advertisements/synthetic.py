@@ -0,0 +1,245 @@
+import argparse
+import json
+import random
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from app.services.advertisements.app_property.catalog import PropertyCatalog
+from app.services.advertisements.divar_property.divar_ingest import INGEST_COLUMNS, divar_ingest_service
+from app.services.brain.geography import DISTRICT_CENTERS
+
+# Deterministic synthetic data for benchmarks and load tests.
+# Listings are raw Divar records (the shape divar_ingest accepts), so the same
+# file can be bulk loaded into divar_data or turned into an in-memory catalog.
+# Conversations are scripted user turns written with the phrases RegexExtractor
+# recognizes, each with the fields it is expected to extract.
+
+# city -> (weight, price per meter in toman, {district: weight})
+# districts are single words or ones RegexExtractor knows, so scripted turns extract them exactly
+CITIES: Dict[str, Tuple[int, int, Dict[str, int]]] = {
+    "تهران": (40, 95_000_000, {"ونک": 3, "سعادت آباد": 4, "پاسداران": 3, "نیاوران": 2, "پونک": 4, "نارمک": 4}),
+    "گرگان": (15, 32_000_000, {"ناهارخوران": 4, "گلشهر": 3, "عدالت": 3, "گرگانپارس": 2}),
+    "مشهد": (15, 48_000_000, {"احمدآباد": 4, "سجاد": 3, "هاشمیه": 2, "طبرسی": 3}),
+    "اصفهان": (10, 55_000_000, {"جلفا": 3, "مرداویج": 3, "شاهین": 2}),
+    "کرج": (10, 42_000_000, {"گوهردشت": 4, "عظیمیه": 3, "مهرشهر": 3}),
+    "شیراز": (10, 47_000_000, {"معالی": 3, "ارم": 2, "قصردشت": 3}),
+}
+
+# property type -> (weight, area range, price factor against an apartment)
+PROPERTY_TYPES: Dict[str, Tuple[int, Tuple[int, int], float]] = {
+    "آپارتمان": (60, (45, 220), 1.0),
+    "ویلا": (12, (150, 600), 0.8),
+    "زمین": (10, (100, 1000), 0.5),
+    "مغازه": (10, (12, 120), 2.2),
+    "اداری": (8, (50, 300), 1.3),
+}
+
+# yearly rent is roughly this share of the sale price
+RENT_RATIO = 0.06
+RENT_SHARE = 0.25
+EXCHANGE_SHARE = 0.3
+
+# listings are scattered around their district's centroid with this spread (degrees, ~1 km)
+LOCATION_SPREAD = 0.009
+
+EXCHANGE_ITEMS = {"ماشین": 5, "خودرو": 3, "آپارتمان": 3, "زمین": 2, "طلا": 1, "ویلا": 1}
+DOCUMENT_TYPES = {"تک برگ": 8, "مشاع": 1, "وقفی": 1}
+
+FEATURES = ["نورگیر عالی", "نزدیک مترو", "دسترسی به مرکز خرید", "ویو ابدی", "کابینت هایگلاس", "کف سرامیک",
+            "نزدیک مدرسه", "محیط آرام", "لابی مجلل", "سیستم گرمایش از کف", "نقشه مناسب", "بازسازی شده"]
+
+
+def _pick(rng: random.Random, weights: Dict[str, int]) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _persian_digits(value: Any) -> str:
+    return str(value).translate(str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹"))
+
+
+def generate_listings(count: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """`count` raw Divar listings; the same seed always gives the same listings"""
+    rng = random.Random(seed)
+    # coordinates come from their own stream, so the other fields don't depend on them
+    geo_rng = random.Random(f"location-{seed}")
+    city_weights = {city: spec[0] for city, spec in CITIES.items()}
+    type_weights = {name: spec[0] for name, spec in PROPERTY_TYPES.items()}
+
+    for i in range(count):
+        city = _pick(rng, city_weights)
+        _, price_per_meter, districts = CITIES[city]
+        district = _pick(rng, districts)
+        property_type = _pick(rng, type_weights)
+        _, (area_min, area_max), price_factor = PROPERTY_TYPES[property_type]
+
+        area = int(rng.triangular(area_min, area_max, area_min + (area_max - area_min) * 0.3))
+        year_built = rng.randint(1365, 1403)
+        # newer buildings cost more; lognormal noise around the city price per meter
+        age_factor = 1.0 - (1403 - year_built) * 0.01
+        price = area * price_per_meter * price_factor * age_factor * rng.lognormvariate(0, 0.2)
+
+        transaction_type = "اجاره" if property_type != "زمین" and rng.random() < RENT_SHARE else "فروش"
+        if transaction_type == "اجاره":
+            price *= RENT_RATIO
+        price = int(round(price, -6))
+
+        has_rooms = property_type in ("آپارتمان", "ویلا")
+        total_floors = rng.randint(1, 12) if property_type == "آپارتمان" else rng.randint(1, 3)
+        open_to_exchange = transaction_type == "فروش" and rng.random() < EXCHANGE_SHARE
+        preferences = rng.sample(list(EXCHANGE_ITEMS), rng.randint(1, 2)) if open_to_exchange else []
+
+        center = DISTRICT_CENTERS.get(city, {}).get(district)
+        latitude = longitude = None
+        if center is not None:
+            latitude = round(geo_rng.gauss(center[0], LOCATION_SPREAD), 6)
+            longitude = round(geo_rng.gauss(center[1], LOCATION_SPREAD), 6)
+
+        features = rng.sample(FEATURES, 3)
+        description = f"{property_type} {_persian_digits(area)} متری در {district} {city}، " + "، ".join(features)
+        if open_to_exchange:
+            description += f"، قابل معاوضه با {' یا '.join(preferences)}"
+
+        yield {
+            "title": f"{property_type} {_persian_digits(area)} متری {district}",
+            "description": description,
+            "property_type": property_type,
+            "transaction_type": transaction_type,
+            "price": price,
+            "area": area,
+            "city": city,
+            "district": district,
+            "latitude": latitude,
+            "longitude": longitude,
+            "bedrooms": rng.choices([1, 2, 3, 4], weights=[3, 5, 3, 1])[0] if has_rooms else None,
+            "year_built": year_built,
+            "floor": rng.randint(0, total_floors) if property_type == "آپارتمان" else 0,
+            "total_floors": total_floors,
+            "units": rng.randint(1, 4) * total_floors if property_type == "آپارتمان" else None,
+            "document_type": _pick(rng, DOCUMENT_TYPES),
+            "has_parking": rng.random() < (0.75 if has_rooms else 0.3),
+            "has_elevator": property_type == "آپارتمان" and total_floors > 4 and rng.random() < 0.9,
+            "has_storage": rng.random() < 0.5,
+            "is_renovated": rng.random() < 0.15,
+            "open_to_exchange": open_to_exchange,
+            "exchange_preferences": preferences,
+            "source_link": f"https://divar.ir/v/synthetic-{seed}-{i}",
+            "image_url": None,
+        }
+
+
+def _amount(value: int) -> str:
+    """an amount in toman the way users write it (میلیارد or میلیون)"""
+    if value >= 1_000_000_000:
+        billions = round(value / 1_000_000_000, 1)
+        return f"{_persian_digits(int(billions) if billions.is_integer() else billions)} میلیارد"
+    return f"{_persian_digits(value // 1_000_000)} میلیون"
+
+
+def _amount_value(value: int) -> int:
+    if value >= 1_000_000_000:
+        return int(round(value / 1_000_000_000, 1) * 1_000_000_000)
+    return value // 1_000_000 * 1_000_000
+
+
+def generate_conversations(count: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    `count` scripted conversations: {"id", "turns": [{"message", "expected"}]}, where
+    expected holds the fields RegexExtractor.extract_all should return for the message.
+    """
+    rng = random.Random(seed)
+    city_weights = {city: spec[0] for city, spec in CITIES.items()}
+    searchable_types = ["آپارتمان", "ویلا", "مغازه", "زمین", "اداری"]
+
+    for n in range(count):
+        city = _pick(rng, city_weights)
+        _, price_per_meter, districts = CITIES[city]
+        district = rng.choice(list(districts))
+        property_type = rng.choice(searchable_types)
+        area = rng.choice([60, 80, 100, 120, 150, 200])
+        budget = int(area * price_per_meter * rng.uniform(0.8, 1.3))
+        turns: List[Dict[str, Any]] = []
+
+        def say(message: str, **expected):
+            turns.append({"message": message, "expected": expected})
+
+        kind = rng.choice(["search", "search", "rent", "range", "exchange"])
+        if kind == "exchange":
+            item = rng.choice(["ماشین", "خودرو", "طلا"])
+            value = rng.choice([800_000_000, 1_500_000_000, 2_000_000_000, 3_000_000_000])
+            say(f"میخوام {item} رو با خونه معاوضه کنم", transaction_type="معاوضه", wants_exchange=True)
+            say(f"ارزشش حدود {_amount(value)} تومنه", budget_max=_amount_value(value))
+            say(f"تو {city} باشه بهتره", city=city)
+        else:
+            transaction = "اجاره" if kind == "rent" else "خرید"
+            say(f"یه {property_type} تو {city} برای {transaction} میخوام",
+                city=city, property_type=property_type,
+                transaction_type="اجاره" if kind == "rent" else "فروش")
+            if kind == "range":
+                low = max(1, budget // 1_000_000_000 - 1)
+                high = low + rng.randint(1, 3)
+                say(f"بودجه‌ام بین {_persian_digits(low)} تا {_persian_digits(high)} میلیارد",
+                    budget_min=low * 1_000_000_000, budget_max=high * 1_000_000_000)
+            else:
+                if kind == "rent":
+                    budget = int(budget * RENT_RATIO)
+                say(f"تا {_amount(budget)} پول دارم", budget_max=_amount_value(budget))
+            say(f"حداقل {_persian_digits(area)} متر باشه", area_min=area)
+            say(f"منطقه {district} باشه", district=district)
+            if rng.random() < 0.5:
+                say("موارد دیگه هم داری؟")
+
+        yield {"id": f"conv-{seed}-{n}", "turns": turns}
+
+
+def write_jsonl(path: str, rows: Iterable[Dict[str, Any]]) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def build_catalog(listings: Iterable[Dict[str, Any]], catalog: Optional[PropertyCatalog] = None) -> PropertyCatalog:
+    """
+    In-memory catalog of raw listings, without the database.
+    The listings go through the same normalization as divar_ingest and the same mapping as a
+    divar_data row, so the catalog matches what a refresh would build after loading them.
+    """
+    from app.services.advertisements.app_property.property_manager import property_manager
+
+    catalog = catalog or PropertyCatalog()
+    for row_id, raw in enumerate(listings, 1):
+        row = dict(zip(INGEST_COLUMNS, divar_ingest_service.normalize_row(raw)))
+        row["id"] = row_id
+        catalog.add(property_manager._divar_record_values(row))
+    return catalog.freeze()
+
+
+def load_postgres(listings: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """upsert the listings into divar_data (keyed on source_link, so reloading is safe)"""
+    return divar_ingest_service.ingest(listings)
+
+
+if __name__ == "__main__":
+    # python -m app.services.advertisements.synthetic listings --count 10000 --out listings.jsonl [--load]
+    # python -m app.services.advertisements.synthetic conversations --count 200 --out conversations.jsonl
+    parser = argparse.ArgumentParser(description="deterministic synthetic listings and conversations")
+    parser.add_argument("kind", choices=["listings", "conversations"])
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="JSONL file to write")
+    parser.add_argument("--load", action="store_true", help="also load the listings into divar_data")
+    args = parser.parse_args()
+
+    generate = generate_listings if args.kind == "listings" else generate_conversations
+    if args.out:
+        print(f"{args.out}: {write_jsonl(args.out, generate(args.count, args.seed))} {args.kind}")
+    if args.load and args.kind == "listings":
+        report = load_postgres(generate(args.count, args.seed))
+        print(f"divar_data: {json.dumps(report, ensure_ascii=False)}")
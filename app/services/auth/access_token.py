@@ -4,7 +4,10 @@ from fastapi.params import Depends
 from jose import jwt
 from datetime import datetime, timedelta
 from typing import Optional
+import hashlib
+import time
 
+from app.core.cache import TTLCache
 from app.core.postgres_service import postgres_service
 
 # Pro-tip: Move these to your .env file soon!
@@ -14,6 +17,13 @@ ALGORITHM = "HS256"
 # This is the "callable" object that Depends needs
 security_scheme = HTTPBearer()
 
+# users rows by id; short ttl so changes made by other processes show up soon
+USER_CACHE_TTL_SECONDS = 60
+_user_cache = TTLCache(maxsize=10_000, ttl=USER_CACHE_TTL_SECONDS)
+
+# decoded payloads by token hash, each kept until the token's exp
+_token_cache = TTLCache(maxsize=10_000)
+
 
 def create_access_token(user_id: str):
     payload = {"sub": str(user_id), "exp": datetime.utcnow() + timedelta(days=7)}
@@ -21,17 +31,38 @@ def create_access_token(user_id: str):
 
 
 def decode_access_token(token: str):
+    key = hashlib.sha256(token.encode()).hexdigest()
+    payload = _token_cache.get(key)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except jwt.JWTError:
         return None
 
+    if "exp" in payload:
+        _token_cache.set(key, payload, ttl=payload["exp"] - time.time())
+    return payload
+
 
 def get_user_by_id(user_id: str):
+    user = _user_cache.get(str(user_id))
+    if user is not None:
+        return user
+
     # Ensure filters matches your UUID column in the 'users' table we created
     users = postgres_service.select("users", filters={"id": user_id}, limit=1)
-    return users[0] if users else None
+    if not users:
+        return None
+
+    _user_cache.set(str(user_id), users[0])
+    return users[0]
+
+
+def invalidate_user(user_id: str):
+    """drop the cached users row, call after the row changes"""
+    _user_cache.pop(str(user_id))
 
 
 def get_current_user(
@@ -1,23 +1,29 @@
 import os
 import random
 from datetime import datetime, timedelta
+from functools import lru_cache
 from fastapi import HTTPException
 from dotenv import load_dotenv
 from kavenegar import KavenegarAPI, APIException
 from app.core import postgres_service
-from app.services.auth.access_token import create_access_token
+from app.services.auth.access_token import create_access_token, invalidate_user
 from app.core.postgres_service import postgres_service
 
 
 load_dotenv()
 
 KAVENEGAR_API_KEY = os.getenv("KAVENEGAR_API_KEY")
-kavenegar_api = KavenegarAPI(KAVENEGAR_API_KEY)
+
+
+@lru_cache(maxsize=1)
+def get_kavenegar_api() -> KavenegarAPI:
+    """SMS client, created when the first code is sent"""
+    return KavenegarAPI(KAVENEGAR_API_KEY)
 
 
 def send_otp_sms(phone_number: str, code: str):
     try:
-        kavenegar_api.verify_lookup(
+        get_kavenegar_api().verify_lookup(
             {
                 "receptor": phone_number,
                 "template": "verify",
@@ -86,6 +92,8 @@ def verify_otp(phone_number: str, code: str) -> str:
 
     if users:
         user = users[0]
+        # a new login reads the users row fresh
+        invalidate_user(user["id"])
     else:
         user = postgres_service.insert(
             table="users",
@@ -1,7 +1,197 @@
+import collections
+import hashlib
+import heapq
+import json
+import math
 from app.models.property import Property, UserRequirements, PropertyScore, TransactionType
-from typing import List, Dict, Tuple
-from app.services.brain.scoring import PropertyScoringSystem
+from typing import Collection, List, Dict, Mapping, NamedTuple, Optional, Tuple
+import numpy as np
+from prometheus_client import Counter
+from app.services.brain.geography import nearest_city, place_center
+from app.services.brain.filter_index import Bounds, FilterIndex
+from app.services.brain.spatial import GridIndex
+from app.services.brain.text_search import TextIndex
+from app.services.brain.scoring import ComponentScores, PropertyScoringSystem, changed_requirements
 from app.services.advertisements.app_property.property_manager import property_manager
+from app.services.advertisements.derived_fields import normalize_location_key
+from app.core.cache import TTLCache
+from app.core.tracing import span
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+# decisions of recent searches, by requirements and catalog version
+SEARCH_CACHE_SIZE = 1024
+SEARCH_CACHE_TTL_SECONDS = 300
+# decisions ranking more listings than this are not cached (a cached decision keeps its
+# whole ranking, so a hit returns what the search itself would)
+SEARCH_CACHE_MAX_RESULTS = 2000
+
+SEARCH_CACHE_REQUESTS = Counter(
+    "search_cache_requests_total", "Decision engine result cache lookups", ["result"]
+)
+
+# last ranking of each chat session, reused when the user changes a requirement
+RANKING_SESSIONS = 256
+RANKING_TTL_SECONDS = 600
+
+# grid indexes of the listing lists searched by radius (the catalog's records, mostly)
+SPATIAL_INDEXES = 8
+# shorter lists (candidates of a hybrid search) are indexed for the one search only
+SPATIAL_INDEX_MIN_CACHED = 1000
+
+# filter column indexes of the listing lists searched (decision summaries and relaxed
+# requirements read them); built once per catalog like the text indexes
+FILTER_INDEXES = 2
+# a radius search with no result looks at this many nearest listings for a suggestion
+NEAREST_CANDIDATES = 200
+
+# full-text indexes of the listing lists searched with keywords; building one takes about
+# a second per 100k listings, so they are kept until the catalog is replaced
+TEXT_INDEXES = 2
+TEXT_INDEX_TTL_SECONDS = 6 * 3600
+
+# hybrid search: nearest listing texts to a free-form wish (catalog.semantic_index()),
+# merged with the structured ranking by reciprocal rank fusion
+SEMANTIC_CANDIDATES = 100
+# below this cosine similarity a listing is not taken as related to the wish
+MIN_SIMILARITY = 0.35
+RRF_K = 60
+
+RANKING_REQUESTS = Counter(
+    "incremental_rankings_total", "Session searches by how much of the last ranking was reused",
+    ["mode"]
+)
+
+
+def _at_least(old, new) -> bool:
+    return not old or (bool(new) and new >= old)
+
+
+def _at_most(old, new) -> bool:
+    return not old or (bool(new) and new <= old)
+
+
+def _newly_set(old, new) -> bool:
+    return not old
+
+
+def _raised(old, new) -> bool:
+    return bool(old) and (not new or new >= old)
+
+
+def _lowered(old, new) -> bool:
+    return bool(old) and (not new or new <= old)
+
+
+def _unset(old, new) -> bool:
+    return bool(old) and not new
+
+
+def _widened(old, new) -> bool:
+    # a radius search without a radius filters by name instead
+    return bool(old) and bool(new) and new >= old
+
+
+# How a filter requirement may change while only removing listings from what the hard
+# filters keep; the last candidates can then be filtered instead of the whole catalog.
+# A change to any other filter field (transaction_type, wants_exchange, radius_km)
+# filters again, as does a change of city or district in a radius search: the place is
+# then the centre of the circle, and moving it admits listings the last one left out.
+NARROWING_CHANGES = {
+    "budget_min": _at_least,
+    "budget_max": _at_most,
+    "area_min": _at_least,
+    "area_max": _at_most,
+    "year_built_min": _at_least,
+    "city": _newly_set,
+    "district": _newly_set,
+    "property_type": _newly_set,
+    "document_type": _newly_set,
+    "must_have_parking": _newly_set,
+    "must_have_elevator": _newly_set,
+    "must_have_storage": _newly_set,
+}
+FILTER_FIELDS = set(NARROWING_CHANGES) | {"transaction_type", "wants_exchange", "radius_km"}
+CENTRE_FIELDS = {"city", "district"}
+
+# How a filter requirement may change while only adding listings to what the hard filters
+# keep; the listings it adds are then found in the filter index and added to the last
+# candidates. Only one such change at a time, with the other filters unchanged.
+RELAXING_CHANGES = {
+    "budget_min": _lowered,
+    "budget_max": _raised,
+    "area_min": _lowered,
+    "area_max": _raised,
+    "year_built_min": _lowered,
+    "radius_km": _widened,
+    "district": _unset,
+    "property_type": _unset,
+    "document_type": _unset,
+    "must_have_parking": _unset,
+    "must_have_elevator": _unset,
+    "must_have_storage": _unset,
+}
+# listing column of each required feature
+FEATURE_COLUMNS = {
+    "must_have_parking": "has_parking",
+    "must_have_elevator": "has_elevator",
+    "must_have_storage": "has_storage",
+}
+
+
+def only_narrows(old: UserRequirements, new: UserRequirements) -> bool:
+    """True if the hard filters of `new` keep a subset of what those of `old` keep"""
+    radius_search = bool(old.radius_km or new.radius_km)
+    for name in changed_requirements(old, new) & FILTER_FIELDS:
+        if radius_search and name in CENTRE_FIELDS:
+            return False
+        narrows = NARROWING_CHANGES.get(name)
+        if narrows is None or not narrows(getattr(old, name), getattr(new, name)):
+            return False
+    return True
+
+
+def relaxed_requirement(old: UserRequirements, new: UserRequirements) -> Optional[str]:
+    """
+    The one filter field whose change makes the hard filters of `new` keep a superset of
+    what those of `old` keep, every other filter being unchanged; None otherwise.
+    """
+    changed = changed_requirements(old, new) & FILTER_FIELDS
+    if len(changed) != 1:
+        return None
+    name = changed.pop()
+    relaxes = RELAXING_CHANGES.get(name)
+    if relaxes is None or not relaxes(getattr(old, name), getattr(new, name)):
+        return None
+    if name in CENTRE_FIELDS and (old.radius_km or new.radius_km):
+        return None
+    return name
+
+
+def budget_bounds(req: UserRequirements) -> Bounds:
+    """prices the budget filter keeps, up to 10% over the maximum"""
+    return req.budget_min or None, int(req.budget_max * 1.1) if req.budget_max else None
+
+
+def area_bounds(req: UserRequirements) -> Bounds:
+    """areas the area filter keeps, 20 sqm either side of the range"""
+    return (max(0, req.area_min - 20) if req.area_min else None,
+            req.area_max + 20 if req.area_max else None)
+
+
+class RankingState(NamedTuple):
+    """what a session's last search filtered and scored"""
+    catalog_version: int
+    candidates: List[Property]
+    components: ComponentScores
+
+
+def requirements_key(requirements: UserRequirements) -> str:
+    """canonical hash of the requirements; fields left at their default don't change it"""
+    values = requirements.model_dump(mode='json', exclude_defaults=True)
+    data = json.dumps(values, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
 
 
 
@@ -13,14 +203,30 @@ class DecisionEngine:
 
     def __init__(self):
         self.scoring_system = PropertyScoringSystem()
+        self.result_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL_SECONDS)
+        self.rankings = TTLCache(maxsize=RANKING_SESSIONS, ttl=RANKING_TTL_SECONDS)
+        self.spatial_indexes = TTLCache(maxsize=SPATIAL_INDEXES, ttl=RANKING_TTL_SECONDS)
+        self.filter_indexes = TTLCache(maxsize=FILTER_INDEXES, ttl=TEXT_INDEX_TTL_SECONDS)
+        self.text_indexes = TTLCache(maxsize=TEXT_INDEXES, ttl=TEXT_INDEX_TTL_SECONDS)
 
     def make_decision(
             self,
             properties: List[Property],
-            requirements: UserRequirements
+            requirements: UserRequirements,
+            catalog_version: Optional[int] = None,
+            exclude_ids: Collection[str] = (),
+            session_id: Optional[str] = None
     ) -> Dict:
         """
         Make a decision based on the properties and user requirements.
+        Listings in exclude_ids (already shown) are left out of 'properties'.
+
+        With the catalog_version of `properties`, the decision is cached: a later search
+        with equal requirements reuses it (unless it ranked over SEARCH_CACHE_MAX_RESULTS listings).
+        With a session_id as well, the session's next search starts from this one: narrower
+        filters only filter its candidates, a relaxed filter only adds the listings it admits
+        (found in the filter index), and only the score components whose requirements
+        changed (plus newly admitted listings) are scored again.
 
         Returns:
             {
@@ -31,7 +237,31 @@ class DecisionEngine:
                 'filters_applied': dict
             }
         """
-
+        exclude_ids = set(exclude_ids)
+        if catalog_version is None:
+            return self._exclude(self._decide(properties, requirements), exclude_ids)
+
+        key = (catalog_version, requirements_key(requirements))
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            SEARCH_CACHE_REQUESTS.labels("hit").inc()
+            return self._exclude(cached, exclude_ids)
+        SEARCH_CACHE_REQUESTS.labels("miss").inc()
+
+        decision = self._decide(properties, requirements, catalog_version, session_id)
+        if len(decision.get('properties', [])) <= SEARCH_CACHE_MAX_RESULTS:
+            self.result_cache.set(key, decision)
+        return self._exclude(decision, exclude_ids)
+
+    @staticmethod
+    def _exclude(decision: Dict, exclude_ids: Collection[str]) -> Dict:
+        """the decision without the excluded listings (a copy; cached decisions are shared)"""
+        result = dict(decision)
+        result['properties'] = [s for s in decision.get('properties', []) if s.property_id not in exclude_ids]
+        return result
+
+    def _decide(self, properties: List[Property], requirements: UserRequirements,
+                catalog_version: Optional[int] = None, session_id: Optional[str] = None) -> Dict:
         # Step 1: Checking the adequacy of information
         missing_critical = self._check_missing_critical_info(requirements)
         if missing_critical:
@@ -43,17 +273,48 @@ class DecisionEngine:
                 'recommendations': []
             }
 
-        # Step 2: Filtering properties (hard decisions)
-        filtered_properties, filters_applied = self._apply_hard_filters(
-            properties,
-            requirements
-        )
+        # the session's last ranking, if it was made on this catalog
+        tracked = session_id is not None and catalog_version is not None
+        previous = None
+        if tracked:
+            previous = self.rankings.get(session_id)
+            if previous is not None and previous.catalog_version != catalog_version:
+                previous = None
 
-        
-        # filtered_properties, filters_applied = self._apply_hard_filters(
-        #     properties,
-        #     requirements
-        # )
+        # Step 2: Filtering properties (hard decisions)
+        narrowed = previous is not None and only_narrows(previous.components.requirements, requirements)
+        relaxed = None
+        if previous is not None and not narrowed:
+            relaxed = relaxed_requirement(previous.components.requirements, requirements)
+        with span("filter"):
+            if relaxed is not None:
+                RANKING_REQUESTS.labels("relaxed").inc()
+                # the last candidates all still pass; add the ones the relaxed filter admits
+                candidates = previous.candidates
+                added, filters_applied, other_cities = self._apply_hard_filters(
+                    self._relaxed_additions(properties, relaxed, previous.components.requirements, requirements),
+                    requirements
+                )
+                position = self._filter_index(properties).position
+                filtered_properties = list(heapq.merge(candidates, added, key=position))
+            else:
+                if narrowed:
+                    RANKING_REQUESTS.labels("narrowed").inc()
+                    candidates = previous.candidates
+                else:
+                    if tracked:
+                        RANKING_REQUESTS.labels("refiltered" if previous is not None else "full").inc()
+                    candidates = properties
+                filtered_properties, filters_applied, other_cities = self._apply_hard_filters(
+                    candidates,
+                    requirements
+                )
+            if not filtered_properties and filters_applied['city'] and candidates is not properties:
+                # the narrowed candidates hold no other city to fall back to
+                filtered_properties, filters_applied, other_cities = self._apply_hard_filters(
+                    properties,
+                    requirements
+                )
 
         # Step 3: Scoring properties (soft decisions)
         if not filtered_properties:
@@ -61,37 +322,17 @@ class DecisionEngine:
             # Smart Search: If not found in destination city, check other cities
             # ----------------------------------------------------------------
             if filters_applied.get('city'):
-                print("search in other city")
-                # Copy of requirements without city
-                relaxed_req = requirements.model_copy()
-                relaxed_req.city = None
-
-                # Re-filter without city
-                global_props, _ = self._apply_hard_filters(properties, relaxed_req)
-                
-                if global_props:
-                    # rank and find best matches
-                    scored_global = self.scoring_system.rank_properties(global_props, relaxed_req)
-                    
-                    found_city = "شهرهای دیگر"
-                    if scored_global:
-                         p = property_manager.get_property_by_id(scored_global[0].property_id)
-                         if p: found_city = p.city.strip()
-
-                    return {
-                        'status': 'success',
-                        'city_mismatch': True,
-                        'original_city': requirements.city,
-                        'found_city': found_city,
-                        'properties': scored_global,
-                        'decision_summary': {
-                            'reason': f'در {requirements.city} پیدا نشد، اما {len(global_props)} مورد در {found_city} پیدا شد.',
-                            'is_global_fallback': True
-                        },
-                        'recommendations': [
-                            f"در {requirements.city} ملکی با این مشخصات نداریم، اما این موارد در '{found_city}' کاملاً با بودجه شما سازگاره."
-                        ]
-                    }
+                fallback = self._other_city_decision(properties, other_cities, requirements)
+                if fallback is not None:
+                    return fallback
+
+            recommendations = self._generate_relaxation_suggestions(requirements, filters_applied)
+            if filters_applied.get('radius'):
+                nearest = self.nearest_properties(properties, requirements, k=1)
+                if nearest:
+                    distance = nearest[0][1]
+                    recommendations.insert(0, f"نزدیک‌ترین ملک مناسب {distance:.1f} کیلومتر فاصله دارد؛ "
+                                              f"شعاع جستجو را به {math.ceil(distance)} کیلومتر برسانید")
 
             return {
                 'status': 'no_results',
@@ -101,17 +342,23 @@ class DecisionEngine:
                     'filters_applied': filters_applied,
                     'reason': 'هیچ ملکی با فیلترهای الزامی شما مطابقت نداشت'
                 },
-                'recommendations': self._generate_relaxation_suggestions(
-                    requirements,
-                    filters_applied
-                )
+                'recommendations': recommendations
             }
 
+        # keywords are matched against the listing texts
+        with span("text"):
+            relevance = self._text_relevance(properties, filtered_properties, requirements)
+
         # scoring
-        scored_properties = self.scoring_system.rank_properties(
-            filtered_properties,
-            requirements
-        )
+        with span("score"):
+            scored_properties, components = self.scoring_system.rank_incremental(
+                filtered_properties,
+                requirements,
+                previous.components if previous is not None else None,
+                relevance
+            )
+        if tracked:
+            self.rankings.set(session_id, RankingState(catalog_version, filtered_properties, components))
 
         # Step 4: Analyzing results and generating recommendations
         decision_summary = self._create_decision_summary(
@@ -121,6 +368,8 @@ class DecisionEngine:
             filters_applied,
             requirements
         )
+        if relevance is not None:
+            decision_summary['keyword_matches'] = len(relevance)
 
         recommendations = self._generate_recommendations(
             scored_properties,
@@ -135,6 +384,182 @@ class DecisionEngine:
             'filters_applied': filters_applied
         }
 
+    def _other_city_decision(self, properties: List[Property], other_cities: List[Property],
+                             requirements: UserRequirements) -> Optional[Dict]:
+        """
+        Smart Search: nothing matched in the requested city, so offer the listings of the
+        nearest city (see geography.CITY_CENTERS) where every other filter matched.
+        other_cities is what passed those filters in the same filtering pass.
+        """
+        counts = collections.Counter(p.city_key for p in other_cities)
+        target_city = normalize_location_key(requirements.city)
+        found_key = nearest_city(target_city, counts)
+        if found_key is None:
+            return None
+        logger.debug("no match in %s, offering %s (%d matches)", requirements.city, found_key, counts[found_key])
+
+        in_found_city = [p for p in other_cities if p.city_key == found_key]
+        # ranked as a search without a city
+        relaxed_req = requirements.model_copy()
+        relaxed_req.city = None
+        relevance = self._text_relevance(properties, in_found_city, relaxed_req)
+        scored = self.scoring_system.rank_properties(in_found_city, relaxed_req, relevance)
+        found_city = in_found_city[0].city.strip()
+
+        return {
+            'status': 'success',
+            'city_mismatch': True,
+            'original_city': requirements.city,
+            'found_city': found_city,
+            'properties': scored,
+            'decision_summary': {
+                'reason': f'در {requirements.city} پیدا نشد، اما {len(in_found_city)} مورد در {found_city} پیدا شد.',
+                'is_global_fallback': True,
+                'matches_by_city': dict(counts)
+            },
+            'recommendations': [
+                f"در {requirements.city} ملکی با این مشخصات نداریم، اما این موارد در '{found_city}' کاملاً با بودجه شما سازگاره."
+            ]
+        }
+
+    def _spatial_index(self, properties: List[Property]) -> GridIndex:
+        """grid index of a listing list, kept while the same list is searched again"""
+        if len(properties) < SPATIAL_INDEX_MIN_CACHED:
+            return GridIndex.from_properties(properties)
+        cached = self.spatial_indexes.get(id(properties))
+        if cached is not None and cached[0] is properties:
+            return cached[1]
+        index = GridIndex.from_properties(properties)
+        # the list is kept with its index, so its id is not reused meanwhile
+        self.spatial_indexes.set(id(properties), (properties, index))
+        return index
+
+    def _filter_index(self, properties: List[Property]) -> FilterIndex:
+        """filter column index of a listing list, kept while the same list is searched again"""
+        if len(properties) < SPATIAL_INDEX_MIN_CACHED:
+            return FilterIndex(properties)
+        cached = self.filter_indexes.get(id(properties))
+        if cached is not None and cached[0] is properties:
+            return cached[1]
+        index = FilterIndex(properties)
+        self.filter_indexes.set(id(properties), (properties, index))
+        return index
+
+    def _relaxed_additions(self, properties: List[Property], name: str,
+                           old: UserRequirements, new: UserRequirements) -> List[Property]:
+        """
+        The listings of `properties` that the relaxed filter `name` keeps for `new` but not
+        for `old` (see relaxed_requirement), in list order; the other filters are still to
+        be applied to them.
+        """
+        index = self._filter_index(properties)
+        if name in ("budget_min", "budget_max"):
+            positions = index.widened("price", budget_bounds(old), budget_bounds(new))
+        elif name in ("area_min", "area_max"):
+            positions = index.widened("area", area_bounds(old), area_bounds(new))
+        elif name == "year_built_min":
+            positions = index.widened("year_built", (old.year_built_min, None), (new.year_built_min or None, None))
+            if not new.year_built_min:
+                positions = np.union1d(positions, index.missing("year_built"))
+        elif name == "radius_km":
+            center = place_center(new.city, new.district)
+            if center is None:
+                return []
+            spatial = self._spatial_index(properties)
+            positions = spatial.within(center[0], center[1], new.radius_km)
+            positions = positions[spatial.distances(positions, center[0], center[1]) > old.radius_km]
+        elif name == "district":
+            positions = index.not_equal("district_key", normalize_location_key(old.district))
+        elif name in FEATURE_COLUMNS:
+            positions = index.equal(FEATURE_COLUMNS[name], False)
+        else:
+            positions = index.not_equal(name, getattr(old, name))
+        return [properties[i] for i in positions.tolist()]
+
+    def _text_index(self, properties: List[Property]) -> TextIndex:
+        """full-text index of a listing list, kept while the same list is searched again"""
+        cached = self.text_indexes.get(id(properties))
+        if cached is not None and cached[0] is properties:
+            return cached[1]
+        index = TextIndex.from_properties(properties)
+        logger.debug("text index built for %d listings", len(index))
+        self.text_indexes.set(id(properties), (properties, index))
+        return index
+
+    def _text_relevance(self, properties: List[Property], candidates: List[Property],
+                        req: UserRequirements) -> Optional[Mapping[str, float]]:
+        """
+        relevance of the candidates' texts to req.keywords (see TextIndex.relevance),
+        from the index of `properties`, which holds them; None without keywords
+        """
+        if not req.keywords:
+            return None
+        index = self._text_index(properties)
+        return index.relevance(" ".join(req.keywords), [p.id for p in candidates])
+
+    def _within_radius(self, properties: List[Property], req: UserRequirements) -> List[Property]:
+        """the listings within req.radius_km of the place the requirements name, in list order"""
+        lat, lon = place_center(req.city, req.district)
+        positions = self._spatial_index(properties).within(lat, lon, req.radius_km)
+        return [properties[i] for i in positions.tolist()]
+
+    def nearest_properties(
+            self,
+            properties: List[Property],
+            requirements: UserRequirements,
+            k: int = 10
+    ) -> List[Tuple[Property, float]]:
+        """
+        The k listings nearest to the place the requirements name that pass their other
+        hard filters, as (listing, distance km), nearest first. Looks at the
+        NEAREST_CANDIDATES nearest listings at most.
+        """
+        center = place_center(requirements.city, requirements.district)
+        if center is None:
+            return []
+        nearest = self._spatial_index(properties).nearest(center[0], center[1], max(k, NEAREST_CANDIDATES))
+        candidates = [properties[i] for i, _ in nearest]
+        distances = {id(properties[i]): distance for i, distance in nearest}
+
+        # location is the distance here, not the names
+        anywhere = requirements.model_copy(update={"city": None, "district": None, "radius_km": None})
+        matching, _, _ = self._apply_hard_filters(candidates, anywhere)
+        return [(p, distances[id(p)]) for p in matching[:k]]
+
+    def hybrid_search(
+            self,
+            catalog,
+            requirements: UserRequirements,
+            text: str,
+            k: int = 10
+    ) -> List[Tuple[str, float]]:
+        """
+        Listings for a free-form wish: the listings whose texts are nearest to `text`
+        (semantic index of the catalog) that pass the hard filters of the requirements,
+        merged with the structured ranking of the requirements (make_decision, when they
+        are enough for a search). Ranks are merged by reciprocal rank fusion, so listings
+        high in both lists come first.
+        Returns (property id, fused score), best first.
+        """
+        records = catalog.records
+        with span("semantic"):
+            nearest = catalog.semantic_index().search_text(text, SEMANTIC_CANDIDATES)
+            semantic = [records[row] for row, similarity in nearest if similarity >= MIN_SIMILARITY]
+            semantic, _, _ = self._apply_hard_filters(semantic, requirements)
+
+        structured = []
+        if not self._check_missing_critical_info(requirements):
+            decision = self.make_decision(records, requirements, catalog_version=catalog.version)
+            structured = [s.property_id for s in decision['properties'][:SEMANTIC_CANDIDATES]]
+
+        fused: Dict[str, float] = collections.defaultdict(float)
+        for ranking in (structured, [p.id for p in semantic]):
+            for rank, property_id in enumerate(ranking, 1):
+                fused[property_id] += 1 / (RRF_K + rank)
+        logger.debug("hybrid search: %d structured, %d semantic, %d merged",
+                     len(structured), len(semantic), len(fused))
+        return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+
     def _check_missing_critical_info(self, req: UserRequirements) -> List[str]:
         """Check for missing critical information"""
         missing = []
@@ -150,13 +575,17 @@ class DecisionEngine:
             self,
             properties: List[Property],
             req: UserRequirements
-    ) -> Tuple[List[Property], Dict]:
+    ) -> Tuple[List[Property], Dict, Optional[List[Property]]]:
         """
         Hard Filters (Complete Removal)
         This is where the hard decisions are made
+
+        The city filter goes last, so the listings that pass every other filter are
+        returned too (None without a city filter) for the other-city fallback.
         """
 
         filters_applied = {
+            'radius': False,
             'budget': False,
             'city': False,
             'district': False,
@@ -173,6 +602,12 @@ class DecisionEngine:
 
         filtered = properties
 
+        # Radius filter: listings near the district (or city) replace the name filters
+        near = bool(req.radius_km) and place_center(req.city, req.district) is not None
+        if near:
+            filtered = self._within_radius(filtered, req)
+            filters_applied['radius'] = True
+
         # Exchange filter
         if req.wants_exchange:
             filtered = [p for p in filtered if p.open_to_exchange]
@@ -195,33 +630,22 @@ class DecisionEngine:
             filters_applied['transaction_type'] = True
 
         # Budget Filter (Range)
-        if req.budget_max:
+        budget_min, budget_max = budget_bounds(req)
+        if budget_max:
             # Allow up to 10% more than the max budget
-            budget_tolerance = int(req.budget_max * 1.1)
-            filtered = [p for p in filtered if p.price <= budget_tolerance]
+            filtered = [p for p in filtered if p.price <= budget_max]
             filters_applied['budget'] = True
 
-        if req.budget_min:
+        if budget_min:
             # Strict minimum budget filter
             # (No downward tolerance by default, or maybe 5% for close matches)
-            filtered = [p for p in filtered if p.price >= req.budget_min]
+            filtered = [p for p in filtered if p.price >= budget_min]
             filters_applied['budget'] = True
 
-        # City Filter (Required)
-        if req.city:
-            target_city = req.city.strip().lower()
-            filtered = [
-                p for p in filtered
-                if p.city and p.city.strip().lower() == target_city
-            ]
-            filters_applied['city'] = True
-
         # Region filter (if specified)
-        if req.district:
-            filtered = [
-                p for p in filtered
-                if p.district.lower() == req.district.lower()
-            ]
+        if req.district and not near:
+            target_district = normalize_location_key(req.district)
+            filtered = [p for p in filtered if p.district_key == target_district]
             filters_applied['district'] = True
 
         # Property Type Filter (Optional - Only if specified by user)
@@ -233,16 +657,15 @@ class DecisionEngine:
             filters_applied['property_type'] = True
 
         # Area Filter (with tolerance)
+        area_min, area_max = area_bounds(req)
         if req.area_min:
             # Allow up to 20 sqm less than the minimum
-            area_tolerance = max(0, req.area_min - 20)
-            filtered = [p for p in filtered if p.area >= area_tolerance]
+            filtered = [p for p in filtered if p.area >= area_min]
             filters_applied['area'] = True
             
         if req.area_max:
             # Allow up to 20 sqm more than the maximum
-            area_max_tolerance = req.area_max + 20
-            filtered = [p for p in filtered if p.area <= area_max_tolerance]
+            filtered = [p for p in filtered if p.area <= area_max]
             filters_applied['area'] = True
 
         # Year Built Filter
@@ -274,7 +697,15 @@ class DecisionEngine:
             filtered = [p for p in filtered if p.has_storage]
             filters_applied['must_have_storage'] = True
 
-        return filtered, filters_applied
+        # City Filter (Required)
+        other_cities = None
+        if req.city and not near:
+            other_cities = filtered
+            target_city = normalize_location_key(req.city)
+            filtered = [p for p in filtered if p.city_key == target_city]
+            filters_applied['city'] = True
+
+        return filtered, filters_applied, other_cities
 
     def _create_decision_summary(
             self,
@@ -284,25 +715,20 @@ class DecisionEngine:
             filters_applied: Dict,
             requirements: UserRequirements
     ) -> Dict:
-        """Building a Decision Summary"""
+        """
+        Building a Decision Summary
+        filters_stats has, for each applied filter, how many listings of all_properties it
+        keeps and removes on its own, counted in the filter index (no pass over the list).
+        """
 
-        # Number of properties removed at each stage
+        index = self._filter_index(all_properties)
         filters_stats = {}
-        temp_props = all_properties
-
         for filter_name, applied in filters_applied.items():
             if applied:
-                before_count = len(temp_props)
-                # Apply filter for stats
-                temp_props = self._apply_single_filter(
-                    temp_props,
-                    filter_name,
-                    requirements
-                )
-                after_count = len(temp_props)
+                remaining = self._filter_count(all_properties, index, filter_name, requirements)
                 filters_stats[filter_name] = {
-                    'removed': before_count - after_count,
-                    'remaining': after_count
+                    'removed': index.size - remaining,
+                    'remaining': remaining
                 }
 
         # Best and worst match
@@ -397,36 +823,40 @@ class DecisionEngine:
 
         return suggestions
 
-    def _apply_single_filter(
+    def _filter_count(
             self,
             properties: List[Property],
+            index: FilterIndex,
             filter_name: str,
             req: UserRequirements
-    ) -> List[Property]:
-        """اعمال یک فیلتر برای محاسبه آمار"""
-
-        if filter_name == 'budget':
-            res = properties
-            if req.budget_max:
-                res = [p for p in res if p.price <= req.budget_max]
-            if req.budget_min:
-                res = [p for p in res if p.price >= req.budget_min]
-            return res
-        elif filter_name == 'city' and req.city:
-            return [p for p in properties if p.city.lower() == req.city.lower()]
-        elif filter_name == 'district' and req.district:
-            return [p for p in properties if p.district.lower() == req.district.lower()]
-        elif filter_name == 'property_type' and req.property_type:
-            return [p for p in properties if p.property_type == req.property_type]
-        elif filter_name == 'area' and req.area_min:
-            return [p for p in properties if p.area >= req.area_min]
-        elif filter_name == 'year_built' and req.year_built_min:
-            return [p for p in properties if p.year_built and p.year_built >= req.year_built_min]
-        elif filter_name == 'must_have_parking':
-            return [p for p in properties if p.has_parking]
-        elif filter_name == 'must_have_elevator':
-            return [p for p in properties if p.has_elevator]
-        elif filter_name == 'must_have_storage':
-            return [p for p in properties if p.has_storage]
-
-        return properties
\ No newline at end of file
+    ) -> int:
+        """how many of the indexed properties one hard filter keeps (for the summary)"""
+
+        if filter_name == 'radius':
+            lat, lon = place_center(req.city, req.district)
+            return len(self._spatial_index(properties).within(lat, lon, req.radius_km))
+        elif filter_name == 'must_be_exchange':
+            return index.count_equal('open_to_exchange', True)
+        elif filter_name == 'transaction_type':
+            kept = index.equal('transaction_type', req.transaction_type)
+            if req.wants_exchange:
+                exchange_sales = np.intersect1d(index.equal('transaction_type', TransactionType.SALE),
+                                                index.equal('open_to_exchange', True), assume_unique=True)
+                kept = np.union1d(kept, exchange_sales)
+            return len(kept)
+        elif filter_name == 'budget':
+            return index.count_between('price', *budget_bounds(req))
+        elif filter_name == 'area':
+            return index.count_between('area', *area_bounds(req))
+        elif filter_name == 'year_built':
+            return index.count_between('year_built', req.year_built_min)
+        elif filter_name == 'city':
+            return index.count_equal('city_key', normalize_location_key(req.city))
+        elif filter_name == 'district':
+            return index.count_equal('district_key', normalize_location_key(req.district))
+        elif filter_name in ('property_type', 'document_type'):
+            return index.count_equal(filter_name, getattr(req, filter_name))
+        elif filter_name in FEATURE_COLUMNS:
+            return index.count_equal(FEATURE_COLUMNS[filter_name], True)
+
+        return index.size
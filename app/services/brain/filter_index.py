@@ -0,0 +1,98 @@
+import collections
+import math
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+
+# columns the hard filters compare against a bound, and those they compare for equality
+RANGE_COLUMNS = ("price", "area", "year_built")
+GROUP_COLUMNS = ("transaction_type", "property_type", "document_type", "city_key", "district_key")
+FLAG_COLUMNS = ("open_to_exchange", "has_parking", "has_elevator", "has_storage")
+
+Bounds = Tuple[Optional[float], Optional[float]]
+
+
+def _group_key(value):
+    # enum members and their plain values (catalog records hold either) go to one group
+    return getattr(value, "value", value)
+
+
+class FilterIndex:
+    """
+    The hard-filter columns of a list of listings: each range column sorted, so the listings
+    between two bounds are found by binary search, and each equality column grouped by value.
+    Lets the decision engine count what a filter keeps, and find the listings a relaxed
+    filter newly admits, without a pass over the list.
+    Positions returned are indexes into the list the index was built from, in list order.
+    """
+
+    def __init__(self, properties: Sequence):
+        self.size = len(properties)
+        self._positions = {id(p): i for i, p in enumerate(properties)}
+
+        self._sorted: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._missing: Dict[str, np.ndarray] = {}
+        for name in RANGE_COLUMNS:
+            values = np.array([math.nan if getattr(p, name) is None else getattr(p, name) for p in properties],
+                              dtype=np.float64)
+            absent = np.isnan(values)
+            self._missing[name] = np.flatnonzero(absent)
+            present = np.flatnonzero(~absent)
+            order = present[np.argsort(values[present], kind="stable")]
+            self._sorted[name] = (values[order], order)
+
+        self._groups: Dict[str, Dict] = {}
+        for name in GROUP_COLUMNS + FLAG_COLUMNS:
+            groups = collections.defaultdict(list)
+            flag = name in FLAG_COLUMNS
+            for i, p in enumerate(properties):
+                value = getattr(p, name)
+                groups[bool(value) if flag else _group_key(value)].append(i)
+            self._groups[name] = {key: np.array(rows, dtype=np.int64) for key, rows in groups.items()}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def position(self, prop) -> int:
+        """where a listing of the indexed list is in it"""
+        return self._positions[id(prop)]
+
+    def _slice(self, name: str, low: Optional[float], high: Optional[float],
+               include_low: bool, include_high: bool) -> Tuple[int, int]:
+        values, _ = self._sorted[name]
+        start = 0 if low is None else int(np.searchsorted(values, low, side="left" if include_low else "right"))
+        stop = len(values) if high is None else int(np.searchsorted(values, high, side="right" if include_high else "left"))
+        return start, max(start, stop)
+
+    def between(self, name: str, low: Optional[float] = None, high: Optional[float] = None,
+                include_low: bool = True, include_high: bool = True) -> np.ndarray:
+        """positions whose `name` lies between the bounds (None: unbounded); missing values never do"""
+        start, stop = self._slice(name, low, high, include_low, include_high)
+        return np.sort(self._sorted[name][1][start:stop])
+
+    def count_between(self, name: str, low: Optional[float] = None, high: Optional[float] = None) -> int:
+        start, stop = self._slice(name, low, high, True, True)
+        return stop - start
+
+    def missing(self, name: str) -> np.ndarray:
+        """positions without a value for a range column"""
+        return self._missing[name]
+
+    def equal(self, name: str, value) -> np.ndarray:
+        key = bool(value) if name in FLAG_COLUMNS else _group_key(value)
+        return self._groups[name].get(key, np.empty(0, dtype=np.int64))
+
+    def count_equal(self, name: str, value) -> int:
+        return len(self.equal(name, value))
+
+    def not_equal(self, name: str, value) -> np.ndarray:
+        return np.setdiff1d(np.arange(self.size, dtype=np.int64), self.equal(name, value), assume_unique=True)
+
+    def widened(self, name: str, old: Bounds, new: Bounds) -> np.ndarray:
+        """positions between the `new` bounds of a range column but not the `old` ones it contains"""
+        (old_low, old_high), (new_low, new_high) = old, new
+        parts = []
+        if old_low is not None and (new_low is None or new_low < old_low):
+            parts.append(self.between(name, new_low, old_low, include_high=False))
+        if old_high is not None and (new_high is None or new_high > old_high):
+            parts.append(self.between(name, old_high, new_high, include_low=False))
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
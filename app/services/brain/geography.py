@@ -0,0 +1,163 @@
+import math
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from app.services.advertisements.derived_fields import normalize_location_key
+
+# Approximate centre (lat, lon) of the cities listings come from. Used to suggest the
+# nearest other city when a search finds nothing in the one asked for.
+CITY_CENTERS: Dict[str, Tuple[float, float]] = {
+    "تهران": (35.6892, 51.3890),
+    "کرج": (35.8400, 50.9391),
+    "قم": (34.6416, 50.8746),
+    "قزوین": (36.2688, 50.0041),
+    "کاشان": (33.9850, 51.4100),
+    "سمنان": (35.5769, 53.3970),
+    "مشهد": (36.2605, 59.6168),
+    "بجنورد": (37.4747, 57.3290),
+    "بیرجند": (32.8663, 59.2211),
+    "اصفهان": (32.6546, 51.6680),
+    "شهرکرد": (32.3256, 50.8644),
+    "یزد": (31.8974, 54.3569),
+    "شیراز": (29.5918, 52.5837),
+    "یاسوج": (30.6682, 51.5880),
+    "بوشهر": (28.9234, 50.8203),
+    "بندرعباس": (27.1832, 56.2666),
+    "کرمان": (30.2839, 57.0834),
+    "زاهدان": (29.4963, 60.8629),
+    "اهواز": (31.3183, 48.6706),
+    "خرم آباد": (33.4878, 48.3558),
+    "ایلام": (33.6374, 46.4227),
+    "کرمانشاه": (34.3142, 47.0650),
+    "همدان": (34.7992, 48.5146),
+    "اراک": (34.0917, 49.6892),
+    "سنندج": (35.3219, 46.9862),
+    "زنجان": (36.6736, 48.4787),
+    "تبریز": (38.0800, 46.2919),
+    "ارومیه": (37.5527, 45.0761),
+    "اردبیل": (38.2498, 48.2933),
+    "رشت": (37.2808, 49.5832),
+    "ساری": (36.5633, 53.0601),
+    "آمل": (36.4696, 52.3507),
+    "بابل": (36.5514, 52.6789),
+    "گرگان": (36.8427, 54.4439),
+}
+
+# Approximate centroid (lat, lon) of districts, by city. Listings without coordinates of
+# their own are placed at their district's centroid, and a search "near" a district
+# measures distances from it.
+DISTRICT_CENTERS: Dict[str, Dict[str, Tuple[float, float]]] = {
+    "تهران": {
+        "ونک": (35.7575, 51.4100),
+        "سعادت آباد": (35.7800, 51.3770),
+        "پاسداران": (35.7700, 51.4650),
+        "نیاوران": (35.8150, 51.4700),
+        "پونک": (35.7620, 51.3310),
+        "نارمک": (35.7430, 51.5050),
+        "تجریش": (35.8040, 51.4330),
+        "زعفرانیه": (35.8050, 51.4150),
+        "ولنجک": (35.8070, 51.4020),
+        "الهیه": (35.7900, 51.4300),
+        "جردن": (35.7710, 51.4170),
+        "میرداماد": (35.7600, 51.4350),
+        "یوسف آباد": (35.7320, 51.4030),
+        "شهرک غرب": (35.7570, 51.3650),
+        "جنت آباد": (35.7530, 51.3050),
+        "ستارخان": (35.7060, 51.3600),
+        "تهرانپارس": (35.7400, 51.5300),
+    },
+    "گرگان": {
+        "ناهارخوران": (36.8100, 54.4580),
+        "گلشهر": (36.8280, 54.4140),
+        "عدالت": (36.8330, 54.4600),
+        "گرگانپارس": (36.8500, 54.4200),
+        "صیاد شیرازی": (36.8380, 54.4450),
+        "نهضت": (36.8420, 54.4320),
+    },
+    "مشهد": {
+        "احمدآباد": (36.3000, 59.5750),
+        "سجاد": (36.3200, 59.5500),
+        "هاشمیه": (36.3200, 59.5300),
+        "طبرسی": (36.3050, 59.6350),
+    },
+    "اصفهان": {
+        "جلفا": (32.6350, 51.6550),
+        "مرداویج": (32.6250, 51.6800),
+        "شاهین": (32.8600, 51.5500),
+    },
+    "کرج": {
+        "گوهردشت": (35.8300, 50.9300),
+        "عظیمیه": (35.8400, 51.0000),
+        "مهرشهر": (35.8200, 50.9000),
+    },
+    "شیراز": {
+        "معالی": (29.6300, 52.4900),
+        "ارم": (29.6360, 52.5250),
+        "قصردشت": (29.6300, 52.5100),
+    },
+}
+
+EARTH_RADIUS_KM = 6371.0
+
+# the same tables by location key (see normalize_location_key)
+_CENTERS_BY_KEY = {normalize_location_key(city): center for city, center in CITY_CENTERS.items()}
+_DISTRICTS_BY_KEY = {
+    (normalize_location_key(city), normalize_location_key(district)): center
+    for city, districts in DISTRICT_CENTERS.items() for district, center in districts.items()
+}
+
+
+def distance_km(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    """great-circle distance between two (lat, lon) points"""
+    lat1, lon1 = map(math.radians, a)
+    lat2, lon2 = map(math.radians, b)
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+@lru_cache(maxsize=256)
+def city_distance_km(city_key: Optional[str], other_key: Optional[str]) -> Optional[float]:
+    """distance between two cities by location key; None if either is not in CITY_CENTERS"""
+    a, b = _CENTERS_BY_KEY.get(city_key), _CENTERS_BY_KEY.get(other_key)
+    if a is None or b is None:
+        return None
+    return distance_km(a, b)
+
+
+def nearest_city(city_key: Optional[str], counts: Dict[str, int]) -> Optional[str]:
+    """
+    The city among `counts` (location key -> matching listings) to offer instead of
+    city_key: the nearest one with matches, or the one with most matches when the
+    distance to none of them is known.
+    """
+    candidates: List[Tuple[float, int, str]] = []
+    for key, count in counts.items():
+        if key == city_key or not key or count <= 0:
+            continue
+        distance = city_distance_km(city_key, key)
+        candidates.append((math.inf if distance is None else distance, -count, key))
+    if not candidates:
+        return None
+    return min(candidates)[2]
+
+
+def locate(city_key: Optional[str], district_key: Optional[str]) -> Optional[Tuple[float, float]]:
+    """centroid of a district (by location keys), or None when it is not in DISTRICT_CENTERS"""
+    return _DISTRICTS_BY_KEY.get((city_key, district_key))
+
+
+@lru_cache(maxsize=1024)
+def place_center(city: Optional[str], district: Optional[str]) -> Optional[Tuple[float, float]]:
+    """
+    Point a search names: the district's centroid (a district name found in a single
+    city when no city is given), else the city's centre; None if the place is unknown.
+    """
+    city_key, district_key = normalize_location_key(city), normalize_location_key(district)
+    if district_key:
+        if city_key:
+            center = _DISTRICTS_BY_KEY.get((city_key, district_key))
+        else:
+            found = [c for (_, d), c in _DISTRICTS_BY_KEY.items() if d == district_key]
+            center = found[0] if len(found) == 1 else None
+        if center is not None:
+            return center
+    return _CENTERS_BY_KEY.get(city_key)
@@ -1,6 +1,16 @@
 import re
 from typing import List, Dict, Tuple, Any, Optional
 
+# radius of a search "near" a place when no distance is given
+NEAR_RADIUS_KM = 2.0
+
+# features that only listing texts mention; a search for them ranks by text relevance
+FEATURE_KEYWORDS = [
+    "نورگیر", "بالکن", "تراس", "روف گاردن", "حیاط", "نوساز", "ویو", "لابی", "نگهبان",
+    "استخر", "سونا", "جکوزی", "شوفاژ", "پکیج", "گرمایش از کف", "کابینت", "کمد دیواری",
+    "سرامیک", "مترو", "مرکز خرید", "مدرسه", "دنج",
+]
+
 class RegexExtractor:
     """
     Extracts structured data from Persian text using regex patterns.
@@ -33,6 +43,7 @@ class RegexExtractor:
         normalized_text = self._normalize_text(text)
         
         budget_min, budget_max = self.extract_budget_range(normalized_text)
+        district = self.extract_district(normalized_text)
         
         result = {
             "city": self.extract_city(normalized_text),
@@ -41,7 +52,9 @@ class RegexExtractor:
             "area_min": self.extract_area(normalized_text),
             "transaction_type": self.extract_transaction_type(normalized_text),
             "property_type": self.extract_property_type(normalized_text),
-            "district": self.extract_district(normalized_text),
+            "district": district,
+            "radius_km": self.extract_radius(normalized_text, district),
+            "keywords": self.extract_keywords(normalized_text),
             "wants_exchange": self.extract_exchange_intent(normalized_text)
         }
         
@@ -161,6 +174,23 @@ class RegexExtractor:
             
         return None
 
+    def extract_radius(self, text: str, district: Optional[str] = None) -> Optional[float]:
+        """Search radius: 'تا ۳ کیلومتری ونک', or NEAR_RADIUS_KM for 'نزدیک ونک'."""
+        pattern = re.search(r'(\d+(?:\.\d+)?)\s*(?:کیلومتر|کیلومتری|km)', text)
+        if pattern:
+            return float(pattern.group(1))
+        # "near" counts only next to a district ("نزدیک مترو" is not a place)
+        if district and re.search(rf'(?:نزدیک|نزدیکی|اطراف|حوالی) (?:محله )?{re.escape(district)}', text):
+            return NEAR_RADIUS_KM
+        return None
+
+    def extract_keywords(self, text: str) -> Optional[List[str]]:
+        """Features from FEATURE_KEYWORDS the text asks for ('نورگیر', 'بالکن'...)."""
+        # the half-space is typed inconsistently ("نور‌گیر" / "نورگیر")
+        text = text.replace("\u200c", "")
+        found = [k for k in FEATURE_KEYWORDS if re.search(rf'(?<!\w){k}', text)]
+        return found or None
+
     def extract_exchange_intent(self, text: str) -> Optional[bool]:
         """Detect if user explicitly wants to check for exchange (Find all exchanges command)."""
         keywords = ['معاوضه', 'طاق', 'تعویض', 'تاخت']
@@ -1,8 +1,33 @@
-from app.models.property import Property, UserRequirements, PropertyScore
-from typing import List
+from app.models.property import Property, UserRequirements, PropertyScore, construct_trusted
+from app.services.advertisements.derived_fields import normalize_location_key
+from app.services.brain.geography import distance_km, place_center
+from functools import lru_cache
+from typing import Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
 import math
 
 
+@lru_cache(maxsize=1024)
+def _requirement_key(value: str):
+    """location key of a requirement value (same few values for every scored row)"""
+    return normalize_location_key(value)
+
+
+def changed_requirements(old: UserRequirements, new: UserRequirements) -> Set[str]:
+    """names of the requirement fields that differ between two requirement sets"""
+    return {name for name in UserRequirements.model_fields if getattr(old, name) != getattr(new, name)}
+
+
+class ComponentScores(NamedTuple):
+    """
+    What one ranking scored, kept so that ranking the same properties again after a
+    requirement change only re-scores the components that read the changed fields.
+    """
+    requirements: UserRequirements
+    rows: Dict[str, int]                   # property id -> row below
+    results: List[PropertyScore]           # score of each row (component scores in score_details)
+    missing: List[Dict[str, List[str]]]    # missing requirements of each row, by component
+
+
 class PropertyScoringSystem:
     """Real estate scoring system based on user needs"""
 
@@ -21,31 +46,76 @@ class PropertyScoringSystem:
         "renovated": 1,  # Optional
     }
 
+    # Text relevance (see text_search.TextIndex.relevance): scored, and counted in the
+    # total, only for searches with keywords
+    TEXT_WEIGHT = 10
+
+    # Requirement fields each component reads; after a requirement change only the
+    # components reading a changed field are scored again (see rank_incremental)
+    COMPONENT_FIELDS = {
+        "price": {"budget_min", "budget_max"},
+        "area": {"area_min", "area_max"},
+        "location": {"city", "district", "radius_km"},
+        "property_type": {"property_type"},
+        "bedrooms": {"bedrooms_min"},
+        "age": {"max_age"},
+        "floor": {"min_floor"},
+        "parking": {"must_have_parking"},
+        "elevator": {"must_have_elevator"},
+        "storage": set(),
+        "renovated": set(),
+        "text": {"keywords"},
+    }
+
+    # components that report missing requirements, in the order they are reported
+    MISSING_COMPONENTS = ("price", "area", "location")
+
     def __init__(self):
         self.total_weight = sum(self.WEIGHTS.values())
-
-    def calculate_score(self, property: Property, requirements: UserRequirements) -> PropertyScore:
-        """Calculate the overall score of a property"""
+        self._scorers = {name: getattr(self, f"_score_{name}") for name in self.WEIGHTS}
+
+    def calculate_score(self, property: Property, requirements: UserRequirements,
+                        relevance: Optional[Mapping[str, float]] = None) -> PropertyScore:
+        """
+        Calculate the overall score of a property
+        relevance: text relevance of the listings (id -> 0..1) for requirements.keywords
+        """
+        scores, missing = self._score_components(property, requirements, relevance)
+        return self._build_score(property, scores, missing)
+
+    def _build_score(self, property: Property, scores: Dict[str, float],
+                     missing: Dict[str, List[str]]) -> PropertyScore:
+        """PropertyScore of the component scores (values as PropertyScore validation makes them)"""
+        # Calculating the final score
+        total_score = sum(scores.values())
+        total_weight = self.total_weight + (self.TEXT_WEIGHT if "text" in scores else 0)
+        match_percentage = (total_score / total_weight) * 100
+
+        return construct_trusted(PropertyScore, {
+            "property_id": property.id,
+            "total_score": float(round(total_score, 2)),
+            "score_details": scores,
+            "match_percentage": float(round(match_percentage, 2)),
+            "missing_requirements": missing["price"] + missing["area"] + missing["location"],
+            "decision_reasons": [],
+        })
+
+    def _score_components(self, property: Property, requirements: UserRequirements,
+                          relevance: Optional[Mapping[str, float]] = None):
+        """every component score, and the missing requirements by component"""
         scores = {}
-        missing = []
 
         # Price score
         price_score, price_missing = self._score_price(property, requirements)
         scores["price"] = price_score
-        if price_missing:
-            missing.append(price_missing)
 
         # Area score
         area_score, area_missing = self._score_area(property, requirements)
         scores["area"] = area_score
-        if area_missing:
-            missing.append(area_missing)
 
         # Location score
         location_score, location_missing = self._score_location(property, requirements)
         scores["location"] = location_score
-        if location_missing:
-            missing.extend(location_missing)
 
         # Property type score
         type_score = self._score_property_type(property, requirements)
@@ -74,17 +144,29 @@ class PropertyScoringSystem:
         scores["storage"] = storage_score
         scores["renovated"] = renovated_score
 
-        # Calculating the final score
-        total_score = sum(scores.values())
-        match_percentage = (total_score / self.total_weight) * 100
-
-        return PropertyScore(
-            property_id=property.id,
-            total_score=round(total_score, 2),
-            score_details=scores,
-            match_percentage=round(match_percentage, 2),
-            missing_requirements=missing
-        )
+        # Text relevance score
+        if requirements.keywords and relevance is not None:
+            scores["text"] = self._score_text(property, relevance)
+
+        missing = {
+            "price": [price_missing] if price_missing else [],
+            "area": [area_missing] if area_missing else [],
+            "location": location_missing,
+        }
+        return scores, missing
+
+    def _score_component(self, name: str, property: Property, req: UserRequirements,
+                         relevance: Optional[Mapping[str, float]] = None) -> Tuple[Optional[float], List[str]]:
+        """one component score (None for a component not scored) and the missing requirements it reports"""
+        if name == "text":
+            return (self._score_text(property, relevance) if req.keywords and relevance is not None else None), []
+        result = self._scorers[name](property, req)
+        if name == "location":
+            return result
+        if name in self.MISSING_COMPONENTS:
+            score, missing = result
+            return score, [missing] if missing else []
+        return result, []
 
     def _score_price(self, property: Property, req: UserRequirements):
         """Price scoring"""
@@ -171,13 +253,21 @@ class PropertyScoringSystem:
 
         if req.city is None:
             missing.append("شهر مشخص نشده")
-        else:
-            city_match = (property.city.lower() == req.city.lower())
 
         if req.district is None:
             missing.append("منطقه مشخص نشده")
-        else:
-            district_match = (property.district.lower() == req.district.lower())
+
+        if req.radius_km and property.latitude is not None and property.longitude is not None:
+            center = place_center(req.city, req.district)
+            if center is not None:
+                # distance decay: full weight at the centre, half at the edge of the radius
+                distance = distance_km(center, (property.latitude, property.longitude))
+                return weight * 0.5 ** (distance / req.radius_km), missing
+
+        if req.city is not None:
+            city_match = (property.city_key == _requirement_key(req.city))
+        if req.district is not None:
+            district_match = (property.district_key == _requirement_key(req.district))
 
         if city_match and district_match:
             return weight, []
@@ -276,7 +366,67 @@ class PropertyScoringSystem:
         weight = self.WEIGHTS["renovated"]
         return weight if property.is_renovated else weight * 0.5
 
-    def rank_properties(self, properties: List[Property], requirements: UserRequirements) -> List[PropertyScore]:
+    def _score_text(self, property: Property, relevance: Mapping[str, float]):
+        """Text relevance scoring"""
+        return self.TEXT_WEIGHT * relevance.get(property.id, 0.0)
+
+    def rank_properties(self, properties: List[Property], requirements: UserRequirements,
+                        relevance: Optional[Mapping[str, float]] = None) -> List[PropertyScore]:
         """Property ranking"""
-        scores = [self.calculate_score(prop, requirements) for prop in properties]
-        return sorted(scores, key=lambda x: x.total_score, reverse=True)
\ No newline at end of file
+        scores = [self.calculate_score(prop, requirements, relevance) for prop in properties]
+        return sorted(scores, key=lambda x: x.total_score, reverse=True)
+
+    def rank_incremental(self, properties: List[Property], requirements: UserRequirements,
+                         previous: Optional[ComponentScores] = None,
+                         relevance: Optional[Mapping[str, float]] = None
+                         ) -> Tuple[List[PropertyScore], ComponentScores]:
+        """
+        rank_properties, also returning what it scored. Given the ComponentScores of an
+        earlier ranking, the properties it had only get the components whose requirement
+        fields changed scored again, and keep their earlier PropertyScore when none of those
+        scores moved; properties it did not have are scored in full.
+        relevance is as in calculate_score.
+        """
+        stale = []
+        rows = None
+        if previous is not None:
+            changed = changed_requirements(previous.requirements, requirements)
+            stale = [name for name in self.COMPONENT_FIELDS if self.COMPONENT_FIELDS[name] & changed]
+            previous_rows = previous.rows
+            rows = [previous_rows.get(prop.id, -1) for prop in properties]
+
+        results, missing_rows = [], []
+        for i, prop in enumerate(properties):
+            row = rows[i] if rows is not None else -1
+            if row < 0:
+                scores, missing = self._score_components(prop, requirements, relevance)
+                results.append(self._build_score(prop, scores, missing))
+                missing_rows.append(missing)
+                continue
+
+            result, missing = previous.results[row], previous.missing[row]
+            scores = result.score_details
+            moved = False
+            for name in stale:
+                score, found = self._score_component(name, prop, requirements, relevance)
+                if score != scores.get(name) or (name in missing and found != missing[name]):
+                    if not moved:
+                        scores, missing, moved = dict(scores), dict(missing), True
+                    if score is None:
+                        del scores[name]
+                    else:
+                        scores[name] = score
+                    if name in missing:
+                        missing[name] = found
+            if moved:
+                result = self._build_score(prop, scores, missing)
+            results.append(result)
+            missing_rows.append(missing)
+
+        components = ComponentScores(
+            requirements=requirements.model_copy(),  # callers update requirements in place
+            rows={prop.id: row for row, prop in enumerate(properties)},
+            results=results,
+            missing=missing_rows,
+        )
+        return sorted(results, key=lambda x: x.total_score, reverse=True), components
\ No newline at end of file
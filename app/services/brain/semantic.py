@@ -0,0 +1,179 @@
+import hashlib
+import math
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from app.services.brain.text_search import tokenize
+
+# Listing texts are embedded with hashed n-grams: each term and the character trigrams
+# of "<term>" are hashed to a signed dimension. Spelling variants and related word
+# forms share trigrams and land close to each other; nothing is trained, so any
+# process embeds a text the same way, offline or at query time.
+EMBEDDING_DIM = 128
+NGRAM = 3
+
+# IVF index: vectors are grouped around ~sqrt(n) centroids (spherical k-means on a
+# sample); a query reads the vectors of the PROBES lists whose centroids are nearest
+MAX_LISTS = 1024
+TRAIN_SAMPLE = 20_000
+TRAIN_ITERATIONS = 10
+PROBES = 8
+# rows multiplied at once while assigning vectors to lists
+_CHUNK = 8192
+# stored vectors are quantized to int8: component * QUANT_SCALE
+QUANT_SCALE = 127
+
+
+def _hash(feature: str) -> Tuple[int, float]:
+    digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % EMBEDDING_DIM, 1.0 if digest >> 63 else -1.0
+
+
+@lru_cache(maxsize=65536)
+def term_vector(term: str) -> np.ndarray:
+    """unit vector of a term: its own feature plus its character trigrams"""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    marked = f"<{term}>"
+    features = [term] + [marked[i:i + NGRAM] for i in range(max(len(marked) - NGRAM + 1, 1))]
+    for feature in features:
+        index, sign = _hash(feature)
+        vector[index] += sign
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def listing_text(listing) -> str:
+    """the text of a listing that is embedded"""
+    return " ".join(text for text in (listing.title, listing.description) if text)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def embed(text: Optional[str]) -> np.ndarray:
+    """unit vector of a text (zeros when it has no terms)"""
+    terms = tokenize(text)
+    if not terms:
+        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    return _normalize(np.sum([term_vector(t) for t in terms], axis=0)).astype(np.float32)
+
+
+def embed_texts(texts: Iterable[Optional[str]]) -> np.ndarray:
+    """
+    embed() of every text as one (n, EMBEDDING_DIM) float32 matrix.
+    Each distinct term is embedded once; a text's vector is the sum of its terms' rows.
+    """
+    vocabulary: Dict[str, int] = {"": 0}  # row 0 is a zero vector, so no text is empty
+    ids: List[int] = []
+    starts: List[int] = []
+    for text in texts:
+        starts.append(len(ids))
+        ids.append(0)
+        for term in tokenize(text):
+            ids.append(vocabulary.setdefault(term, len(vocabulary)))
+
+    vectors = np.zeros((len(starts), EMBEDDING_DIM), dtype=np.float32)
+    if not starts:
+        return vectors
+    terms = np.zeros((len(vocabulary), EMBEDDING_DIM), dtype=np.float32)
+    for term, row in vocabulary.items():
+        if row:
+            terms[row] = term_vector(term)
+
+    ids = np.asarray(ids, dtype=np.intp)
+    starts = np.asarray(starts, dtype=np.intp)
+    # in chunks of texts, so the gathered term rows stay small
+    step = _CHUNK
+    for first in range(0, len(starts), step):
+        chunk = starts[first:first + step]
+        end = starts[first + step] if first + step < len(starts) else len(ids)
+        vectors[first:first + len(chunk)] = np.add.reduceat(terms[ids[chunk[0]:end]], chunk - chunk[0])
+    return _normalize(vectors)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """nearest centroid (by cosine) of every vector"""
+    lists = np.empty(len(vectors), dtype=np.intp)
+    for first in range(0, len(vectors), _CHUNK):
+        chunk = vectors[first:first + _CHUNK].astype(np.float32)
+        lists[first:first + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return lists
+
+
+class IVFIndex:
+    """
+    Approximate nearest-neighbour index of unit vectors (inverted file).
+    vectors are stored grouped by list and quantized (int8): list l holds the rows
+    order[offsets[l]:offsets[l + 1]] of the original matrix, so probing a list reads one
+    contiguous slice. The arrays may be views of a mapped catalog snapshot.
+    """
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, order: np.ndarray, vectors: np.ndarray):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.order = order
+        self.vectors = vectors
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, lists: Optional[int] = None, seed: int = 0) -> "IVFIndex":
+        count = len(vectors)
+        if count == 0:
+            return cls(np.zeros((1, EMBEDDING_DIM), dtype=np.float32), np.zeros(2, dtype=np.int64),
+                       np.zeros(0, dtype=np.int32), np.zeros((0, EMBEDDING_DIM), dtype=np.int8))
+        lists = lists or max(1, min(MAX_LISTS, int(round(math.sqrt(count)))))
+        lists = min(lists, count)
+
+        rng = np.random.default_rng(seed)
+        sample = vectors[np.sort(rng.choice(count, min(count, TRAIN_SAMPLE), replace=False))]
+        centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+        for _ in range(TRAIN_ITERATIONS):
+            assigned = _assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assigned, sample)
+            sizes = np.bincount(assigned, minlength=lists)
+            # an empty list restarts from a random sample vector
+            empty = np.flatnonzero(sizes == 0)
+            sums[empty] = sample[rng.choice(len(sample), len(empty))]
+            centroids = _normalize(sums)
+
+        assigned = _assign(vectors, centroids)
+        order = np.argsort(assigned, kind="stable").astype(np.int32)
+        offsets = np.searchsorted(assigned[order], np.arange(lists + 1)).astype(np.int64)
+        quantized = np.rint(vectors[order] * QUANT_SCALE).astype(np.int8)
+        return cls(centroids.astype(np.float32), offsets, order, quantized)
+
+    @classmethod
+    def from_properties(cls, properties: Sequence) -> "IVFIndex":
+        return cls.build(embed_texts(listing_text(p) for p in properties))
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def search(self, query: np.ndarray, k: int = 10, probes: int = PROBES) -> List[Tuple[int, float]]:
+        """
+        approximately the k rows most similar (cosine) to the query vector, as
+        (row, similarity), best first; exact when probes covers every list
+        """
+        if not len(self.order) or not query.any():
+            return []
+        query = (query / np.linalg.norm(query)).astype(np.float32)
+        lists = len(self.centroids)
+        closeness = self.centroids @ query
+        probed = np.argpartition(-closeness, probes - 1)[:probes] if lists > probes else np.arange(lists)
+
+        slots = [np.arange(self.offsets[l], self.offsets[l + 1]) for l in probed.tolist()]
+        slots = np.concatenate(slots)
+        if not len(slots):
+            return []
+        similarity = self.vectors[slots].astype(np.float32) @ (query / QUANT_SCALE)
+        if len(slots) > k:
+            best = np.argpartition(-similarity, k - 1)[:k]
+            slots, similarity = slots[best], similarity[best]
+        rows = self.order[slots]
+        ranked = np.lexsort((rows, -similarity))
+        return list(zip(rows[ranked].tolist(), similarity[ranked].tolist()))
+
+    def search_text(self, text: str, k: int = 10, probes: int = PROBES) -> List[Tuple[int, float]]:
+        return self.search(embed(text), k, probes)
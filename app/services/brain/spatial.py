@@ -0,0 +1,93 @@
+import math
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from app.services.brain.geography import EARTH_RADIUS_KM
+
+# side of a grid cell; a radius search reads the cells its circle overlaps
+CELL_KM = 2.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# farthest a nearest-k search looks
+MAX_NEAREST_KM = 2500.0
+
+
+def haversine_km(latitudes: np.ndarray, longitudes: np.ndarray, lat: float, lon: float) -> np.ndarray:
+    """great-circle distance of every point to (lat, lon)"""
+    lat1, lon1 = np.radians(latitudes), np.radians(longitudes)
+    lat2, lon2 = math.radians(lat), math.radians(lon)
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * math.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+
+class GridIndex:
+    """
+    Points of a list of listings bucketed in a lat/lon grid, for radius and nearest-k
+    queries. Rows are sorted by (cell row, cell column), so the cells of one grid row
+    that a query overlaps are one contiguous slice found by binary search.
+    Positions returned are indexes into the list the index was built from; listings
+    without coordinates are never returned.
+    """
+
+    def __init__(self, latitudes: Sequence[Optional[float]], longitudes: Sequence[Optional[float]],
+                 cell_km: float = CELL_KM):
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.cell_degrees = cell_km / KM_PER_DEGREE
+
+        located = np.flatnonzero(~(np.isnan(self.latitudes) | np.isnan(self.longitudes)))
+        rows = np.floor(self.latitudes[located] / self.cell_degrees).astype(np.int64)
+        # columns counted from -180 so every key of a grid row sorts before the next row's
+        self._column_origin = math.floor(-180 / self.cell_degrees)
+        self._column_span = int(math.ceil(360 / self.cell_degrees)) + 2
+        columns = np.floor(self.longitudes[located] / self.cell_degrees).astype(np.int64) - self._column_origin
+        keys = rows * self._column_span + columns
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._positions = located[order]
+
+    @classmethod
+    def from_properties(cls, properties: Sequence, cell_km: float = CELL_KM) -> "GridIndex":
+        nan = math.nan
+        latitudes = [nan if p.latitude is None else p.latitude for p in properties]
+        longitudes = [nan if p.longitude is None else p.longitude for p in properties]
+        return cls(latitudes, longitudes, cell_km)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """positions in the cells overlapping the circle"""
+        lat_span = radius_km / KM_PER_DEGREE
+        lon_span = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(min(abs(lat) + lat_span, 89.0))), 1e-6))
+        row_min = math.floor((lat - lat_span) / self.cell_degrees)
+        row_max = math.floor((lat + lat_span) / self.cell_degrees)
+        column_min = max(math.floor((lon - lon_span) / self.cell_degrees) - self._column_origin, 0)
+        column_max = min(math.floor((lon + lon_span) / self.cell_degrees) - self._column_origin, self._column_span - 1)
+
+        starts = np.arange(row_min, row_max + 1, dtype=np.int64) * self._column_span
+        lo = np.searchsorted(self._keys, starts + column_min, side="left")
+        hi = np.searchsorted(self._keys, starts + column_max, side="right")
+        slices = [self._positions[a:b] for a, b in zip(lo.tolist(), hi.tolist()) if b > a]
+        return np.concatenate(slices) if slices else np.empty(0, dtype=np.int64)
+
+    def distances(self, positions: np.ndarray, lat: float, lon: float) -> np.ndarray:
+        return haversine_km(self.latitudes[positions], self.longitudes[positions], lat, lon)
+
+    def within(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """positions of the points at most radius_km from (lat, lon), in list order"""
+        candidates = self._candidates(lat, lon, radius_km)
+        inside = candidates[self.distances(candidates, lat, lon) <= radius_km]
+        return np.sort(inside)
+
+    def nearest(self, lat: float, lon: float, k: int, max_km: float = MAX_NEAREST_KM) -> List[Tuple[int, float]]:
+        """the k points closest to (lat, lon) as (position, distance km), nearest first"""
+        radius = CELL_KM
+        while True:
+            candidates = self._candidates(lat, lon, radius)
+            distances = self.distances(candidates, lat, lon)
+            # only points within the searched radius are sure to be the closest
+            inside = distances <= radius
+            if inside.sum() >= k or radius >= max_km:
+                candidates, distances = candidates[inside], distances[inside]
+                order = np.lexsort((candidates, distances))[:k]
+                return list(zip(candidates[order].tolist(), distances[order].tolist()))
+            radius = min(radius * 2, max_km)
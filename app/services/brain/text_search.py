@@ -0,0 +1,140 @@
+import math
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+# a term in the title counts this many times
+TITLE_BOOST = 2
+
+# one pass over a text: arabic letters to persian ones, digits to ascii, harakat and
+# tatweel dropped, and the half-space removed so that it joins the parts of a word
+_NORMALIZE = str.maketrans({
+    **{arabic: persian for arabic, persian in zip("يىكة", "ییکه")},
+    **{digit: str(i % 10) for i, digit in enumerate("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩")},
+    **{chr(mark): None for mark in range(0x064B, 0x0653)},
+    "\u0670": None,
+    "\u0640": None,
+    "\u200c": None,
+})
+_TOKEN = re.compile(r"[^\W_]+")
+
+# plural and adjective endings stripped from a word, longest first
+SUFFIXES = ("هایی", "های", "ها", "یی", "ی")
+MIN_STEM = 3
+
+STOPWORDS = frozenset({
+    "و", "در", "به", "از", "با", "که", "را", "تا", "یا", "این", "آن", "برای", "هم", "است", "هست",
+    "یک", "یه", "می", "شده", "دارد", "داره", "باشد", "باشه", "بسیار", "خیلی", "نزدیک",
+})
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> Optional[str]:
+    """
+    index term of a word: the word without a plural/adjective ending
+    ("کابینتها", "متری" -> "کابینت", "متر"); None for a stopword
+    """
+    if word in STOPWORDS:
+        return None
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """index terms of a text, in order"""
+    if not text:
+        return []
+    terms = map(stem, _TOKEN.findall(text.translate(_NORMALIZE).lower()))
+    return [term for term in terms if term]
+
+
+class TextIndex:
+    """
+    Inverted index of listing titles and descriptions, ranked with BM25.
+    Each term keeps the rows it occurs in and their BM25 term weight (everything but the
+    idf), so a query only adds up the precomputed weights of its terms' rows.
+    Rows are indexes into the list the index was built from; with the listing ids,
+    `rows` maps an id to its row.
+    """
+
+    def __init__(self, documents: Iterable[Tuple[Optional[str], Optional[str]]],
+                 ids: Optional[Iterable[str]] = None):
+        postings: Dict[str, Dict[int, int]] = {}
+        lengths = []
+        for row, (title, description) in enumerate(documents):
+            length = 0
+            for boost, text in ((TITLE_BOOST, title), (1, description)):
+                for term in tokenize(text):
+                    counts = postings.get(term)
+                    if counts is None:
+                        counts = postings[term] = {}
+                    counts[row] = counts.get(row, 0) + boost
+                    length += boost
+            lengths.append(length)
+
+        self.size = len(lengths)
+        self.rows: Dict[str, int] = {key: row for row, key in enumerate(ids)} if ids is not None else {}
+        lengths = np.asarray(lengths, dtype=np.float64)
+        average = lengths.mean() if self.size and lengths.mean() > 0 else 1.0
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average)
+
+        self._rows: Dict[str, np.ndarray] = {}
+        self._weights: Dict[str, np.ndarray] = {}
+        for term, counts in postings.items():
+            rows = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+            tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+            idf = math.log(1 + (self.size - len(rows) + 0.5) / (len(rows) + 0.5))
+            self._rows[term] = rows
+            self._weights[term] = (idf * tf * (BM25_K1 + 1) / (tf + norms[rows])).astype(np.float32)
+
+    @classmethod
+    def from_properties(cls, properties: Sequence) -> "TextIndex":
+        return cls(((p.title, p.description) for p in properties), (p.id for p in properties))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def document_frequency(self, term: str) -> int:
+        rows = self._rows.get(term)
+        return 0 if rows is None else len(rows)
+
+    def scores(self, query: str) -> Optional[np.ndarray]:
+        """BM25 score of every row for the query; None when none of its terms is indexed"""
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term in self._rows]
+        if not terms:
+            return None
+        totals = np.zeros(self.size, dtype=np.float32)
+        for term in terms:
+            # a row occurs once in a term's rows, so the fancy-indexed add is exact
+            totals[self._rows[term]] += self._weights[term]
+        return totals
+
+    def top(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """the k best matching rows as (row, score), best first"""
+        scores = self.scores(query)
+        if scores is None:
+            return []
+        rows = np.argpartition(-scores, k - 1)[:k] if self.size > k else np.arange(self.size)
+        rows = rows[scores[rows] > 0]
+        rows = rows[np.lexsort((rows, -scores[rows]))]
+        return list(zip(rows.tolist(), scores[rows].tolist()))
+
+    def relevance(self, query: str, ids: Sequence[str]) -> Dict[str, float]:
+        """
+        Score of the query for the listings `ids` as a share of the best score in the
+        whole index (0..1], so it does not depend on which listings are asked for.
+        Listings that match no term are left out.
+        """
+        scores = self.scores(query)
+        if scores is None or not ids:
+            return {}
+        best = float(scores.max())
+        rows = np.fromiter((self.rows[key] for key in ids), dtype=np.intp, count=len(ids))
+        shares = (scores[rows] / best).tolist()
+        return {key: share for key, share in zip(ids, shares) if share > 0}
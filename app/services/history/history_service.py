@@ -1,41 +1,81 @@
-from typing import List, Dict, Any
+from datetime import datetime
+from typing import List, Dict, Any, Optional
 from app.core.postgres_service import postgres_service
+from app.services.history.history_writer import history_writer
 from app.models.history import HistoryMessage
 import uuid
 
 class HistoryService:
     @staticmethod
-    def save_message(user_id: str, session_id: str, role: str, content: str):
-        """Save a message to chat history"""
-        data = {
-            "user_id": user_id,
-            "session_id": session_id,
-            "role": role,
-            "content": content
-        }
-        return postgres_service.insert("chat_history", data)
+    def save_message(user_id: str, session_id: str, role: str, content: str) -> int:
+        """Save a message to chat history now (and update its session summary)"""
+        return history_writer.write(user_id, session_id, role, content)
+
+    @staticmethod
+    def queue_message(user_id: str, session_id: str, role: str, content: str):
+        """Save a message to chat history in the background (batched, off the request path)"""
+        history_writer.enqueue(user_id, session_id, role, content)
 
     @staticmethod
     def get_user_history(user_id: str) -> List[Dict[str, Any]]:
-        """Get all sessions for a user"""
+        """Get all sessions for a user, most recent first"""
         query = """
-            SELECT DISTINCT ON (session_id) 
-                session_id, 
-                content as last_message, 
-                created_at as last_updated
-            FROM chat_history
+            SELECT session_id, last_message, last_updated, message_count
+            FROM chat_sessions
             WHERE user_id = %s
-            ORDER BY session_id, created_at DESC
+            ORDER BY last_updated DESC
         """
         return postgres_service.execute_raw(query, (user_id,))
 
     @staticmethod
-    def get_session_messages(session_id: str) -> List[Dict[str, Any]]:
-        """Get all messages for a specific session"""
-        return postgres_service.select(
-            "chat_history", 
-            filters={"session_id": session_id}, 
-            order_by="created_at ASC"
+    def get_session_owner(session_id: str) -> Optional[str]:
+        """user_id of a session's first message (None for a session with no history)"""
+        rows = postgres_service.execute_raw(
+            "SELECT user_id FROM chat_history WHERE session_id = %s ORDER BY id LIMIT 1",
+            (session_id,),
+        )
+        return str(rows[0]["user_id"]) if rows else None
+
+    @staticmethod
+    def get_session_messages(session_id: str, user_id: str, before: Optional[int] = None,
+                             after: Optional[int] = None, since: Optional[datetime] = None,
+                             limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        One page of a session's messages that belong to user_id, oldest first.
+        Without after/since it is the newest page (before an id when given);
+        with after/since it is the page following that message id / time.
+        """
+        conditions = ["session_id = %s", "user_id = %s"]
+        params: List[Any] = [session_id, user_id]
+        if before is not None:
+            conditions.append("id < %s")
+            params.append(before)
+        if after is not None:
+            conditions.append("id > %s")
+            params.append(after)
+        if since is not None:
+            conditions.append("created_at > %s")
+            params.append(since)
+
+        newest_first = after is None and since is None
+        query = f"""
+            SELECT id, user_id, session_id, role, content, created_at
+            FROM chat_history
+            WHERE {' AND '.join(conditions)}
+            ORDER BY id {'DESC' if newest_first else 'ASC'}
+            LIMIT %s
+        """
+        params.append(limit)
+        rows = postgres_service.execute_raw(query, tuple(params))
+        return rows[::-1] if newest_first else rows
+
+    @staticmethod
+    def get_session_snapshot(user_id: str, session_id: str) -> Optional[Dict[str, Any]]:
+        """Stored state snapshot of a session (None when the session has none)"""
+        rows = postgres_service.execute_raw(
+            "SELECT state_snapshot FROM chat_sessions WHERE user_id = %s AND session_id = %s",
+            (user_id, session_id),
         )
+        return rows[0]["state_snapshot"] if rows else None
 
 history_service = HistoryService()
@@ -0,0 +1,276 @@
+import json
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from prometheus_client import Gauge
+from psycopg2.extras import execute_values
+from app.core.postgres_service import postgres_service
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+HISTORY_COLUMNS = ["user_id", "session_id", "role", "content"]
+
+UPDATE_SESSIONS_QUERY = """
+    INSERT INTO chat_sessions (user_id, session_id, last_message, last_updated, message_count)
+    VALUES %s
+    ON CONFLICT (user_id, session_id) DO UPDATE SET
+        last_message = EXCLUDED.last_message,
+        last_updated = EXCLUDED.last_updated,
+        message_count = chat_sessions.message_count + EXCLUDED.message_count
+"""
+
+UPDATE_SNAPSHOTS_QUERY = """
+    UPDATE chat_sessions AS s
+    SET state_snapshot = v.snapshot
+    FROM (VALUES %s) AS v (user_id, session_id, snapshot)
+    WHERE s.user_id = v.user_id AND s.session_id = v.session_id
+"""
+
+# summed over the live workers in multi-worker mode
+QUEUE_DEPTH = Gauge("chat_history_queue_depth", "Chat messages waiting to be written",
+                    multiprocess_mode="livesum")
+
+# queued by stop() to wake the writer thread
+_STOP = object()
+
+
+class _FlushRequest:
+    """queued by flush(); the writer thread sets it once everything queued before it is written"""
+    __slots__ = ("done", "count")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.count = 0
+
+    def finish(self, count: int):
+        self.count = count
+        self.done.set()
+
+
+class HistoryWriter:
+    """
+    Write-behind queue for chat_history.
+    Messages are queued by the request and written by a background thread with
+    one multi-row INSERT per batch, when batch_size rows are waiting or
+    flush_interval seconds have passed. The chat_sessions summaries (and the
+    latest state snapshot of each session) are updated in the same transaction.
+    Rows are written in the order they were queued; flush() returns once every
+    earlier message is written, including the batch the thread is collecting.
+    """
+
+    def __init__(self, batch_size: int = 200, flush_interval: float = 0.5, max_queue: int = 10_000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        # rows of a failed batch, written first on the next flush
+        self._retry: List[tuple] = []
+        # latest state snapshot per (user_id, session_id), replaced until written
+        self._snapshots: Dict[Tuple[str, str], str] = {}
+
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self._total_flush_seconds = 0.0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, user_id: str, session_id: str, role: str, content: str):
+        """queue one message; written to chat_history within flush_interval"""
+        row = (user_id, session_id, role, content)
+        if self._thread is None:
+            self.start()
+
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            # the database is behind; write this one inline (after the queued ones) instead of losing it
+            logger.warning("history queue full, writing message inline")
+            self.write(*row)
+        QUEUE_DEPTH.set(self._depth())
+
+    def enqueue_snapshot(self, user_id: str, session_id: str, snapshot: Dict[str, Any]):
+        """queue the session state to store with the session summary (the newest one wins)"""
+        if self._thread is None:
+            self.start()
+        data = json.dumps(snapshot, ensure_ascii=False, default=str)
+        with self._flush_lock:
+            self._snapshots[(user_id, session_id)] = data
+
+    def write(self, user_id: str, session_id: str, role: str, content: str) -> int:
+        """write one message right away, together with anything still queued"""
+        self.flush()
+        return self._write([(user_id, session_id, role, content)])
+
+    def flush(self) -> int:
+        """write everything queued so far and wait for it (also used on shutdown)"""
+        thread = self._thread
+        if thread is None or thread is threading.current_thread():
+            return self._drain()
+
+        # handed to the writer thread, which holds rows it has already taken off the queue
+        request = _FlushRequest()
+        while True:
+            try:
+                self._queue.put(request, timeout=0.1)
+                break
+            except queue.Full:
+                if not thread.is_alive():
+                    return self._drain()
+        while not request.done.wait(0.1):
+            if not thread.is_alive():
+                return self._drain()
+        return request.count
+
+    def _drain(self) -> int:
+        """write what is queued from the calling thread (no writer thread is running)"""
+        rows, requests = [], []
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(row, _FlushRequest):
+                requests.append(row)
+            elif row is not _STOP:
+                rows.append(row)
+        count = self._write(rows)
+        for request in requests:
+            request.finish(count)
+        return count
+
+    def stop(self, timeout: float = 5.0):
+        """stop the background thread after writing what is still queued"""
+        self._stopping.set()
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait(_STOP)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._depth(),
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 2),
+            "max_flush_ms": round(self.max_flush_seconds * 1000, 2),
+            "avg_flush_ms": round(self._total_flush_seconds / self.flushes * 1000, 2) if self.flushes else 0.0,
+        }
+
+    def _run(self):
+        while not self._stopping.is_set():
+            rows = []
+            request = None
+            deadline = time.monotonic() + self.flush_interval
+            while len(rows) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is _STOP:
+                    break
+                if isinstance(row, _FlushRequest):
+                    request = row
+                    break
+                rows.append(row)
+            count = 0
+            if rows or self._retry or self._snapshots:
+                count = self._write(rows)
+            if request is not None:
+                request.finish(count)
+
+    def _depth(self) -> int:
+        return self._queue.qsize() + len(self._retry)
+
+    def _write(self, rows: List[tuple]) -> int:
+        try:
+            return self._write_batch(rows)
+        finally:
+            QUEUE_DEPTH.set(self._depth())
+
+    def _write_batch(self, rows: List[tuple]) -> int:
+        with self._flush_lock:
+            rows = self._retry + rows
+            self._retry = []
+            snapshots, self._snapshots = self._snapshots, {}
+            if not rows and not snapshots:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                count = self._store(rows, snapshots)
+            except Exception as e:
+                logger.error("error writing chat history (%d messages): %s", len(rows), e)
+                self.failed_flushes += 1
+                # keep the newest rows if the database stays down
+                self._retry = rows[-self._queue.maxsize:]
+                self._snapshots = snapshots
+                return 0
+
+            elapsed = time.perf_counter() - started
+            self.written += count
+            self.flushes += 1
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self._total_flush_seconds += elapsed
+            return count
+
+    def _store(self, rows: List[tuple], snapshots: Dict[Tuple[str, str], str]) -> int:
+        """insert the messages and update their sessions in one transaction"""
+        count = 0
+        with postgres_service.transaction() as cursor:
+            if rows:
+                execute_values(
+                    cursor,
+                    f"INSERT INTO chat_history ({', '.join(HISTORY_COLUMNS)}) VALUES %s",
+                    rows,
+                    page_size=len(rows),
+                )
+                count = cursor.rowcount
+                execute_values(
+                    cursor,
+                    UPDATE_SESSIONS_QUERY,
+                    _session_summaries(rows),
+                    template="(%s, %s, %s, CURRENT_TIMESTAMP, %s)",
+                )
+            if snapshots:
+                execute_values(
+                    cursor,
+                    UPDATE_SNAPSHOTS_QUERY,
+                    [(user_id, session_id, data) for (user_id, session_id), data in snapshots.items()],
+                    template="(%s::uuid, %s, %s::jsonb)",
+                )
+        return count
+
+
+def _session_summaries(rows: List[tuple]) -> List[Tuple[str, str, str, int]]:
+    """(user_id, session_id, last message, message count) for each session in the batch"""
+    sessions: Dict[Tuple[str, str], list] = {}
+    for user_id, session_id, _, content in rows:
+        summary = sessions.setdefault((user_id, session_id), [user_id, session_id, content, 0])
+        summary[2] = content
+        summary[3] += 1
+    return [tuple(summary) for summary in sessions.values()]
+
+
+history_writer = HistoryWriter()
@@ -1,10 +1,13 @@
 import os
-import time
 from openai import OpenAI
 from typing import List, Dict, Optional
 import json
 from app.services.brain.memory_service import ConversationMemory
 from app.services.brain.regex_extractor import RegexExtractor
+from app.core.tracing import span
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
 
 
 class RealEstateLLMService:
@@ -121,24 +124,18 @@ class RealEstateLLMService:
                 "content": user_message
             })
 
-            start_time = time.time()
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.8,
-                max_tokens=600  # Increased slightly for better natural flow
-            )
-            duration = time.time() - start_time
-            print(f"LLM Response Time (natural_response): {duration:.2f}s")
+            with span("llm"):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.8,
+                    max_tokens=600  # Increased slightly for better natural flow
+                )
 
             return response.choices[0].message.content.strip()
 
         except Exception as e:
-            # Handle encoding issues in print safely
-            try:
-                print(f"Error in natural_response: {e}")
-            except UnicodeEncodeError:
-                print(f"Error in natural_response (encoding issue during print)")
+            logger.error("error in natural_response: %s", e)
             return self._generate_rule_based_response(context, memory)
 
     def _generate_rule_based_response(self, context: Dict, memory: ConversationMemory) -> str:
@@ -173,6 +170,11 @@ class RealEstateLLMService:
         """پرامپت برای گفتگوی عادی و تحلیل املاک"""
 
         has_enough_info = context.get('has_enough_info', False)
+        related = context.get('related_properties')
+        related_section = f"""
+املاک مرتبط با خواسته کاربر (جستجوی معنایی در متن آگهی‌ها؛ اگر به کارش میاد معرفی کن):
+{json.dumps(related, ensure_ascii=False)}
+""" if related else ""
 
         return f"""تو "هومنگر" هستی، یه مشاور املاک خیلی باتجربه، صمیمی و باهوش.
 
@@ -189,7 +191,7 @@ class RealEstateLLMService:
 
 املاک نمایش داده شده به کاربر (در صورت وجود):
 {json.dumps(shown_properties, ensure_ascii=False) if shown_properties else "هیچ ملکی هنوز نمایش داده نشده است"}
-
+{related_section}
 دستورالعمل‌های کلیدی برای مشاوره حرفه‌ای:
 1. **تحلیل عمیق**: اگر ملکی نمایش داده شده، فقط لیست نکن. بگو مثلاً "این مورد چون طبقه بالاست نورگیری بهتری داره" یا "قیمتش نسبت به منطقه عالیه".
 2. **پیشنهاد به جای سوال**: اگر کاربر بودجه‌اش کمه، به جای اینکه فقط بگی "نداریم"، پیشنهاد بده که مثلاً "شاید بهتر باشه متراژ رو کمتر کنیم یا یه محله دیگه رو چک کنیم".
@@ -329,23 +331,21 @@ class RealEstateLLMService:
 """
 
         try:
-            start_time = time.time()
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": "املاک رو معرفی کن"}
-                ],
-                temperature=0.85,
-                max_tokens=1000
-            )
-            duration = time.time() - start_time
-            print(f"LLM Response Time (format_results): {duration:.2f}s")
+            with span("llm"):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": "املاک رو معرفی کن"}
+                    ],
+                    temperature=0.85,
+                    max_tokens=1000
+                )
 
             return response.choices[0].message.content.strip()
 
         except Exception as e:
-            print(f"Error in format_results: {e}")
+            logger.error("error in format_results: %s", e)
             return ""
 
     def handle_exchange_conversation(
@@ -388,16 +388,17 @@ class RealEstateLLMService:
                 "content": "الان چی باید بگم؟"
             })
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.8,
-                max_tokens=200
-            )
+            with span("llm"):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.8,
+                    max_tokens=200
+                )
 
             return response.choices[0].message.content.strip()
 
         except Exception as e:
-            print(f"Error in handle_exchange_conversation: {e}")
+            logger.error("error in handle_exchange_conversation: %s", e)
             return "چی می‌خوای معاوضه کنی و ارزشش چقدره؟"
             return "چی می‌خوای معاوضه کنی و ارزشش چقدره؟"
\ No newline at end of file
@@ -1,16 +1,105 @@
 import json
 import os
-from typing import Dict, List
-from app.agents.graph import create_agent_graph
+import threading
+from typing import Any, Dict, List, Optional
+from app.agents.graph import create_agent_graph, initialize_state
 from app.agents.state import AgentState
 from app.services.brain.memory_service import ConversationMemory
 from app.models.property import UserRequirements, PropertyScore
+from app.services.history.history_service import history_service
+from app.services.history.history_writer import history_writer
+from app.core.log import get_logger
+from app.core.postgres_service import postgres_service
+from app.core.serving import DATA_DIR, WORKERS
 
-SESSION_FILE = "data/sessions.json"
+logger = get_logger(__name__)
 
-# Shared session store and graph instance
+SESSION_FILE = os.path.join(DATA_DIR, "sessions.json")
+
+# "file": sessions live in this process and SESSION_FILE (a single worker)
+# "postgres": sessions live in agent_sessions, shared by all workers
+SESSION_STORE = os.getenv("SESSION_STORE") or ("postgres" if WORKERS > 1 else "file")
+
+SAVE_SESSION_QUERY = """
+    INSERT INTO agent_sessions (session_id, state) VALUES (%s, %s::jsonb)
+    ON CONFLICT (session_id) DO UPDATE SET state = EXCLUDED.state, updated_at = CURRENT_TIMESTAMP
+"""
+
+
+# chat_history rows loaded back into messages when a session is resumed
+HYDRATE_MESSAGES = 20
+
+# Sessions of the file store (filled from SESSION_FILE at startup) and graph instance
 sessions: Dict[str, AgentState] = {}
-agent_graph = create_agent_graph()
+_agent_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_agent_graph():
+    """the compiled chat graph, built on first use and shared by every router"""
+    global _agent_graph
+    if _agent_graph is None:
+        with _graph_lock:
+            if _agent_graph is None:
+                _agent_graph = create_agent_graph()
+    return _agent_graph
+
+
+def serialize_state(state: AgentState) -> Dict[str, Any]:
+    """a session as plain JSON values"""
+    state_copy = state.copy()
+
+    # Serialize Memory
+    if isinstance(state_copy.get('memory'), ConversationMemory):
+        state_copy['memory'] = state_copy['memory'].to_dict()
+
+    # Serialize Requirements
+    if isinstance(state_copy.get('requirements'), UserRequirements):
+        state_copy['requirements'] = state_copy['requirements'].model_dump(mode='json') if hasattr(state_copy['requirements'], 'model_dump') else state_copy['requirements'].dict()
+
+    # Serialize Search Results
+    if state_copy.get('search_results'):
+        serialized_results = []
+        for item in state_copy['search_results']:
+            if hasattr(item, 'dict'):
+                serialized_results.append(item.dict())
+            elif hasattr(item, 'model_dump'):
+                serialized_results.append(item.model_dump())
+            else:
+                serialized_results.append(item)
+        state_copy['search_results'] = serialized_results
+
+    # No special serialization needed for shown_properties_context (list of dicts)
+    return state_copy
+
+
+def deserialize_state(raw_state: Dict[str, Any]) -> AgentState:
+    """a session from the values written by serialize_state"""
+    # Restore Memory
+    if raw_state.get('memory'):
+        raw_state['memory'] = ConversationMemory.from_dict(raw_state['memory'])
+    else:
+        raw_state['memory'] = ConversationMemory()
+
+    # Restore Requirements
+    if raw_state.get('requirements'):
+        # Handle Enum conversion if necessary, Pydantic does this well
+        raw_state['requirements'] = UserRequirements(**raw_state['requirements'])
+    else:
+        raw_state['requirements'] = UserRequirements()
+
+    # Restore Search Results
+    if raw_state.get('search_results'):
+        restored_results = []
+        for item in raw_state['search_results']:
+            try:
+                restored_results.append(PropertyScore(**item))
+            except:
+                restored_results.append(item)
+        raw_state['search_results'] = restored_results
+
+    return raw_state
+
 
 def save_sessions_to_file():
     """Save the current shared sessions to file"""
@@ -18,34 +107,8 @@ def save_sessions_to_file():
 
 def save_sessions(sessions_to_save: Dict[str, AgentState]):
     """Save sessions to file"""
-    data = {}
-    for sid, state in sessions_to_save.items():
-        state_copy = state.copy()
-        
-        # Serialize Memory
-        if isinstance(state_copy.get('memory'), ConversationMemory):
-            state_copy['memory'] = state_copy['memory'].to_dict()
-        
-        # Serialize Requirements
-        if isinstance(state_copy.get('requirements'), UserRequirements):
-            state_copy['requirements'] = state_copy['requirements'].model_dump(mode='json') if hasattr(state_copy['requirements'], 'model_dump') else state_copy['requirements'].dict()
-            
-        # Serialize Search Results
-        if state_copy.get('search_results'):
-            serialized_results = []
-            for item in state_copy['search_results']:
-                if hasattr(item, 'dict'):
-                    serialized_results.append(item.dict())
-                elif hasattr(item, 'model_dump'):
-                    serialized_results.append(item.model_dump())
-                else:
-                    serialized_results.append(item)
-            state_copy['search_results'] = serialized_results
-            
-        # No special serialization needed for shown_properties_context (list of dicts)
-        
-        data[sid] = state_copy
-        
+    data = {sid: serialize_state(state) for sid, state in sessions_to_save.items()}
+
     os.makedirs(os.path.dirname(SESSION_FILE), exist_ok=True)
     with open(SESSION_FILE, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2, default=str)
@@ -58,35 +121,124 @@ def load_sessions() -> Dict[str, AgentState]:
     try:
         with open(SESSION_FILE, 'r', encoding='utf-8') as f:
             data = json.load(f)
-            
-        sessions = {}
-        for sid, raw_state in data.items():
-            # Restore Memory
-            if raw_state.get('memory'):
-                 raw_state['memory'] = ConversationMemory.from_dict(raw_state['memory'])
-            else:
-                 raw_state['memory'] = ConversationMemory()
-                 
-            # Restore Requirements
-            if raw_state.get('requirements'):
-                # Handle Enum conversion if necessary, Pydantic does this well
-                raw_state['requirements'] = UserRequirements(**raw_state['requirements'])
-            else:
-                 raw_state['requirements'] = UserRequirements()
-
-            # Restore Search Results
-            if raw_state.get('search_results'):
-                restored_results = []
-                for item in raw_state['search_results']:
-                    try:
-                        restored_results.append(PropertyScore(**item))
-                    except:
-                        restored_results.append(item)
-                raw_state['search_results'] = restored_results
-
-            sessions[sid] = raw_state
-            
-        return sessions
+
+        return {sid: deserialize_state(raw_state) for sid, raw_state in data.items()}
     except Exception as e:
-        print(f"Error loading sessions: {e}")
+        logger.error("error loading sessions: %s", e)
         return {}
+
+
+class FileSessionStore:
+    """sessions kept in this process and written to SESSION_FILE (one worker only)"""
+
+    def __init__(self, sessions: Dict[str, AgentState]):
+        self.sessions = sessions
+
+    def load(self) -> int:
+        self.sessions.update(load_sessions())
+        return len(self.sessions)
+
+    def get(self, session_id: str) -> Optional[AgentState]:
+        state = self.sessions.get(session_id)
+        if state is None:
+            # written by an earlier run of the app
+            state = load_sessions().get(session_id)
+            if state is not None:
+                self.sessions[session_id] = state
+        return state
+
+    def save(self, session_id: str, state: AgentState):
+        self.sessions[session_id] = state
+        save_sessions(self.sessions)
+
+    def delete(self, session_id: str) -> bool:
+        if self.sessions.pop(session_id, None) is None:
+            return False
+        save_sessions(self.sessions)
+        return True
+
+    def count(self) -> int:
+        return len(self.sessions)
+
+
+class PostgresSessionStore:
+    """
+    sessions in the agent_sessions table, so every worker sees every conversation.
+    Each turn reads and writes one row instead of rewriting a file of all sessions.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or postgres_service
+
+    def load(self) -> int:
+        # nothing to preload, sessions are read when a request needs them
+        return self.count()
+
+    def get(self, session_id: str) -> Optional[AgentState]:
+        rows = self.db.execute_raw("SELECT state FROM agent_sessions WHERE session_id = %s", (session_id,))
+        return deserialize_state(rows[0]["state"]) if rows else None
+
+    def save(self, session_id: str, state: AgentState):
+        data = json.dumps(serialize_state(state), ensure_ascii=False, default=str)
+        self.db.execute_raw(SAVE_SESSION_QUERY, (session_id, data))
+
+    def delete(self, session_id: str) -> bool:
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("DELETE FROM agent_sessions WHERE session_id = %s", (session_id,))
+                conn.commit()
+                return cursor.rowcount > 0
+
+    def count(self) -> int:
+        return self.db.execute_raw("SELECT count(*) AS n FROM agent_sessions")[0]["n"]
+
+
+session_store = PostgresSessionStore() if SESSION_STORE == "postgres" else FileSessionStore(sessions)
+
+
+def snapshot_state(state: AgentState) -> Dict[str, Any]:
+    """the part of a session kept with its chat_sessions row (messages are in chat_history)"""
+    memory = state.get('memory')
+    requirements = state.get('requirements')
+    return {
+        'memory': memory.to_dict() if isinstance(memory, ConversationMemory) else memory,
+        'requirements': requirements.model_dump(mode='json') if isinstance(requirements, UserRequirements) else requirements,
+        'shown_ids': state.get('shown_ids') or [],
+        'current_stage': state.get('current_stage'),
+        'wants_exchange': state.get('wants_exchange', False),
+    }
+
+
+def hydrate_session(user_id: str, session_id: str) -> Optional[AgentState]:
+    """
+    Rebuild a session from Postgres: the last HYDRATE_MESSAGES messages and
+    the stored snapshot. None when the user has no history for it.
+    Waits for the history writer and the database, so async code runs it in a thread.
+    """
+    # messages still queued in this process must be visible to the read
+    history_writer.flush()
+
+    rows = history_service.get_session_messages(session_id, user_id, limit=HYDRATE_MESSAGES)
+    snapshot = history_service.get_session_snapshot(user_id, session_id)
+    if not rows and not snapshot:
+        return None
+
+    state = initialize_state(session_id)
+    state['messages'] = [{'role': r['role'], 'content': r['content']} for r in rows]
+    snapshot = snapshot or {}
+
+    requirements = UserRequirements(**snapshot['requirements']) if snapshot.get('requirements') else UserRequirements()
+    if snapshot.get('memory'):
+        memory = ConversationMemory.from_dict(snapshot['memory'])
+    else:
+        # older sessions: the facts are what the requirements hold
+        memory = ConversationMemory()
+        for key, value in requirements.model_dump(mode='json', exclude_defaults=True).items():
+            memory.add_fact(key, value)
+
+    state['memory'] = memory
+    state['requirements'] = requirements
+    state['shown_ids'] = snapshot.get('shown_ids', [])
+    state['current_stage'] = snapshot.get('current_stage') or state['current_stage']
+    state['wants_exchange'] = snapshot.get('wants_exchange', False)
+    return state
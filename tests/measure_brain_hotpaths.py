@@ -0,0 +1,244 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Micro-benchmarks for the brain services.
+#
+# Times PropertyScoringSystem.calculate_score, DecisionEngine.make_decision (fresh,
+# cached, refined within a session, by radius and by keywords), TextIndex.scores,
+# IVFIndex.search_text, DecisionEngine.hybrid_search,
+# ExchangeMatchingService.find_exchange_matches, RegexExtractor.extract_all and
+# read_snapshot on synthetic catalogs of 1k/10k/100k listings
+# (app.services.advertisements.synthetic) and a Persian query corpus.
+# Reports ops/sec, mean time, peak traced memory and the memory blocks still
+# allocated after one call. No database is needed.
+#
+#     python tests/measure_brain_hotpaths.py --json brain.json
+#     python tests/measure_brain_hotpaths.py --compare brain.json --max-regression 20
+
+import argparse
+import gc
+import json
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from app.models.property import PropertyType, TransactionType, UserRequirements
+from app.services.advertisements.app_property.property_manager import property_manager
+from app.services.advertisements.app_property.snapshot import read_snapshot, write_snapshot
+from app.services.advertisements.synthetic import build_catalog, generate_listings
+from app.services.brain.decision_engine import DecisionEngine
+from app.services.brain.matching import ExchangeMatchingService
+from app.services.brain.regex_extractor import RegexExtractor
+from app.services.brain.scoring import PropertyScoringSystem
+
+SIZES = [1_000, 10_000, 100_000]
+
+QUERIES = [
+    UserRequirements(city="تهران", transaction_type=TransactionType.SALE,
+                     property_type=PropertyType.APARTMENT, budget_max=9_000_000_000, area_min=80),
+    UserRequirements(city="گرگان", transaction_type=TransactionType.SALE, district="ناهارخوران",
+                     budget_max=4_000_000_000, must_have_parking=True),
+    UserRequirements(city="مشهد", transaction_type=TransactionType.SALE, budget_min=2_000_000_000,
+                     budget_max=6_000_000_000, bedrooms_min=2, must_have_elevator=True),
+]
+
+# within a radius of a district (grid index) instead of in it
+NEAR_QUERY = UserRequirements(city="تهران", district="ونک", radius_km=3, transaction_type=TransactionType.SALE,
+                              property_type=PropertyType.APARTMENT)
+
+# QUERIES[0] ranked by text relevance too (full-text index)
+KEYWORD_QUERY = QUERIES[0].model_copy(update={"keywords": ["نورگیر", "لابی", "مترو"]})
+
+# a free-form wish (semantic index), alone and merged with QUERIES[0]
+WISH = "یه جای دنج و نورگیر با لابی مجلل، نزدیک مرکز خرید"
+
+# successive changes to QUERIES[0] (see make_decision[N refined])
+REFINEMENTS = [{}, {"bedrooms_min": 2}, {"bedrooms_min": 2, "must_have_parking": True}, {"bedrooms_min": 3}]
+
+MESSAGES = [
+    "خونه میخوام توی گرگان آپارتمان باشه برای خرید",
+    "یه آپارتمان تو تهران برای خرید میخوام تا ۸ میلیارد",
+    "بودجه‌ام بین ۳ تا ۵ میلیارد تومنه، حداقل ۱۰۰ متر",
+    "منطقه ونک باشه",
+    "میخوام ماشینم رو با خونه معاوضه کنم",
+    "ویلا برای خرید تو گرگان تا ۱۰ میلیارد",
+    "سلام وقت بخیر",
+    "آپارتمان ۸۰ متری تو تهران برای اجاره",
+]
+
+
+def measure(func: Callable, min_seconds: float = 0.3, rounds: int = 5) -> Dict[str, float]:
+    """best-of-rounds timing, plus the memory one call allocates"""
+    func()  # warm caches
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed * rounds >= min_seconds or calls >= 1_000_000:
+            break
+        calls *= 2
+
+    best = elapsed
+    for _ in range(rounds - 1):
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, time.perf_counter() - started)
+
+    gc.collect()
+    gc.disable()
+    try:
+        blocks_before = sys.getallocatedblocks()
+        tracemalloc.start()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        blocks = sys.getallocatedblocks() - blocks_before
+        del result
+    finally:
+        gc.enable()
+
+    mean = best / calls
+    return {
+        "ops_per_sec": round(1 / mean, 2) if mean else 0.0,
+        "mean_us": round(mean * 1e6, 3),
+        "peak_kib": round(peak / 1024, 1),
+        "blocks": blocks,
+    }
+
+
+def benchmarks(sizes: List[int]) -> Dict[str, Callable]:
+    scoring = PropertyScoringSystem()
+    engine = DecisionEngine()
+    matching = ExchangeMatchingService()
+    extractor = RegexExtractor()
+
+    cases = {
+        "extract_all[corpus]": lambda: [extractor.extract_all(m) for m in MESSAGES],
+    }
+    for size in sizes:
+        catalog = build_catalog(generate_listings(size, seed=42))
+        records = catalog.records
+        sample = records[:1000]
+        exchange = [r for r in records if r.open_to_exchange]
+        cases[f"calculate_score[1000 of {size}]"] = (
+            lambda sample=sample: [scoring.calculate_score(r, q) for q in QUERIES for r in sample]
+        )
+
+        def decide(catalog=catalog):
+            # the engine looks listings up by id; serve them from this catalog as in production
+            property_manager._catalog = catalog
+            return [engine.make_decision(catalog.records, q) for q in QUERIES]
+
+        cases[f"make_decision[{size}]"] = decide
+
+        def decide_cached(catalog=catalog):
+            # repeated requirements, answered from the engine's result cache
+            property_manager._catalog = catalog
+            return [engine.make_decision(catalog.records, q, catalog_version=catalog.version) for q in QUERIES]
+
+        cases[f"make_decision[{size} cached]"] = decide_cached
+
+        def decide_refined(catalog=catalog):
+            # a session changing one requirement at a time, re-ranked from its last search
+            property_manager._catalog = catalog
+            engine.result_cache.clear()
+            return [engine.make_decision(catalog.records, q.model_copy(update=change),
+                                         catalog_version=catalog.version, session_id="measure")
+                    for q in QUERIES[:1] for change in REFINEMENTS]
+
+        cases[f"make_decision[{size} refined]"] = decide_refined
+
+        def decide_near(catalog=catalog):
+            property_manager._catalog = catalog
+            return engine.make_decision(catalog.records, NEAR_QUERY)
+
+        cases[f"make_decision[{size} near]"] = decide_near
+
+        def decide_keywords(catalog=catalog):
+            property_manager._catalog = catalog
+            return engine.make_decision(catalog.records, KEYWORD_QUERY)
+
+        cases[f"make_decision[{size} keywords]"] = decide_keywords
+        text_index = engine._text_index(records)
+        cases[f"text_scores[{size}]"] = lambda text_index=text_index: text_index.scores("نورگیر لابی مترو")
+
+        semantic_index = catalog.semantic_index()
+        cases[f"semantic_search[{size}]"] = lambda semantic_index=semantic_index: semantic_index.search_text(WISH)
+
+        def hybrid(catalog=catalog):
+            property_manager._catalog = catalog
+            return engine.hybrid_search(catalog, QUERIES[0], WISH)
+
+        cases[f"hybrid_search[{size}]"] = hybrid
+        cases[f"find_exchange_matches[{size}]"] = (
+            lambda exchange=exchange: matching.find_exchange_matches("ماشین", 2_000_000_000, exchange)
+        )
+
+        # cold start of a worker: map the snapshot another worker wrote, then search it
+        path = os.path.join(tempfile.mkdtemp(), "catalog.snapshot")
+        write_snapshot(catalog, path)
+        cases[f"read_snapshot[{size}]"] = lambda path=path: read_snapshot(path)
+
+        def decide_mapped(mapped=read_snapshot(path)):
+            property_manager._catalog = mapped
+            return [engine.make_decision(mapped.records, q) for q in QUERIES]
+
+        cases[f"make_decision[{size} mapped]"] = decide_mapped
+    return cases
+
+
+def print_report(results: Dict[str, Dict], baseline: Dict = None, max_regression: float = None) -> List[str]:
+    print(f"{'benchmark':<38}{'ops/s':>12}{'mean us':>14}{'peak KiB':>11}{'blocks':>9}")
+    regressions = []
+    for name, stats in results.items():
+        line = (f"{name:<38}{stats['ops_per_sec']:>12.2f}{stats['mean_us']:>14.1f}"
+                f"{stats['peak_kib']:>11.1f}{stats['blocks']:>9}")
+        before = (baseline or {}).get(name)
+        if before and before["mean_us"]:
+            change = (stats["mean_us"] / before["mean_us"] - 1) * 100
+            line += f"   {change:+.1f}%"
+            if max_regression is not None and change > max_regression:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="brain service micro-benchmarks")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in SIZES), help="catalog sizes, comma separated")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--json", help="write the result to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare mean time against")
+    parser.add_argument("--max-regression", type=float, help="exit 1 if a benchmark is this many percent slower")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    results = {}
+    for name, func in benchmarks(sizes).items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(func)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = print_report(results, baseline, args.max_regression)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
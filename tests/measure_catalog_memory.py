@@ -0,0 +1,55 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import gc
+import tracemalloc
+from app.services.advertisements.app_property.catalog import PropertyCatalog
+from app.services.advertisements.app_property.property_manager import property_manager
+from measure_property_construction import make_divar_record
+
+ROWS = 20000
+DESCRIPTION = "آپارتمان نوساز، نورگیر عالی، دسترسی به مترو و مراکز خرید. " * 4
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    held = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return size
+
+
+def measure_catalog_memory():
+    # each row owns its strings, as they come out of the database driver
+    records = []
+    for i in range(ROWS):
+        r = make_divar_record(i)
+        r["city"] = "".join(["تهر", "ان"])
+        r["district"] = "".join(["ون", "ک"])
+        r["description"] = DESCRIPTION + str(i)
+        records.append(r)
+
+    def as_properties():
+        return [property_manager._map_divar_record_to_property(r) for r in records]
+
+    def as_catalog():
+        catalog = PropertyCatalog()
+        for r in records:
+            catalog.add(property_manager._divar_record_values(r))
+        return catalog.freeze()
+
+    pydantic_bytes = measure(as_properties)
+    catalog_bytes = measure(as_catalog)
+
+    print(f"{ROWS} listings held in memory")
+    print(f"List[Property]:  {pydantic_bytes / ROWS:7.0f} bytes per listing")
+    print(f"PropertyCatalog: {catalog_bytes / ROWS:7.0f} bytes per listing")
+
+
+if __name__ == "__main__":
+    measure_catalog_memory()
@@ -0,0 +1,201 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# In-process /chat benchmark.
+#
+# Drives the FastAPI app through httpx's ASGI transport with scripted Persian
+# conversations and a fake LLM client, and reports p50/p95/p99 per stage and
+# throughput. Needs the database from .env (the catalog is read from it).
+#
+#     python tests/measure_chat_latency.py --conversations 50 --concurrency 4 --json out.json
+#     python tests/measure_chat_latency.py --compare out.json
+#     python tests/measure_chat_latency.py --corpus conversations.jsonl  (from app.services.advertisements.synthetic)
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Dict, List
+
+import httpx
+
+# scripted conversations, one user message per turn
+CORPUS = [
+    [
+        "سلام",
+        "خونه میخوام توی گرگان آپارتمان باشه برای خرید",
+        "۵ میلیارد هم پول دارم",
+        "حداقل ۱۰۰ متر باشه",
+        "پارکینگ هم داشته باشه",
+    ],
+    [
+        "یه آپارتمان تو تهران برای خرید میخوام تا ۸ میلیارد",
+        "منطقه ونک باشه",
+        "آسانسور داشته باشه",
+        "موارد دیگه هم داری؟",
+    ],
+    [
+        "میخوام ماشینم رو با خونه معاوضه کنم",
+        "ماشینم حدود ۲ میلیارد میارزه",
+        "تو گرگان باشه بهتره",
+    ],
+    [
+        "ویلا برای خرید تو گرگان تا ۱۰ میلیارد",
+        "از اول شروع کنیم",
+        "آپارتمان ۸۰ متری تو تهران برای خرید ۴ میلیارد",
+    ],
+]
+
+# span names of app.core.tracing, in the order a turn runs them
+STAGES = [
+    "session_load", "graph", "extraction", "should_search", "catalog", "decision", "filter",
+    "score", "exchange_match", "hydrate", "render", "llm", "persist",
+]
+
+_timings: Dict[str, List[float]] = defaultdict(list)
+
+
+def record_span(stage: str, seconds: float):
+    _timings[stage].append(seconds)
+
+
+class FakeCompletions:
+    """stands in for client.chat.completions of the OpenAI SDK"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def create(self, model, messages, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        text = "باشه، چند گزینه خوب برات پیدا کردم. بیشتر بگو دنبال چی هستی؟"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def instrument(llm_latency: float):
+    """fake LLM, temp session file and a listener on the request spans"""
+    import app.agents.nodes as nodes
+    import app.services.llm_brain.persistence as persistence
+    from app.core.tracing import add_listener
+
+    nodes.llm_service.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(llm_latency)))
+    persistence.SESSION_FILE = os.path.join(tempfile.mkdtemp(), "sessions.json")
+    add_listener(record_span)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0}
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))] * 1000
+
+    return {
+        "count": len(ordered),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+    }
+
+
+async def run_conversation(client: httpx.AsyncClient, turns: List[str], latencies: List[float]):
+    session_id = None
+    for message in turns:
+        started = time.perf_counter()
+        resp = await client.post("/chat", json={"message": message, "session_id": session_id})
+        latencies.append(time.perf_counter() - started)
+        resp.raise_for_status()
+        session_id = resp.json()["session_id"]
+
+
+def load_corpus(path: str) -> List[List[str]]:
+    """user messages of each conversation in a synthetic conversations JSONL file"""
+    from app.services.advertisements.synthetic import read_jsonl
+    return [[turn["message"] for turn in conversation["turns"]] for conversation in read_jsonl(path)]
+
+
+async def run_benchmark(conversations: int, concurrency: int, warmup: int, corpus: List[List[str]] = CORPUS) -> Dict:
+    from app.main import app
+
+    latencies: List[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for i in range(warmup):
+            await run_conversation(client, corpus[i % len(corpus)], [])
+        _timings.clear()
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(conversations):
+            queue.put_nowait(corpus[i % len(corpus)])
+
+        async def worker():
+            while not queue.empty():
+                await run_conversation(client, queue.get_nowait(), latencies)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": percentiles(latencies),
+        "stages": {stage: percentiles(_timings[stage]) for stage in STAGES if stage in _timings},
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "seconds": round(elapsed, 3),
+    }
+
+
+def print_report(result: Dict, baseline: Dict = None):
+    print(f"\n{result['config']}")
+    print(f"{'stage':<12}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = [("request", result["requests"])] + list(result["stages"].items())
+    for name, stats in rows:
+        line = f"{name:<12}{stats['count']:>7}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+        if baseline:
+            before = baseline["requests"] if name == "request" else baseline["stages"].get(name)
+            if before and before["p95_ms"]:
+                line += f"   p95 {(stats['p95_ms'] / before['p95_ms'] - 1) * 100:+.1f}%"
+        print(line)
+    print(f"throughput: {result['throughput_rps']} requests/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="in-process /chat latency benchmark")
+    parser.add_argument("--conversations", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--llm-ms", type=float, default=0.0, help="simulated LLM latency per call")
+    parser.add_argument("--json", help="write the result to this file")
+    parser.add_argument("--compare", help="baseline JSON to compare p95 against")
+    parser.add_argument("--corpus", help="conversations JSONL to use instead of the built-in corpus")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else CORPUS
+    instrument(args.llm_ms / 1000)
+    result = asyncio.run(run_benchmark(args.conversations, args.concurrency, args.warmup, corpus))
+    result["config"] = {
+        "conversations": args.conversations,
+        "concurrency": args.concurrency,
+        "llm_ms": args.llm_ms,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
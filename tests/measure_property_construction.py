@@ -0,0 +1,84 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+from datetime import datetime
+from app.models.property import Property
+from app.services.advertisements.app_property.property_manager import property_manager
+
+ROWS = 600
+ROUNDS = 20
+
+
+def make_divar_record(i):
+    return {
+        "id": i, "title": f"آپارتمان {i}", "description": "قابل معاوضه با ماشین",
+        "property_type": "آپارتمان", "transaction_type": "فروش",
+        "price": 5_000_000_000 + i, "area": 100 + i % 50, "vpm": 50_000_000,
+        "city": "تهران", "district": "ونک", "bedrooms": 2, "year_built": 1395,
+        "floor": 3, "total_floors": 5, "units": 10, "document_type": "تک برگ",
+        "has_parking": True, "has_elevator": True, "has_storage": False, "is_renovated": False,
+        "open_to_exchange": None, "exchange_preferences": None, "exchange_intent": True,
+        "exchange_tags": ["ماشین"], "source_link": f"https://divar.ir/v/{i}", "image_url": None,
+        "city_key": "تهران", "district_key": "ونک", "age": 8,
+    }
+
+
+def make_properties_row(i):
+    now = datetime.now()
+    return {
+        "id": f"id-{i}", "status": "تایید_شده", "created_at": now, "updated_at": now,
+        "owner_phone": "09120000000", "title": f"ویلا {i}", "description": "",
+        "property_type": "ویلا", "transaction_type": "فروش", "price": 9_000_000_000,
+        "area": 300, "city": "گرگان", "district": "ناهارخوران", "bedrooms": 3,
+        "year_built": 1398, "floor": 0, "total_floors": 2, "document_type": "تک برگ",
+        "has_parking": True, "has_elevator": False, "has_storage": True, "is_renovated": False,
+        "open_to_exchange": False, "exchange_preferences": [],
+        "age": 5, "vpm": 30_000_000, "city_key": "گرگان", "district_key": "ناهارخوران",
+    }
+
+
+def per_row_us(build, records):
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for r in records:
+            build(r)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(records) * 1e6
+
+
+def property_values(prop):
+    values = dict(prop)
+    return values
+
+
+def measure_property_construction():
+    divar_records = [make_divar_record(i) for i in range(ROWS)]
+    rows = [make_properties_row(i) for i in range(ROWS)]
+
+    # constructor cost alone, on identical field values
+    values = [property_values(property_manager._map_divar_record_to_property(r)) for r in divar_records]
+    validated = per_row_us(lambda v: Property(**v), values)
+    trusted = per_row_us(lambda v: Property.from_trusted(**v), values)
+
+    # whole mapping of a DB row, as the catalog load runs it
+    divar_mapping = per_row_us(property_manager._map_divar_record_to_property, divar_records)
+    internal_mapping = per_row_us(
+        lambda r: property_manager.convert_to_property(property_manager._map_db_to_submission(r)), rows
+    )
+
+    print(f"{ROWS} rows, best of {ROUNDS} rounds (microseconds per row)")
+    print(f"Property(**values):             {validated:7.1f}")
+    print(f"Property.from_trusted(**values): {trusted:7.1f}")
+    print(f"divar_data row -> Property:      {divar_mapping:7.1f}")
+    print(f"properties row -> Property:      {internal_mapping:7.1f}")
+    print(f"saved per search of {ROWS} rows: {(validated - trusted) * ROWS / 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    measure_property_construction()
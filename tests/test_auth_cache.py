@@ -0,0 +1,65 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import app.services.auth.access_token as access_token
+from app.core.cache import TTLCache
+
+class CountingDB:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+    def select(self, table, filters=None, limit=None, **kwargs):
+        self.calls += 1
+        return [r for r in self.rows if r["id"] == filters["id"]][:limit]
+
+def test_ttl_cache_expiry_and_lru():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=0.01)
+    cache.get("a")
+    cache.set("c", 3)  # drops "b", the least recently used
+    time.sleep(0.02)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    print(f"Stats: {cache.stats()}")
+
+def test_user_lookup_is_cached():
+    db = CountingDB([{"id": "u1", "phone_number": "0912", "is_verified": True}])
+    original = access_token.postgres_service
+    access_token.postgres_service = db
+    try:
+        access_token.invalidate_user("u1")
+        token = access_token.create_access_token("u1")
+
+        for _ in range(5):
+            payload = access_token.decode_access_token(token)
+            user = access_token.get_user_by_id(payload["sub"])
+        print(f"DB calls for 5 lookups: {db.calls}")
+        assert user["phone_number"] == "0912"
+        assert db.calls == 1
+
+        db.rows[0]["phone_number"] = "0935"
+        access_token.invalidate_user("u1")
+        assert access_token.get_user_by_id("u1")["phone_number"] == "0935"
+        assert db.calls == 2
+
+        # unknown users are not cached
+        assert access_token.get_user_by_id("missing") is None
+        assert access_token.get_user_by_id("missing") is None
+        assert db.calls == 4
+    finally:
+        access_token.postgres_service = original
+
+def test_invalid_token_rejected():
+    assert access_token.decode_access_token("not-a-token") is None
+
+if __name__ == "__main__":
+    test_ttl_cache_expiry_and_lru()
+    test_user_lookup_is_cached()
+    test_invalid_token_rejected()
@@ -0,0 +1,67 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models.property import Property, UserRequirements, TransactionType
+from app.services.advertisements.app_property.catalog import PropertyCatalog
+from app.services.advertisements.app_property.property_manager import property_manager
+from app.services.brain.scoring import PropertyScoringSystem
+from measure_property_construction import make_divar_record
+
+def make_catalog(count):
+    catalog = PropertyCatalog()
+    for i in range(count):
+        r = make_divar_record(i)
+        r["description"] = f"توضیحات آگهی {i}"
+        catalog.add(property_manager._divar_record_values(r))
+    return catalog.freeze()
+
+def test_record_round_trip():
+    catalog = make_catalog(3)
+    record = catalog.get("divar_1")
+    prop = property_manager._map_divar_record_to_property({**make_divar_record(1), "description": "توضیحات آگهی 1"})
+    print(f"Record: {record.id} {record.city} {record.description}")
+
+    assert record.description == "توضیحات آگهی 1"
+    assert record.to_property() == prop
+    assert not hasattr(record, "__dict__")
+
+def test_record_derives_fields_like_property():
+    values = property_manager._divar_record_values({**make_divar_record(2), "district": "ونك"})
+    for name in ("age", "city_key", "district_key", "latitude", "longitude"):
+        values.pop(name, None)
+    record = PropertyCatalog().add(values)
+    prop = Property.from_trusted(**values)
+    print(f"Derived: age={record.age} district_key={record.district_key} at {record.latitude},{record.longitude}")
+
+    assert record.district_key == "ونک"
+    for name in ("age", "city_key", "district_key", "latitude", "longitude"):
+        assert getattr(record, name) == getattr(prop, name)
+
+def test_records_share_strings():
+    catalog = make_catalog(3)
+    first, second = catalog.records[0], catalog.records[1]
+
+    assert first.city is second.city
+    assert first.district_key is second.district_key
+    assert first.exchange_preferences[0] is second.exchange_preferences[0]
+
+def test_scoring_accepts_records():
+    catalog = make_catalog(5)
+    requirements = UserRequirements(city="تهران", budget_max=6_000_000_000, transaction_type=TransactionType.SALE)
+    scoring = PropertyScoringSystem()
+
+    from_records = scoring.rank_properties(catalog.records, requirements)
+    from_properties = scoring.rank_properties([r.to_property() for r in catalog], requirements)
+    print(f"Scores: {[s.total_score for s in from_records]}")
+
+    assert [s.property_id for s in from_records] == [s.property_id for s in from_properties]
+    assert [s.total_score for s in from_records] == [s.total_score for s in from_properties]
+
+if __name__ == "__main__":
+    test_record_round_trip()
+    test_record_derives_fields_like_property()
+    test_records_share_strings()
+    test_scoring_accepts_records()
@@ -9,6 +9,10 @@ from app.services.brain.decision_engine import DecisionEngine
 from app.agents.nodes import _perform_search
 from app.agents.state import AgentState
 from app.services.brain.memory_service import ConversationMemory
+from app.services.advertisements.app_property.catalog import PropertyCatalog
+from app.services.advertisements.app_property.property_manager import property_manager
+from app.services.advertisements.synthetic import build_catalog, generate_listings
+from app.services.brain.geography import city_distance_km, nearest_city
 
 # Mock PropertyManager
 class MockPropertyManager:
@@ -16,6 +20,11 @@ class MockPropertyManager:
         self.props = props
     def get_all_properties(self):
         return self.props
+    def get_catalog(self):
+        catalog = PropertyCatalog()
+        for p in self.props:
+            catalog.add(dict(p))
+        return catalog.freeze()
     def get_property_by_id(self, pid):
         return next((p for p in self.props if p.id == pid), None)
 
@@ -62,5 +71,48 @@ def test_city_fallback():
     
     print("✅ City fallback test PASSED!")
 
+
+def test_nearest_city():
+    print("\n--- Testing nearest city ---")
+    assert 120 < city_distance_km("تهران", "قم") < 140
+    assert city_distance_km("تهران", "ناکجا") is None
+    assert nearest_city("ساری", {"تهران": 50, "گرگان": 2, "مشهد": 9}) == "گرگان"
+    assert nearest_city("ساری", {"تهران": 50, "گرگان": 0}) == "تهران"
+    # distance unknown: the city with most matches
+    assert nearest_city("ناکجا", {"تهران": 5, "گرگان": 9}) == "گرگان"
+    assert nearest_city("تهران", {"تهران": 5}) is None
+
+
+def test_fallback_ranks_nearest_city():
+    print("\n--- Testing other-city fallback ---")
+    catalog = build_catalog(generate_listings(3000, seed=31))
+    property_manager._catalog = catalog
+    engine = DecisionEngine()
+    calls = []
+    apply_filters = engine._apply_hard_filters
+    engine._apply_hard_filters = lambda properties, req: calls.append(req) or apply_filters(properties, req)
+
+    # no listings in Sari; Gorgan is the nearest city that has some
+    requirements = UserRequirements(city="ساری", transaction_type=TransactionType.SALE,
+                                    property_type=PropertyType.APARTMENT, budget_max=8_000_000_000)
+    decision = engine.make_decision(catalog.records, requirements)
+    print(decision['decision_summary'])
+    assert decision['city_mismatch'] and decision['found_city'] == "گرگان"
+    assert len(calls) == 1
+
+    # the same ranking as searching Gorgan without a city filter
+    expected = [r for r in apply_filters(catalog.records, requirements.model_copy(update={"city": None}))[0]
+                if r.city_key == "گرگان"]
+    ranked = engine.scoring_system.rank_properties(expected, requirements.model_copy(update={"city": None}))
+    assert decision['properties'] == ranked
+    assert decision['decision_summary']['matches_by_city']["گرگان"] == len(expected)
+
+    # nothing anywhere
+    none = requirements.model_copy(update={"budget_max": 1000})
+    assert engine.make_decision(catalog.records, none)['status'] == 'no_results'
+
+
 if __name__ == "__main__":
     test_city_fallback()
+    test_nearest_city()
+    test_fallback_ranks_nearest_city()
@@ -0,0 +1,83 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models.property import Property
+from app.services.advertisements.app_property import property_manager as manager_module
+from app.services.advertisements.app_property.property_manager import PropertyManager
+from app.services.advertisements.backfill_derived import derive_property_row
+from app.services.advertisements.derived_fields import (
+    CURRENT_SHAMSI_YEAR, compute_age, compute_vpm, normalize_location_key
+)
+
+def test_derived_values():
+    assert compute_vpm(5_000_000_000, 100) == 50_000_000
+    assert compute_vpm(5_000_000_000, 0) is None
+    assert compute_age(CURRENT_SHAMSI_YEAR - 3) == 3
+    assert compute_age(None) is None
+    assert normalize_location_key(" خرم‌آباد ") == normalize_location_key("خرم  آباد")
+    assert normalize_location_key("ونك") == "ونک"
+    print("Derived values OK")
+
+def test_property_fills_missing_fields():
+    prop = Property(
+        id="1", title="t", property_type="آپارتمان", transaction_type="فروش",
+        price=1000, area=10, city="تهران", district="ونك", description="", owner_phone="0912",
+        year_built=CURRENT_SHAMSI_YEAR - 5,
+    )
+    print(f"Property: age={prop.age} district_key={prop.district_key}")
+
+    assert prop.age == 5
+    assert prop.district_key == "ونک"
+    # lookup keys are not part of the API output
+    assert "district_key" not in prop.model_dump()
+
+def test_backfill_row_from_age_only():
+    row = derive_property_row({
+        "id": 7, "age": 10, "year_built": None, "price": 300, "area": 3,
+        "city": "تهران", "district": "ونک",
+    })
+    print(f"Backfilled: {row}")
+
+    assert row == (7, 10, CURRENT_SHAMSI_YEAR - 10, 100, "تهران", "ونک")
+
+class FakeDatabase:
+    """one stored properties row; update() records the columns written"""
+    def __init__(self, row):
+        self.row = dict(row)
+        self.updates = []
+    def select(self, table, filters=None, **kwargs):
+        return [dict(self.row)]
+    def update(self, table, row_id, data):
+        self.updates.append(dict(data))
+        self.row.update(data)
+        return [self.row]
+
+def test_update_recomputes_derived_fields():
+    database = FakeDatabase({
+        "id": "p1", "price": 6_000_000_000, "area": 100, "vpm": 60_000_000,
+        "city": "تهران", "district": "ونک", "city_key": "تهران", "district_key": "ونک",
+    })
+    original, manager_module.database_service = manager_module.database_service, database
+    try:
+        manager = PropertyManager()
+        assert manager.update_property_details("p1", {"area": 120})
+        assert manager.update_property_details("p1", {"city": "شيراز", "district": "قصردشت "})
+        assert manager.update_property_details("p1", {"year_built": CURRENT_SHAMSI_YEAR - 2})
+    finally:
+        manager_module.database_service = original
+    print(f"Updates: {database.updates}")
+
+    # each edit is one update holding its derived fields
+    assert database.updates[0] == {"area": 120, "vpm": 50_000_000}
+    assert database.updates[1]["city_key"] == "شیراز"
+    assert database.updates[1]["district_key"] == "قصردشت"
+    assert database.updates[2]["age"] == 2
+
+if __name__ == "__main__":
+    test_derived_values()
+    test_property_fills_missing_fields()
+    test_backfill_row_from_age_only()
+    test_update_recomputes_derived_fields()
@@ -0,0 +1,48 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi import HTTPException
+from app.services.advertisements.divar_property.divar_api import (
+    encode_cursor, decode_cursor, _parse_fields, _stream_rows
+)
+
+def test_cursor_round_trip():
+    for last_id in [1, 100, 987654321]:
+        cursor = encode_cursor(last_id)
+        assert str(last_id) not in cursor, "Cursor should be opaque"
+        assert decode_cursor(cursor) == last_id
+
+    try:
+        decode_cursor("not-a-cursor")
+        assert False, "Error: invalid cursor should be rejected"
+    except HTTPException as e:
+        assert e.status_code == 400
+
+    print("✅ Cursor round trip test PASSED!")
+
+def test_field_projection():
+    assert _parse_fields(None) is None
+    assert _parse_fields("price,title,price") == ["id", "price", "title"]
+
+    try:
+        _parse_fields("price,owner_password")
+        assert False, "Error: unknown field should be rejected"
+    except HTTPException as e:
+        assert e.status_code == 400
+
+    rows = [{"id": i, "price": i * 10, "title": f"t{i}", "city": "تهران"} for i in range(1, 451)]
+    body = "".join(_stream_rows(rows, ["id", "price", "has_parking"]))
+
+    import json
+    parsed = json.loads(body)
+    assert len(parsed) == 450
+    assert parsed[0] == {"id": 1, "price": 10, "has_parking": False}
+
+    print("✅ Field projection test PASSED!")
+
+if __name__ == "__main__":
+    test_cursor_round_trip()
+    test_field_projection()
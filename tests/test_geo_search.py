@@ -0,0 +1,139 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import random
+import numpy as np
+from app.models.property import PropertyType, TransactionType, UserRequirements
+from app.services.advertisements.app_property.property_manager import property_manager
+from app.services.advertisements.synthetic import build_catalog, generate_listings
+from app.services.brain.decision_engine import DecisionEngine, only_narrows
+from app.services.brain.geography import distance_km, locate, place_center
+from app.services.brain.regex_extractor import RegexExtractor
+from app.services.brain.spatial import GridIndex
+
+VANAK = place_center("تهران", "ونک")
+
+
+def random_points(count, seed=1):
+    rng = random.Random(seed)
+    points = [(rng.uniform(35.6, 35.85), rng.uniform(51.2, 51.6)) for _ in range(count)]
+    points[::50] = [(None, None)] * len(points[::50])
+    return points
+
+
+def test_gazetteer():
+    print("\n--- Testing gazetteer ---")
+    assert locate("تهران", "ونک") == VANAK
+    assert place_center(None, "ونک") == VANAK
+    assert place_center("تهران", None) == place_center("تهران", "محله ناشناخته")
+    assert place_center("ناکجا", None) is None
+    assert 4 < distance_km(VANAK, place_center("تهران", "تجریش")) < 7
+
+
+def test_grid_index_matches_brute_force():
+    print("\n--- Testing grid index ---")
+    points = random_points(5000)
+    index = GridIndex([p[0] for p in points], [p[1] for p in points])
+    located = [i for i, p in enumerate(points) if p[0] is not None]
+    assert len(index) == len(located)
+
+    for radius in (0.5, 2, 7.5):
+        expected = [i for i in located if distance_km(VANAK, points[i]) <= radius]
+        found = index.within(VANAK[0], VANAK[1], radius).tolist()
+        print(f"radius {radius}: {len(found)} points")
+        assert found == expected
+
+    by_distance = sorted(located, key=lambda i: (distance_km(VANAK, points[i]), i))
+    nearest = index.nearest(VANAK[0], VANAK[1], 25)
+    assert [i for i, _ in nearest] == by_distance[:25]
+    assert np.isclose([d for _, d in nearest], [distance_km(VANAK, points[i]) for i in by_distance[:25]]).all()
+    assert len(index.nearest(VANAK[0], VANAK[1], 10_000)) == len(located)
+
+
+def test_radius_search():
+    print("\n--- Testing radius search ---")
+    catalog = build_catalog(generate_listings(5000, seed=41))
+    property_manager._catalog = catalog
+    engine = DecisionEngine()
+    requirements = UserRequirements(city="تهران", district="ونک", radius_km=3, transaction_type=TransactionType.SALE,
+                                    property_type=PropertyType.APARTMENT)
+
+    decision = engine.make_decision(catalog.records, requirements, catalog_version=catalog.version)
+    results = [(catalog.get(s.property_id), s) for s in decision['properties']]
+    districts = {record.district for record, _ in results}
+    print(f"{len(results)} results in {sorted(districts)}")
+    assert decision['filters_applied']['radius'] and not decision['filters_applied']['district']
+    # neighbouring districts are found too
+    assert len(districts) > 1
+    for record, score in results:
+        distance = distance_km(VANAK, (record.latitude, record.longitude))
+        assert distance <= 3
+        # distance decay: full location weight at the centre, half at the edge
+        assert abs(score.score_details["location"] - 15 * 0.5 ** (distance / 3)) < 1e-9
+
+    # the same listings as a brute-force scan
+    expected = {r.id for r in catalog.records
+                if r.transaction_type == TransactionType.SALE and r.property_type == PropertyType.APARTMENT
+                and distance_km(VANAK, (r.latitude, r.longitude)) <= 3}
+    assert {record.id for record, _ in results} == expected
+
+
+def test_session_moves_radius_centre():
+    print("\n--- Testing a moved radius centre in a session ---")
+    catalog = build_catalog(generate_listings(5000, seed=43))
+    property_manager._catalog = catalog
+    session_engine = DecisionEngine()
+    requirements = UserRequirements(city="تهران", transaction_type=TransactionType.SALE, radius_km=6)
+    assert not only_narrows(requirements, requirements.model_copy(update={"district": "نارمک"}))
+
+    session_engine.make_decision(catalog.records, requirements, catalog_version=catalog.version, session_id="s1")
+    # choosing a district moves the centre of the circle away from the city centre
+    requirements.district = "نارمک"
+    moved = session_engine.make_decision(catalog.records, requirements, catalog_version=catalog.version,
+                                         session_id="s1")
+    fresh = DecisionEngine().make_decision(catalog.records, requirements, catalog_version=catalog.version)
+    print(f"{len(fresh['properties'])} results around نارمک")
+    assert fresh['properties']
+    assert [s.property_id for s in moved['properties']] == [s.property_id for s in fresh['properties']]
+    # the cached decision is the right one for other sessions too
+    other = session_engine.make_decision(catalog.records, requirements, catalog_version=catalog.version,
+                                         session_id="other")
+    assert [s.property_id for s in other['properties']] == [s.property_id for s in fresh['properties']]
+    assert len(other['properties']) == other['decision_summary']['properties_scored']
+    assert moved['decision_summary'] == fresh['decision_summary']
+
+
+def test_nearest_suggestion():
+    catalog = build_catalog(generate_listings(3000, seed=42))
+    property_manager._catalog = catalog
+    engine = DecisionEngine()
+    # nothing this cheap within 100 m of Vanak
+    requirements = UserRequirements(city="تهران", district="ونک", radius_km=0.1,
+                                    transaction_type=TransactionType.SALE, budget_max=3_000_000_000)
+    decision = engine.make_decision(catalog.records, requirements)
+    assert decision['status'] == 'no_results'
+
+    nearest = engine.nearest_properties(catalog.records, requirements, k=3)
+    print(f"nearest: {[(p.district, round(d, 2)) for p, d in nearest]}")
+    assert nearest and all(p.price <= 3_000_000_000 * 1.1 for p, _ in nearest)
+    assert [d for _, d in nearest] == sorted(d for _, d in nearest)
+    assert decision['recommendations'][0].startswith("نزدیک‌ترین ملک مناسب")
+
+
+def test_extract_radius():
+    extractor = RegexExtractor()
+    assert extractor.extract_all("یه آپارتمان نزدیک ونک میخوام")["radius_km"] == 2.0
+    assert extractor.extract_all("تا ۵ کیلومتری ونک تو تهران")["radius_km"] == 5.0
+    assert "radius_km" not in extractor.extract_all("آپارتمان نزدیک مترو تو ونک")
+
+
+if __name__ == "__main__":
+    test_gazetteer()
+    test_grid_index_matches_brute_force()
+    test_radius_search()
+    test_session_moves_radius_centre()
+    test_nearest_suggestion()
+    test_extract_radius()
@@ -0,0 +1,94 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import pytest
+from datetime import datetime
+from fastapi import HTTPException
+import app.services.history.history_service as history_module
+from app.routers.history import get_session_history
+from app.services.history.history_service import HistoryService
+
+class FakeDB:
+    """answers the page query from an in-memory chat_history"""
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+    def execute_raw(self, query, params):
+        self.queries.append((query, params))
+        if query.startswith("SELECT user_id"):
+            owners = [r["user_id"] for r in sorted(self.rows, key=lambda r: r["id"]) if r["session_id"] == params[0]]
+            return [{"user_id": owner} for owner in owners[:1]]
+        session_id, user_id, *rest = params
+        limit = rest.pop()
+        rows = [r for r in self.rows if r["session_id"] == session_id and r["user_id"] == user_id]
+        for condition, value in zip([c for c in ("id < %s", "id > %s", "created_at > %s") if c in query], rest):
+            field, op = condition.split()[:2]
+            rows = [r for r in rows if (r[field] < value if op == "<" else r[field] > value)]
+        rows.sort(key=lambda r: r["id"], reverse="DESC" in query)
+        return rows[:limit]
+
+def make_rows():
+    return [
+        {"id": i, "user_id": "u1" if i % 5 else "u2", "session_id": "s1", "role": "user",
+         "content": f"m{i}", "created_at": datetime(2026, 1, 1, 0, 0, i)}
+        for i in range(1, 31)
+    ]
+
+def run(db, **kwargs):
+    original = history_module.postgres_service
+    history_module.postgres_service = db
+    try:
+        return HistoryService.get_session_messages("s1", "u1", **kwargs)
+    finally:
+        history_module.postgres_service = original
+
+def test_newest_page_and_before():
+    db = FakeDB(make_rows())
+
+    page = run(db, limit=5)
+    print(f"Newest page: {[r['id'] for r in page]}")
+    assert [r["id"] for r in page] == [24, 26, 27, 28, 29]
+
+    older = run(db, before=page[0]["id"], limit=5)
+    assert [r["id"] for r in older] == [18, 19, 21, 22, 23]
+
+def test_after_and_since():
+    db = FakeDB(make_rows())
+
+    assert [r["id"] for r in run(db, after=26, limit=10)] == [27, 28, 29]
+    assert [r["id"] for r in run(db, since=datetime(2026, 1, 1, 0, 0, 27))] == [28, 29]
+
+def test_ownership_in_query():
+    db = FakeDB(make_rows())
+    run(db)
+    query, params = db.queries[0]
+
+    assert "user_id = %s" in query
+    assert params[:2] == ("s1", "u1")
+    assert all(r["user_id"] == "u1" for r in run(db, limit=100))
+
+def test_other_users_session_is_denied():
+    db = FakeDB(make_rows())
+    original = history_module.postgres_service
+    history_module.postgres_service = db
+    try:
+        page = asyncio.run(get_session_history("s1", limit=3, current_user={"id": "u1"}))
+        assert [r["id"] for r in page] == [27, 28, 29]
+        # s1 was started by u1
+        with pytest.raises(HTTPException) as denied:
+            asyncio.run(get_session_history("s1", limit=3, current_user={"id": "u2"}))
+        assert denied.value.status_code == 403
+        # a session with no history yet is empty
+        assert asyncio.run(get_session_history("new", limit=3, current_user={"id": "u2"})) == []
+    finally:
+        history_module.postgres_service = original
+
+if __name__ == "__main__":
+    test_newest_page_and_before()
+    test_after_and_since()
+    test_ownership_in_query()
+    test_other_users_session_is_denied()
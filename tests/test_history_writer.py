@@ -0,0 +1,92 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+from app.services.history.history_writer import HistoryWriter, _session_summaries
+
+class RecordingWriter(HistoryWriter):
+    """keeps the batches instead of writing them to Postgres"""
+    def __init__(self, fail_first=False, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+        self.snapshots = {}
+        self.fail_first = fail_first
+    def _store(self, rows, snapshots):
+        if self.fail_first:
+            self.fail_first = False
+            raise RuntimeError("connection refused")
+        if rows:
+            self.batches.append(list(rows))
+        self.snapshots.update(snapshots)
+        return len(rows)
+
+def test_batches_by_size_and_time():
+    writer = RecordingWriter(batch_size=10, flush_interval=0.05)
+    for i in range(25):
+        writer.enqueue("u1", "s1", "user", f"message {i}")
+    time.sleep(0.3)
+    print(f"Batches: {[len(b) for b in writer.batches]} metrics: {writer.metrics()}")
+
+    assert sum(len(b) for b in writer.batches) == 25
+    assert max(len(b) for b in writer.batches) <= 10
+    assert writer.metrics()["queue_depth"] == 0
+    writer.stop()
+
+def test_stop_flushes_queue():
+    writer = RecordingWriter(batch_size=1000, flush_interval=60)
+    for i in range(5):
+        writer.enqueue("u1", "s1", "assistant", f"answer {i}")
+    writer.stop()
+
+    rows = [row for batch in writer.batches for row in batch]
+    assert [r[3] for r in rows] == [f"answer {i}" for i in range(5)]
+    assert writer.metrics()["written"] == 5
+
+def test_flush_waits_for_collected_batch():
+    writer = RecordingWriter(batch_size=1000, flush_interval=60)
+    for i in range(3):
+        writer.enqueue("u1", "s1", "user", f"message {i}")
+    # the writer thread has taken them off the queue and holds them for its batch
+    time.sleep(0.1)
+    assert writer._queue.qsize() == 0
+
+    assert writer.flush() == 3
+    writer.write("u1", "s1", "assistant", "answer")
+    rows = [row for batch in writer.batches for row in batch]
+    print(f"Rows after flush: {[r[3] for r in rows]}")
+    assert [r[3] for r in rows] == ["message 0", "message 1", "message 2", "answer"]
+    writer.stop()
+
+def test_failed_batch_is_retried():
+    writer = RecordingWriter(fail_first=True)
+    writer._queue.put(("u1", "s1", "user", "first"))
+    assert writer.flush() == 0
+    assert writer.metrics()["queue_depth"] == 1
+
+    writer._queue.put(("u1", "s1", "user", "second"))
+    assert writer.flush() == 2
+    assert [r[3] for r in writer.batches[0]] == ["first", "second"]
+    assert writer.metrics()["failed_flushes"] == 1
+
+def test_session_summaries():
+    summaries = _session_summaries([
+        ("u1", "s1", "user", "سلام"),
+        ("u1", "s1", "assistant", "سلام، چه کمکی از من برمیاد؟"),
+        ("u2", "s2", "user", "خونه میخوام"),
+    ])
+    print(f"Summaries: {summaries}")
+
+    assert summaries == [
+        ("u1", "s1", "سلام، چه کمکی از من برمیاد؟", 2),
+        ("u2", "s2", "خونه میخوام", 1),
+    ]
+
+if __name__ == "__main__":
+    test_batches_by_size_and_time()
+    test_stop_flushes_queue()
+    test_flush_waits_for_collected_batch()
+    test_failed_batch_is_retried()
+    test_session_summaries()
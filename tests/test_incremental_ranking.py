@@ -0,0 +1,154 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models.property import PropertyType, TransactionType, UserRequirements
+from app.services.advertisements.app_property.property_manager import property_manager
+from app.services.advertisements.synthetic import build_catalog, generate_listings
+from app.services.brain.decision_engine import DecisionEngine, only_narrows, relaxed_requirement
+from app.services.brain.scoring import PropertyScoringSystem
+
+REQUIREMENTS = UserRequirements(city="تهران", transaction_type=TransactionType.SALE,
+                                property_type=PropertyType.APARTMENT, budget_max=20_000_000_000)
+
+# one requirement changed at a time, as a user refines a search
+CHANGES = [
+    {"budget_max": 15_000_000_000},   # narrower
+    {"bedrooms_min": 2},              # scoring only
+    {"must_have_parking": True},      # narrower
+    {"budget_max": 30_000_000_000},   # wider
+    {"area_min": 80, "max_age": 10},
+    {"must_have_parking": False},     # wider
+    {"district": "ونک"},
+    {"transaction_type": TransactionType.RENT},
+]
+
+
+def ranking(decision):
+    return [(s.property_id, s.total_score, s.match_percentage, s.score_details, s.missing_requirements)
+            for s in decision['properties']]
+
+
+def test_only_narrows():
+    print("\n--- Testing narrowing detection ---")
+    assert only_narrows(REQUIREMENTS, REQUIREMENTS.model_copy(update={"budget_max": 10_000_000_000}))
+    assert only_narrows(REQUIREMENTS, REQUIREMENTS.model_copy(update={"must_have_elevator": True, "area_min": 60}))
+    assert only_narrows(REQUIREMENTS, REQUIREMENTS.model_copy(update={"bedrooms_min": 3}))
+    assert not only_narrows(REQUIREMENTS, REQUIREMENTS.model_copy(update={"budget_max": 25_000_000_000}))
+    assert not only_narrows(REQUIREMENTS, REQUIREMENTS.model_copy(update={"city": "شیراز"}))
+    assert not only_narrows(REQUIREMENTS, REQUIREMENTS.model_copy(update={"transaction_type": TransactionType.RENT}))
+
+
+def test_incremental_matches_full_ranking():
+    print("\n--- Testing incremental re-ranking ---")
+    catalog = build_catalog(generate_listings(3000, seed=21))
+    property_manager._catalog = catalog
+    session_engine, fresh_engine = DecisionEngine(), DecisionEngine()
+
+    requirements = REQUIREMENTS.model_copy()
+    for change in [{}] + CHANGES:
+        # updated in place, like the chat node does
+        for key, value in change.items():
+            setattr(requirements, key, value)
+        incremental = session_engine.make_decision(catalog.records, requirements,
+                                                   catalog_version=catalog.version, session_id="s1")
+        full = fresh_engine.make_decision(catalog.records, requirements)
+        print(f"{change}: {len(full['properties'])} results")
+        assert ranking(incremental)[:50] == ranking(full)[:50]
+        assert incremental['decision_summary'] == full['decision_summary']
+
+    # a reloaded catalog is ranked from scratch
+    reloaded = build_catalog(generate_listings(3000, seed=22))
+    property_manager._catalog = reloaded
+    incremental = session_engine.make_decision(reloaded.records, requirements,
+                                               catalog_version=reloaded.version, session_id="s1")
+    assert ranking(incremental)[:50] == ranking(fresh_engine.make_decision(reloaded.records, requirements))[:50]
+
+
+# one filter relaxed at a time, from a narrow search
+RELAXATIONS = [
+    {"budget_max": 25_000_000_000},
+    {"area_min": 60},
+    {"must_have_parking": False},
+    {"year_built_min": None},
+    {"district": None},
+    {"budget_max": None},
+    {"property_type": None},
+]
+
+
+def test_relaxed_requirement():
+    narrow = REQUIREMENTS.model_copy(update={"district": "ونک", "area_min": 80})
+    assert relaxed_requirement(narrow, narrow.model_copy(update={"budget_max": 25_000_000_000})) == "budget_max"
+    assert relaxed_requirement(narrow, narrow.model_copy(update={"district": None})) == "district"
+    assert relaxed_requirement(narrow, narrow.model_copy(update={"area_min": None})) == "area_min"
+    # two filters at once, a narrower one, or a moved radius centre are filtered again
+    assert relaxed_requirement(narrow, narrow.model_copy(update={"area_min": 60, "budget_max": None})) is None
+    assert relaxed_requirement(narrow, narrow.model_copy(update={"area_min": 90})) is None
+    near = narrow.model_copy(update={"radius_km": 3})
+    assert relaxed_requirement(near, near.model_copy(update={"district": None})) is None
+    assert relaxed_requirement(near, near.model_copy(update={"radius_km": 5})) == "radius_km"
+
+
+def test_relaxing_filters_only_admitted_listings():
+    print("\n--- Testing relaxed requirements ---")
+    catalog = build_catalog(generate_listings(4000, seed=24))
+    property_manager._catalog = catalog
+    session_engine, fresh_engine = DecisionEngine(), DecisionEngine()
+
+    filtered_lists = []
+    apply_hard_filters = session_engine._apply_hard_filters
+    session_engine._apply_hard_filters = lambda props, req: filtered_lists.append(len(props)) or apply_hard_filters(props, req)
+
+    for start, relaxations in [
+        (dict(district="ونک", area_min=80, year_built_min=1395, must_have_parking=True), RELAXATIONS),
+        (dict(district="ونک", radius_km=2), [{"radius_km": 4}, {"radius_km": 6}]),
+    ]:
+        requirements = REQUIREMENTS.model_copy(update=start)
+        session_engine.make_decision(catalog.records, requirements, catalog_version=catalog.version, session_id="s2")
+        for change in relaxations:
+            for key, value in change.items():
+                setattr(requirements, key, value)
+            filtered_lists.clear()
+            incremental = session_engine.make_decision(catalog.records, requirements,
+                                                       catalog_version=catalog.version, session_id="s2")
+            full = fresh_engine.make_decision(catalog.records, requirements)
+            print(f"{change}: {len(full['properties'])} results, filtered lists of {filtered_lists}")
+            assert ranking(incremental) == ranking(full)
+            assert incremental['decision_summary'] == full['decision_summary']
+            # only the listings the relaxed filter admits went through the filters
+            assert filtered_lists and max(filtered_lists) < len(catalog)
+
+
+def test_rank_incremental_reuses_components():
+    scoring = PropertyScoringSystem()
+    records = build_catalog(generate_listings(500, seed=23)).records
+    ranked, components = scoring.rank_incremental(records, REQUIREMENTS)
+    assert ranked == scoring.rank_properties(records, REQUIREMENTS)
+
+    components_scored, full_scored = [], []
+    score_component, score_components = scoring._score_component, scoring._score_components
+    scoring._score_component = lambda name, prop, *args: components_scored.append(name) or score_component(name, prop, *args)
+    scoring._score_components = lambda prop, *args: full_scored.append(prop.id) or score_components(prop, *args)
+
+    # a bedrooms change only scores the bedrooms component again
+    changed = REQUIREMENTS.model_copy(update={"bedrooms_min": 2})
+    ranked, _ = scoring.rank_incremental(records, changed, components)
+    assert set(components_scored) == {"bedrooms"} and full_scored == []
+    assert ranked == scoring.rank_properties(records, changed)
+
+    # properties the last ranking did not have are scored in full
+    full_scored.clear()
+    more = build_catalog(generate_listings(520, seed=23)).records
+    scoring.rank_incremental(more, changed, components)
+    assert len(full_scored) == 20
+
+
+if __name__ == "__main__":
+    test_only_narrows()
+    test_incremental_matches_full_ranking()
+    test_relaxed_requirement()
+    test_relaxing_filters_only_admitted_listings()
+    test_rank_incremental_reuses_components()
@@ -0,0 +1,54 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import logging
+from app.core.log import JsonFormatter, TraceFilter
+from app.core.tracing import start_trace
+
+
+def make_record(level, msg, *args, **extra):
+    record = logging.LogRecord("app.test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_format_with_trace_and_extra():
+    print("\n--- Testing JSON log lines ---")
+    start_trace("trace-1")
+    record = make_record(logging.INFO, "catalog loaded: %d properties", 531, ms=12.5)
+    assert TraceFilter().filter(record)
+
+    line = JsonFormatter().format(record)
+    print(line)
+    entry = json.loads(line)
+    assert entry["msg"] == "catalog loaded: 531 properties"
+    assert entry["level"] == "INFO"
+    assert entry["trace_id"] == "trace-1"
+    assert entry["ms"] == 12.5
+
+
+def test_debug_sampling_per_trace():
+    print("\n--- Testing debug sampling ---")
+    sampler = TraceFilter(sample_rate=0.25)
+
+    kept_traces = 0
+    for i in range(400):
+        start_trace(f"trace-{i}")
+        decisions = {sampler.filter(make_record(logging.DEBUG, "event %d", n)) for n in range(5)}
+        # every event of one turn gets the same decision
+        assert len(decisions) == 1
+        kept_traces += decisions.pop()
+        # warnings are never sampled away
+        assert sampler.filter(make_record(logging.WARNING, "warning"))
+
+    print(f"kept {kept_traces}/400 traces")
+    assert 50 < kept_traces < 150
+
+
+if __name__ == "__main__":
+    test_json_format_with_trace_and_extra()
+    test_debug_sampling_per_trace()
@@ -0,0 +1,148 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Checks the pieces that let several workers serve the app: the catalog snapshot they
+# share and the session stores. The Postgres store test needs the database from .env.
+
+import tempfile
+import threading
+import pytest
+import app.services.llm_brain.persistence as persistence
+from app.agents.graph import initialize_state
+from app.core.postgres_service import postgres_service
+from app.models.property import UserRequirements
+from app.services.advertisements.app_property.property_manager import PropertyManager
+from app.services.advertisements.app_property.snapshot import (
+    SNAPSHOT_VERSION, CatalogSnapshot, read_snapshot, write_snapshot
+)
+from app.services.advertisements.synthetic import build_catalog, generate_listings
+
+
+def test_snapshot_round_trip():
+    print("\n--- Testing catalog snapshot ---")
+    catalog = build_catalog(generate_listings(500, seed=5))
+    path = os.path.join(tempfile.mkdtemp(), "catalog.snapshot")
+    size = write_snapshot(catalog, path)
+    print(f"{len(catalog)} properties, {size} bytes")
+
+    loaded = read_snapshot(path)
+    assert len(loaded) == len(catalog)
+    for original, copy in zip(catalog, loaded):
+        assert copy.to_property() == original.to_property()
+        assert copy.exchange_preferences == original.exchange_preferences
+        assert copy.city_key == original.city_key and copy.image_url is None
+    assert loaded.get("divar_42").title == catalog.get("divar_42").title
+    assert loaded.get("divar_0") is None
+
+    # columns are views of the mapped file, not copies
+    price = loaded.columns["price"]
+    assert not price.flags.owndata and not price.flags.writeable
+    assert price.tolist() == [r.price for r in catalog]
+
+    # categoricals are codes into a dictionary
+    cities = loaded.dictionaries["city"]
+    assert len(cities) == len({r.city for r in catalog})
+    assert [cities[code] for code in loaded.columns["city"]] == [r.city for r in catalog]
+
+
+def test_snapshot_version_is_checked():
+    path = os.path.join(tempfile.mkdtemp(), "catalog.snapshot")
+    write_snapshot(build_catalog(generate_listings(10, seed=5)), path)
+    with open(path, "r+b") as f:
+        f.seek(4)
+        f.write((SNAPSHOT_VERSION + 1).to_bytes(4, "little"))
+
+    with pytest.raises(ValueError):
+        read_snapshot(path)
+    # an outdated file is rebuilt rather than read
+    assert CatalogSnapshot(path).read(ttl=60) is None
+
+
+def make_worker(path, catalog, loads):
+    """a PropertyManager as another worker process would have it, loading `catalog` from 'Postgres'"""
+    manager = PropertyManager()
+    manager._snapshot = CatalogSnapshot(path)
+
+    def load():
+        loads.append(manager)
+        return build_catalog(generate_listings(len(catalog), seed=5))
+
+    manager._load_catalog = load
+    return manager
+
+
+def test_workers_share_one_load():
+    print("\n--- Testing shared catalog refresh ---")
+    path = os.path.join(tempfile.mkdtemp(), "catalog.snapshot")
+    catalog = build_catalog(generate_listings(300, seed=5))
+    loads = []
+    workers = [make_worker(path, catalog, loads) for _ in range(4)]
+
+    # all stale at once: one loads from Postgres, the rest read its snapshot
+    results = {}
+    threads = [threading.Thread(target=lambda w=w: results.setdefault(id(w), w.get_catalog())) for w in workers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(loads) == 1
+    assert all(len(c) == 300 for c in results.values())
+
+    # a cached catalog is served without touching the file
+    first = workers[0].get_catalog()
+    assert workers[0].get_catalog() is first
+
+    # an ad changed in one worker makes every worker reload, again from a single load
+    workers[1].invalidate_catalog()
+    assert workers[2].get_catalog() is not results[id(workers[2])]
+    assert workers[0].get_catalog() is not first
+    assert len(loads) == 2
+
+
+def check_store(store):
+    state = initialize_state("multiworker-test")
+    state["messages"].append({"role": "user", "content": "سلام"})
+    state["requirements"] = UserRequirements(city="گرگان", budget_max=3_000_000_000)
+
+    store.save("multiworker-test", state)
+    loaded = store.get("multiworker-test")
+    assert loaded["messages"] == [{"role": "user", "content": "سلام"}]
+    assert loaded["requirements"].city == "گرگان"
+    assert store.count() >= 1
+
+    assert store.delete("multiworker-test")
+    assert store.get("multiworker-test") is None
+    assert not store.delete("multiworker-test")
+
+
+def test_file_session_store():
+    print("\n--- Testing file session store ---")
+    original = persistence.SESSION_FILE
+    persistence.SESSION_FILE = os.path.join(tempfile.mkdtemp(), "sessions.json")
+    try:
+        check_store(persistence.FileSessionStore({}))
+    finally:
+        persistence.SESSION_FILE = original
+
+
+def test_postgres_session_store():
+    try:
+        available = postgres_service.test_connection()
+    except Exception:
+        available = False
+    if not available:
+        pytest.skip("database not reachable")
+    print("\n--- Testing Postgres session store ---")
+    postgres_service.ensure_schema()
+    check_store(persistence.PostgresSessionStore())
+
+
+if __name__ == "__main__":
+    test_snapshot_round_trip()
+    test_snapshot_version_is_checked()
+    test_workers_share_one_load()
+    test_file_session_store()
+    test_postgres_session_store()
@@ -0,0 +1,48 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Runs update_status against the database from .env; skipped when it is not reachable.
+
+import uuid
+import pytest
+from app.core.postgres_service import postgres_service
+from app.models.property_submission import PropertyStatus
+from app.services.advertisements.app_property.property_manager import PropertyManager
+
+
+def database_available():
+    try:
+        return postgres_service.test_connection()
+    except Exception:
+        return False
+
+
+def test_update_status_in_database():
+    if not database_available():
+        pytest.skip("database not reachable")
+    print("\n--- Testing status update ---")
+    postgres_service.ensure_schema()
+
+    property_id = str(uuid.uuid4())
+    postgres_service.insert("properties", {
+        "id": property_id, "title": "t", "property_type": "آپارتمان", "transaction_type": "فروش",
+        "status": "در_انتظار_تایید", "price": 1000, "area": 10, "city": "تهران", "district": "ونک",
+    })
+    try:
+        manager = PropertyManager()
+        assert manager.update_status(property_id, PropertyStatus.REJECTED, admin_note="no photos")
+
+        row = postgres_service.select("properties", filters={"id": property_id})[0]
+        print(f"Row: status={row['status']} note={row['admin_note']} updated_at={row['updated_at']}")
+        assert row["status"] == "رد_شده"
+        assert row["admin_note"] == "no photos"
+        assert row["updated_at"] is not None
+    finally:
+        postgres_service.delete("properties", property_id)
+
+
+if __name__ == "__main__":
+    test_update_status_in_database()
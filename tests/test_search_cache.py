@@ -0,0 +1,76 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models.property import PropertyType, TransactionType, UserRequirements
+from app.services.advertisements.app_property.property_manager import property_manager
+from app.services.advertisements.synthetic import build_catalog, generate_listings
+from app.services.brain.decision_engine import SEARCH_CACHE_MAX_RESULTS, DecisionEngine, requirements_key
+
+REQUIREMENTS = UserRequirements(city="تهران", transaction_type=TransactionType.SALE,
+                                property_type=PropertyType.APARTMENT, budget_max=20_000_000_000)
+
+
+def counting_engine():
+    engine = DecisionEngine()
+    calls = []
+    decide = engine._decide
+
+    def counted(properties, requirements, *args):
+        calls.append(requirements)
+        return decide(properties, requirements, *args)
+
+    engine._decide = counted
+    return engine, calls
+
+
+def test_requirements_key():
+    print("\n--- Testing requirements key ---")
+    same = UserRequirements(budget_max=20_000_000_000, property_type=PropertyType.APARTMENT,
+                            transaction_type=TransactionType.SALE, city="تهران", must_have_parking=False)
+    assert requirements_key(same) == requirements_key(REQUIREMENTS)
+    assert requirements_key(REQUIREMENTS.model_copy(update={"budget_max": 21_000_000_000})) != requirements_key(REQUIREMENTS)
+
+
+def test_cached_decision_is_reused():
+    print("\n--- Testing search cache ---")
+    catalog = build_catalog(generate_listings(2000, seed=11))
+    property_manager._catalog = catalog
+    engine, calls = counting_engine()
+
+    first = engine.make_decision(catalog.records, REQUIREMENTS, catalog_version=catalog.version)
+    second = engine.make_decision(catalog.records, REQUIREMENTS.model_copy(), catalog_version=catalog.version)
+    print(f"{len(first['properties'])} results, cache {engine.result_cache.stats()}")
+    assert len(calls) == 1
+    assert 50 < len(first['properties']) <= SEARCH_CACHE_MAX_RESULTS
+    # a hit returns what the miss did
+    assert [s.property_id for s in second['properties']] == [s.property_id for s in first['properties']]
+    assert second['decision_summary'] == first['decision_summary']
+    # and what the same search does uncached
+    uncached = DecisionEngine().make_decision(catalog.records, REQUIREMENTS)
+    assert [s.property_id for s in second['properties']] == [s.property_id for s in uncached['properties']]
+    assert engine.result_cache.stats()["hits"] == 1
+
+    # shown listings are dropped after the lookup
+    shown = [s.property_id for s in first['properties'][:3]]
+    third = engine.make_decision(catalog.records, REQUIREMENTS, catalog_version=catalog.version, exclude_ids=shown)
+    assert len(calls) == 1
+    assert [s.property_id for s in third['properties']][:2] == [s.property_id for s in first['properties'][3:5]]
+
+    # paging past the first results is still served from the cache
+    shown = [s.property_id for s in first['properties'][:50]]
+    rest = engine.make_decision(catalog.records, REQUIREMENTS, catalog_version=catalog.version, exclude_ids=shown)
+    assert len(calls) == 1
+    assert [s.property_id for s in rest['properties']] == [s.property_id for s in first['properties'][50:]]
+
+    # a reloaded catalog has a new version
+    reloaded = build_catalog(generate_listings(2000, seed=11))
+    engine.make_decision(reloaded.records, REQUIREMENTS, catalog_version=reloaded.version)
+    assert len(calls) == 2
+
+
+if __name__ == "__main__":
+    test_requirements_key()
+    test_cached_decision_is_reused()
@@ -0,0 +1,121 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import numpy as np
+from app.models.property import PropertyType, TransactionType, UserRequirements
+from app.services.advertisements.app_property.property_manager import property_manager
+from app.services.advertisements.app_property.snapshot import read_snapshot, write_snapshot
+from app.services.advertisements.synthetic import build_catalog, generate_listings
+from app.services.brain.decision_engine import MIN_SIMILARITY, DecisionEngine
+from app.services.brain.semantic import EMBEDDING_DIM, IVFIndex, embed, embed_texts, listing_text
+
+REQUIREMENTS = UserRequirements(city="تهران", transaction_type=TransactionType.SALE,
+                                property_type=PropertyType.APARTMENT, budget_max=20_000_000_000)
+WISH = "یه جای نورگیر با لابی مجلل و ویو ابدی"
+
+
+def clustered_vectors(count, clusters=40, seed=3):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, EMBEDDING_DIM))
+    vectors = centers[rng.integers(clusters, size=count)] + rng.normal(scale=0.6, size=(count, EMBEDDING_DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_embeddings():
+    print("\n--- Testing embeddings ---")
+    vector = embed("لابی مجلل")
+    assert vector.shape == (EMBEDDING_DIM,) and np.isclose(np.linalg.norm(vector), 1)
+    assert np.array_equal(vector, embed("لابي مجلل"))  # arabic ye
+    assert not embed(None).any() and not embed("و در با").any()
+    # texts sharing words and word parts are closer
+    assert vector @ embed("لابی بزرگ") > vector @ embed("حیاط بزرگ")
+
+    texts = ["ویلا با حیاط", None, "آپارتمان نورگیر، کابینت‌های هایگلاس"]
+    matrix = embed_texts(texts)
+    assert matrix.shape == (3, EMBEDDING_DIM)
+    assert np.allclose(matrix, [embed(t) for t in texts], atol=1e-6)
+    assert embed_texts([]).shape == (0, EMBEDDING_DIM)
+
+
+def test_ivf_matches_exact_search():
+    print("\n--- Testing IVF index ---")
+    vectors = clustered_vectors(4000)
+    index = IVFIndex.build(vectors)
+    assert len(index) == 4000 and len(index.centroids) == 63
+    assert sorted(index.order.tolist()) == list(range(4000))
+
+    rng = np.random.default_rng(9)
+    recalls = []
+    for query in vectors[rng.choice(4000, 20, replace=False)]:
+        exact = np.argsort(-(vectors @ query), kind="stable")[:10].tolist()
+        # probing every list is exact (up to the int8 quantization)
+        found = [row for row, _ in index.search(query, 10, probes=len(index.centroids))]
+        assert len(set(found) & set(exact)) >= 9
+        approximate = [row for row, _ in index.search(query, 10)]
+        recalls.append(len(set(approximate) & set(exact)) / 10)
+    print(f"recall@10 with default probes: {np.mean(recalls):.2f}")
+    assert np.mean(recalls) >= 0.8
+
+    similarities = [s for _, s in index.search(vectors[0], 5)]
+    assert similarities == sorted(similarities, reverse=True) and np.isclose(similarities[0], 1, atol=0.02)
+    assert IVFIndex.build(vectors[:0]).search(vectors[0]) == []
+
+
+def test_snapshot_stores_index():
+    print("\n--- Testing persisted index ---")
+    catalog = build_catalog(generate_listings(800, seed=13))
+    path = os.path.join(tempfile.mkdtemp(), "catalog.snapshot")
+    write_snapshot(catalog, path)
+    mapped = read_snapshot(path)
+
+    built, stored = catalog.semantic_index(), mapped.semantic_index()
+    for name in ("centroids", "offsets", "order", "vectors"):
+        assert np.array_equal(getattr(built, name), getattr(stored, name))
+    # read in place from the mapped file
+    assert not stored.vectors.flags.owndata and not stored.vectors.flags.writeable
+    assert stored.search_text(WISH, 10) == built.search_text(WISH, 10)
+    row = stored.search_text(WISH, 1)[0][0]
+    assert listing_text(mapped.records[row]) == listing_text(catalog.records[row])
+
+
+def test_hybrid_search():
+    print("\n--- Testing hybrid search ---")
+    catalog = build_catalog(generate_listings(3000, seed=17))
+    property_manager._catalog = catalog
+    engine = DecisionEngine()
+
+    hits = engine.hybrid_search(catalog, REQUIREMENTS, WISH, k=20)
+    print(f"{len(hits)} results, best {hits[0]}")
+    assert len(hits) == 20
+    scores = [score for _, score in hits]
+    assert scores == sorted(scores, reverse=True)
+    structured = [s.property_id for s in engine.make_decision(catalog.records, REQUIREMENTS)['properties']]
+    for property_id, _ in hits:
+        listing = catalog.get(property_id)
+        # semantic candidates still pass the hard filters
+        assert listing.city == "تهران" and listing.property_type == PropertyType.APARTMENT
+        assert listing.transaction_type == TransactionType.SALE and property_id in structured
+    # the best results are in both rankings, so they outscore the best of either one
+    assert hits[0][1] > 1 / 61
+
+    # without requirements for a search, only the semantic side answers
+    hits = engine.hybrid_search(catalog, UserRequirements(), WISH, k=10)
+    nearest = dict(catalog.semantic_index().search_text(WISH, 10))
+    rows = {r.id: i for i, r in enumerate(catalog.records)}
+    assert [rows[property_id] for property_id, _ in hits] == list(nearest)
+    assert all(similarity >= MIN_SIMILARITY for similarity in nearest.values())
+
+    # and without a related text, only the structured side
+    hits = engine.hybrid_search(catalog, REQUIREMENTS, "", k=10)
+    assert [property_id for property_id, _ in hits] == structured[:10]
+
+
+if __name__ == "__main__":
+    test_embeddings()
+    test_ivf_matches_exact_search()
+    test_snapshot_stores_index()
+    test_hybrid_search()
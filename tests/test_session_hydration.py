@@ -0,0 +1,69 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import app.services.llm_brain.persistence as persistence
+from app.agents.graph import initialize_state
+from app.models.property import UserRequirements, TransactionType
+from app.services.brain.memory_service import ConversationMemory
+
+class FakeHistory:
+    def __init__(self, rows, snapshot):
+        self.rows = rows
+        self.snapshot = snapshot
+    def get_session_messages(self, session_id, user_id, limit=100, **kwargs):
+        return self.rows[-limit:]
+    def get_session_snapshot(self, user_id, session_id):
+        return self.snapshot
+
+def hydrate(history):
+    original = persistence.history_service
+    persistence.history_service = history
+    try:
+        return persistence.hydrate_session("u1", "user_u1")
+    finally:
+        persistence.history_service = original
+
+def make_state():
+    state = initialize_state("user_u1")
+    memory = ConversationMemory()
+    memory.add_fact("city", "گرگان")
+    memory.add_fact("budget_max", 5_000_000_000)
+    state["memory"] = memory
+    state["requirements"] = UserRequirements(city="گرگان", budget_max=5_000_000_000, transaction_type=TransactionType.SALE)
+    state["shown_ids"] = ["divar_1", "divar_2"]
+    state["current_stage"] = "results_shown"
+    return state
+
+def test_snapshot_round_trip():
+    # stored as JSONB, so it has to survive json
+    snapshot = json.loads(json.dumps(persistence.snapshot_state(make_state()), ensure_ascii=False))
+    rows = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"m{i}"} for i in range(30)]
+
+    state = hydrate(FakeHistory(rows, snapshot))
+    print(f"Hydrated: {len(state['messages'])} messages, facts {list(state['memory'].facts)}")
+
+    assert [m["content"] for m in state["messages"]] == [f"m{i}" for i in range(10, 30)]
+    assert state["requirements"].city == "گرگان"
+    assert state["requirements"].transaction_type == TransactionType.SALE
+    assert state["memory"].get_fact("budget_max") == 5_000_000_000
+    assert state["shown_ids"] == ["divar_1", "divar_2"]
+    assert state["current_stage"] == "results_shown"
+
+def test_memory_from_requirements_only():
+    snapshot = {"requirements": {"city": "تهران", "budget_max": 8_000_000_000}}
+    state = hydrate(FakeHistory([{"role": "user", "content": "سلام"}], snapshot))
+
+    assert state["memory"].get_fact("city") == "تهران"
+    assert state["memory"].get_fact("budget_max") == 8_000_000_000
+
+def test_unknown_session():
+    assert hydrate(FakeHistory([], None)) is None
+
+if __name__ == "__main__":
+    test_snapshot_round_trip()
+    test_memory_from_requirements_only()
+    test_unknown_session()
@@ -0,0 +1,33 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import app.main as main
+import app.services.llm_brain.persistence as persistence
+
+
+def test_lifespan_builds_services_once():
+    print("\n--- Testing startup ---")
+    calls = []
+    original = main.postgres_service.ensure_schema
+    main.postgres_service.ensure_schema = lambda: calls.append("schema")
+    try:
+        async def run():
+            async with main.lifespan(main.app):
+                print(main.startup_phases)
+                assert calls == ["schema"]
+                assert set(main.startup_phases) == {"schema", "sessions", "catalog", "graph", "history_writer", "total"}
+                graph = persistence.get_agent_graph()
+                # one graph per process, shared by every router
+                assert persistence.get_agent_graph() is graph
+
+        asyncio.run(run())
+    finally:
+        main.postgres_service.ensure_schema = original
+
+
+if __name__ == "__main__":
+    test_lifespan_builds_services_once()
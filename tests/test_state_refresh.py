@@ -9,6 +9,7 @@ from app.services.brain.decision_engine import DecisionEngine
 from app.agents.nodes import _perform_search
 from app.agents.state import AgentState
 from app.services.brain.memory_service import ConversationMemory
+from app.services.advertisements.app_property.catalog import PropertyCatalog
 
 # Mock PropertyManager
 class MockPropertyManager:
@@ -16,6 +17,11 @@ class MockPropertyManager:
         self.props = props
     def get_all_properties(self):
         return self.props
+    def get_catalog(self):
+        catalog = PropertyCatalog()
+        for p in self.props:
+            catalog.add(dict(p))
+        return catalog.freeze()
     def get_property_by_id(self, pid):
         return next((p for p in self.props if p.id == pid), None)
 
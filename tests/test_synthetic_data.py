@@ -0,0 +1,66 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+from app.services.advertisements.synthetic import (
+    CITIES, build_catalog, generate_conversations, generate_listings, read_jsonl, write_jsonl
+)
+from app.services.brain.regex_extractor import RegexExtractor
+
+
+def test_listings_are_deterministic():
+    print("\n--- Testing listing generator ---")
+    first = list(generate_listings(200, seed=7))
+    assert first == list(generate_listings(200, seed=7))
+    assert first != list(generate_listings(200, seed=8))
+
+    # every listing passes the ingest validation
+    path = os.path.join(tempfile.mkdtemp(), "listings.jsonl")
+    assert write_jsonl(path, first) == 200
+    assert list(read_jsonl(path)) == first
+
+
+def test_catalog_from_listings():
+    print("\n--- Testing in-memory catalog ---")
+    listings = list(generate_listings(2000, seed=1))
+    catalog = build_catalog(listings)
+    assert len(catalog) == 2000
+
+    record = catalog.get("divar_1")
+    assert record.title == listings[0]["title"]
+    assert record.city_key and record.district_key
+
+    exchange = [r for r in catalog if r.open_to_exchange]
+    print(f"open to exchange: {len(exchange)}/2000")
+    assert 300 < len(exchange) < 900
+    assert all(r.exchange_preferences for r in exchange)
+
+    # sale price per meter follows the city table
+    def mean_vpm(city):
+        values = [r.price / r.area for r in catalog
+                  if r.city == city and r.transaction_type.value == "فروش" and r.property_type.value == "آپارتمان"]
+        return sum(values) / len(values)
+
+    assert mean_vpm("تهران") > mean_vpm("مشهد") > mean_vpm("گرگان")
+    assert {r.city for r in catalog} == set(CITIES)
+
+
+def test_conversations_match_extractor():
+    print("\n--- Testing conversation scripts ---")
+    extractor = RegexExtractor()
+    conversations = list(generate_conversations(300, seed=3))
+    assert conversations == list(generate_conversations(300, seed=3))
+
+    for conversation in conversations:
+        for turn in conversation["turns"]:
+            extracted = extractor.extract_all(turn["message"])
+            assert extracted == turn["expected"], (turn["message"], extracted, turn["expected"])
+
+
+if __name__ == "__main__":
+    test_listings_are_deterministic()
+    test_catalog_from_listings()
+    test_conversations_match_extractor()
@@ -0,0 +1,145 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import math
+import numpy as np
+from app.models.property import PropertyType, TransactionType, UserRequirements
+from app.services.advertisements.app_property.property_manager import property_manager
+from app.services.advertisements.synthetic import build_catalog, generate_listings
+from app.services.brain.decision_engine import DecisionEngine
+from app.services.brain.regex_extractor import RegexExtractor
+from app.services.brain.scoring import PropertyScoringSystem
+from app.services.brain.text_search import BM25_B, BM25_K1, TITLE_BOOST, TextIndex, tokenize
+
+DOCUMENTS = [
+    ("آپارتمان نورگیر", "آپارتمان ۱۲۰ متری، نورگیر عالی با بالکن"),
+    ("ویلا", "ویلا با حیاط و استخر"),
+    ("آپارتمان نوساز", "نوساز، کابينت‌های هایگلاس، نزدیک مترو"),
+    ("مغازه", None),
+    ("آپارتمان", "بالکن بزرگ، بالکن دوم رو به حیاط"),
+]
+
+REQUIREMENTS = UserRequirements(city="تهران", transaction_type=TransactionType.SALE,
+                                property_type=PropertyType.APARTMENT, budget_max=20_000_000_000)
+
+
+def bm25(documents, query):
+    """BM25 of every document, computed directly"""
+    docs = [tokenize(title) * TITLE_BOOST + tokenize(description) for title, description in documents]
+    average = sum(map(len, docs)) / len(docs)
+    scores = []
+    for doc in docs:
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in d for d in docs)
+            tf = doc.count(term)
+            if tf:
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / average))
+        scores.append(score)
+    return scores
+
+
+def test_tokenize():
+    print("\n--- Testing tokenizer ---")
+    # arabic letters, half-spaces, persian digits, plural endings and stopwords
+    assert tokenize("كابينت‌هاي نور‌گير ۱۲۰ متری، نزدیک مترو") == ["کابینت", "نورگیر", "120", "متر", "مترو"]
+    assert tokenize("بالکن‌ها") == tokenize("بالکن") == ["بالکن"]
+    assert tokenize("") == [] and tokenize(None) == []
+
+
+def test_bm25_matches_reference():
+    print("\n--- Testing BM25 ---")
+    index = TextIndex(DOCUMENTS)
+    assert len(index) == len(DOCUMENTS)
+    assert index.document_frequency("بالکن") == 2
+    for query in ("بالکن", "نورگیر بالکن", "حیاط استخر نوساز", "آپارتمان"):
+        expected = bm25(DOCUMENTS, query)
+        scores = index.scores(query)
+        print(f"{query}: {np.round(scores, 3).tolist()}")
+        assert np.allclose(scores, expected, rtol=1e-5)
+        best = sorted(range(len(expected)), key=lambda i: (-expected[i], i))
+        assert [row for row, _ in index.top(query, 2)] == best[:2]
+    assert index.scores("سونا") is None and index.top("سونا") == []
+
+
+def test_relevance():
+    print("\n--- Testing relevance ---")
+    index = TextIndex(DOCUMENTS, ids=[f"p{i}" for i in range(len(DOCUMENTS))])
+    relevance = index.relevance("بالکن", ["p1", "p4", "p0"])
+    # the best match of the whole index scores 1, rows without the term are left out
+    assert set(relevance) == {"p0", "p4"} and relevance["p4"] == 1.0
+    assert 0 < relevance["p0"] < 1
+    assert index.relevance("بالکن", ["p0"]) == {"p0": relevance["p0"]}
+    assert index.relevance("سونا", ["p0"]) == {}
+
+
+def test_keyword_search():
+    print("\n--- Testing keyword search ---")
+    catalog = build_catalog(generate_listings(3000, seed=7))
+    property_manager._catalog = catalog
+    engine = DecisionEngine()
+    keywords = ["نورگیر", "لابی"]
+
+    plain = engine.make_decision(catalog.records, REQUIREMENTS)
+    decision = engine.make_decision(catalog.records, REQUIREMENTS.model_copy(update={"keywords": keywords}))
+    ranked = decision['properties']
+    print(f"{len(ranked)} results, {decision['decision_summary']['keyword_matches']} match a keyword")
+    assert "text" not in plain['properties'][0].score_details
+    assert [s.property_id for s in ranked] != [s.property_id for s in plain['properties']]
+    assert sorted(s.property_id for s in ranked) == sorted(s.property_id for s in plain['properties'])
+
+    descriptions = {s.property_id: catalog.get(s.property_id).description for s in ranked}
+    matching = [s for s in ranked if any(k in descriptions[s.property_id] for k in keywords)]
+    assert decision['decision_summary']['keyword_matches'] == len(matching) > 0
+    for score in ranked:
+        text = score.score_details["text"]
+        assert 0 <= text <= PropertyScoringSystem.TEXT_WEIGHT
+        assert (text > 0) == (score in matching)
+        # the text weight counts in the total
+        assert score.match_percentage == round(sum(score.score_details.values()) / 110 * 100, 2)
+    both = [s for s in matching if all(k in descriptions[s.property_id] for k in keywords)]
+    assert both and max(s.score_details["text"] for s in both) == PropertyScoringSystem.TEXT_WEIGHT
+
+
+def test_keyword_change_rescores_text_only():
+    print("\n--- Testing keyword refinement ---")
+    catalog = build_catalog(generate_listings(2000, seed=7))
+    property_manager._catalog = catalog
+    engine = DecisionEngine()
+    scoring = engine.scoring_system
+    scored_components = []
+    score_component = scoring._score_component
+    scoring._score_component = lambda name, *args: scored_components.append(name) or score_component(name, *args)
+
+    engine.make_decision(catalog.records, REQUIREMENTS, catalog_version=catalog.version, session_id="s")
+    changes = [{"keywords": ["بالکن", "مترو"]}, {"keywords": ["مترو"]}, {"keywords": []}]
+    for change in changes:
+        refined = REQUIREMENTS.model_copy(update=change)
+        scored_components.clear()
+        engine.result_cache.clear()  # the last change is back to the first search
+        decision = engine.make_decision(catalog.records, refined, catalog_version=catalog.version, session_id="s")
+        assert set(scored_components) == {"text"}
+        fresh = DecisionEngine().make_decision(catalog.records, refined)
+        assert decision['properties'] == fresh['properties']
+
+
+def test_extract_keywords():
+    print("\n--- Testing keyword extraction ---")
+    extractor = RegexExtractor()
+    extracted = extractor.extract_all("یه آپارتمان نور‌گیر با بالکن تو تهران میخوام، نزدیک مترو")
+    assert extracted["keywords"] == ["نورگیر", "بالکن", "مترو"]
+    assert "radius_km" not in extracted
+    assert "keywords" not in extractor.extract_all("آپارتمان ۱۰۰ متری تو تهران")
+
+
+if __name__ == "__main__":
+    test_tokenize()
+    test_bm25_matches_reference()
+    test_relevance()
+    test_keyword_search()
+    test_keyword_change_rescores_text_only()
+    test_extract_keywords()
@@ -0,0 +1,87 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import subprocess
+import tempfile
+from app.core.tracing import STAGE_SECONDS, current_spans, current_trace_id, span, start_trace
+
+
+def stage_count(stage):
+    for metric in STAGE_SECONDS.collect():
+        for sample in metric.samples:
+            if sample.name == "chat_stage_seconds_count" and sample.labels["stage"] == stage:
+                return sample.value
+    return 0.0
+
+
+def test_spans_recorded_per_trace():
+    print("\n--- Testing spans ---")
+    trace_id = start_trace("abc123")
+    assert current_trace_id() == "abc123" == trace_id
+
+    before = stage_count("test_stage")
+    with span("test_stage"):
+        with span("test_inner"):
+            pass
+
+    spans = current_spans()
+    print(spans)
+    # inner spans end first
+    assert [s["stage"] for s in spans] == ["test_inner", "test_stage"]
+    assert all(s["ms"] >= 0 for s in spans)
+    assert stage_count("test_stage") == before + 1
+
+    # a new trace starts with no spans
+    start_trace()
+    assert current_spans() == []
+
+
+def test_span_records_on_error():
+    print("\n--- Testing span on exception ---")
+    start_trace()
+    try:
+        with span("failing"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert [s["stage"] for s in current_spans()] == ["failing"]
+
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# one uvicorn worker: records a stage and its history queue depth, maybe shuts down
+WORKER = """
+import sys
+from app.core.tracing import span, worker_exited
+from app.services.history.history_writer import QUEUE_DEPTH
+with span("merged_stage"):
+    pass
+QUEUE_DEPTH.set(int(sys.argv[1]))
+if sys.argv[2] == "exit":
+    worker_exited()
+"""
+
+
+def test_metrics_merged_over_workers():
+    print("\n--- Testing multi-worker metrics ---")
+    env = dict(os.environ, WEB_CONCURRENCY="2", PROMETHEUS_MULTIPROC_DIR=tempfile.mkdtemp())
+    # each worker is its own process: metrics mode is chosen before prometheus_client loads
+    subprocess.run([sys.executable, "-c", WORKER, "3", "exit"], env=env, cwd=ROOT, check=True)
+    subprocess.run([sys.executable, "-c", WORKER, "2", "live"], env=env, cwd=ROOT, check=True)
+
+    scrape = "from app.core.tracing import latest_metrics; print(latest_metrics().decode())"
+    text = subprocess.run([sys.executable, "-c", scrape], env=env, cwd=ROOT, check=True,
+                          capture_output=True, text=True).stdout
+    print(text)
+    assert 'chat_stage_seconds_count{stage="merged_stage"} 2.0' in text
+    # the queue of the worker that shut down is not counted
+    assert "chat_history_queue_depth 2.0" in text
+
+
+if __name__ == "__main__":
+    test_spans_recorded_per_trace()
+    test_span_records_on_error()
+    test_metrics_merged_over_workers()
@@ -0,0 +1,49 @@
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from typing import List
+from pydantic import BaseModel, Field
+from app.models.property import Property, construct_trusted
+from app.services.advertisements.app_property.property_manager import property_manager
+from measure_property_construction import make_divar_record, make_properties_row
+
+def test_trusted_matches_validated():
+    for prop in (
+        property_manager._map_divar_record_to_property(make_divar_record(1)),
+        property_manager.convert_to_property(property_manager._map_db_to_submission(make_properties_row(1))),
+    ):
+        validated = Property(**prop.model_dump(), city_key=prop.city_key, district_key=prop.district_key)
+        print(f"Trusted: {prop.id} {prop.property_type} age={prop.age}")
+
+        assert prop == validated
+        assert prop.model_dump() == validated.model_dump()
+
+def test_trusted_fills_defaults_and_derived():
+    prop = property_manager._map_divar_record_to_property({"id": 5, "year_built": 1400, "city": "تهران"})
+    print(f"Sparse record: {prop.title} {prop.property_type} age={prop.age} city_key={prop.city_key}")
+
+    assert prop.units is None
+    assert prop.exchange_preferences == []
+    assert prop.age is not None
+    assert prop.city_key == "تهران"
+
+def test_trusted_runs_default_factories():
+    class Tagged(BaseModel):
+        name: str
+        tags: List[str] = Field(default_factory=list)
+
+    first, second = construct_trusted(Tagged, {"name": "a"}), construct_trusted(Tagged, {"name": "b"})
+    first.tags.append("x")
+    print(f"Tags: {first.tags} {second.tags}")
+
+    assert second.tags == []
+    assert first.model_fields_set == {"name"}
+    assert first.model_dump(exclude_unset=True) == {"name": "a"}
+
+if __name__ == "__main__":
+    test_trusted_matches_validated()
+    test_trusted_fills_defaults_and_derived()
+    test_trusted_runs_default_factories()